@@ -1,204 +1,89 @@
+"""
+Weekly forecast report: one page per target and region, for a reference date
+
+    python scripts/rvdss-report.py                                   # last week's reference date
+    python scripts/rvdss-report.py --start 2025-01-18 --end 2025-05-17
+    python scripts/rvdss-report.py --all
+
+With --start/--end or --all the model output and truth data are loaded once
+and a report is written for every reference date with forecasts in the range,
+with the pages of all of them drawn in one process pool and shared page cache.
+"""
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings("ignore")
 
-
-# Load the model data
-model_data = pd.read_csv('auxiliary-data/concatenated_model_output.csv')
-
-# Load the truth data
-truth_data = pd.read_csv('target-data/season_2024_2025/target_rvdss_data.csv')
-truth_data = truth_data.rename(columns={"time_value": "time"})
-truth_data['time'] = pd.to_datetime(truth_data['time']).dt.date
-
-# Ensure model data types are correct
-model_data['reference_date'] = pd.to_datetime(model_data['reference_date']).dt.date
-model_data['target_end_date'] = pd.to_datetime(model_data['target_end_date']).dt.date
-model_data['output_type_id'] = pd.to_numeric(model_data['output_type_id'], errors='coerce')
-
-print(model_data)
-print(truth_data)
-# Calculate reference date
-current_date = datetime.now().date()
-ref_date = current_date + timedelta(days=(6 - current_date.weekday())) - timedelta(days=1, weeks=1)
-
-# Filter model data for the reference date
-model_data = model_data[model_data['reference_date'] == ref_date]
-
-locations = pd.read_csv('auxiliary-data/locations.csv')
-
-# Group by region (location)
-targets = model_data['target'].unique()
-file_name = 'weekly-forecast-reports/' + str(ref_date)+"-Forecast_Report.pdf"
-# Open a PDF to save the plots
-with PdfPages(file_name) as pdf:
-    # Iterate over each target
-    for target in targets:
-        target_data = model_data[model_data['target'] == target]
-        regions = target_data['location'].unique()
-
-        # Reorder regions: Ontario first, then alphabetical for the rest
-        regions = sorted([region for region in regions if region != "ca"])
-        if "ca" in target_data['location'].unique():
-            regions = ["ca"] + regions
-
-        # Match target to truth data columns (e.g., covid, flu, rsv)
-        truth_column = (
-            "sarscov2_pct_positive" if "covid lab" in target.lower() else
-            "flu_pct_positive" if "flu lab" in target.lower() else
-            "rsv_pct_positive" if "rsv lab" in target.lower() else
-            None
-        )
-        
-        if truth_column is None:
-            print(f"Skipping target '{target}' as it doesn't match truth data columns.")
-            continue
-
-        for region in regions:
-            region_data = target_data[target_data['location'] == region]
-            
-            if region_data.empty:
-                print(f"No data for region: {region}, target: {target}")
-                continue  # Skip if no data for this region
-            
-            # Create figure with two subplots
-            fig, axes = plt.subplots(1, 2, figsize=(13, 5), sharey=True)
-
-            ref_yaxis = region_data[region_data['output_type_id'] == 0.5]
-
-            # Helper function to calculate intervals
-            def calculate_intervals(data):
-                return data.groupby('target_end_date').apply(
-                    lambda x: pd.Series({
-                        'median': x.loc[x['output_type_id'] == 0.5, 'value'].mean(),
-                        'lower_95': x.loc[x['output_type_id'] == 0.025, 'value'].mean(),
-                        'upper_95': x.loc[x['output_type_id'] == 0.975, 'value'].mean(),
-                        'lower_50': x.loc[x['output_type_id'] == 0.25, 'value'].mean(),
-                        'upper_50': x.loc[x['output_type_id'] == 0.75, 'value'].mean(),
-                    })
-                ).reset_index()
-
-            # Left Plot: All Models (excluding ensemble)
-            ax = axes[0]
-            ax.set_ylim([ref_yaxis['value'].min()/2, ref_yaxis['value'].max() * 2])
-            non_ensemble_data = region_data[region_data['model'] != 'AI4Casting_Hub-Ensemble_v1']
-            for model in non_ensemble_data['model'].unique():
-                model_specific_data = non_ensemble_data[non_ensemble_data['model'] == model]
-                
-                if model_specific_data.empty:
-                    print(f"No data for model: {model}, region: {region}, target: {target}")
-                    continue
-                
-                # Calculate intervals
-                grouped = calculate_intervals(model_specific_data)
-                
-                # Plot the median and confidence intervals
-                if not grouped.empty:
-                    line, = ax.plot(grouped['target_end_date'], grouped['median'], label=f"{model}")
-                    ax.fill_between(
-                        grouped['target_end_date'],
-                        grouped['lower_95'],
-                        grouped['upper_95'],
-                        alpha=0.2,
-                        color=line.get_color(),
-                        label='_nolegend_'
-                    )
-                    # ax.fill_between(
-                    #     grouped['target_end_date'],
-                    #     grouped['lower_50'],
-                    #     grouped['upper_50'],
-                    #     alpha=0.2,
-                    #     color=line.get_color(),
-                    #     label='_nolegend_'
-                    # )
-                    ax.scatter(
-                        grouped['target_end_date'],
-                        grouped['median'],
-                        color=line.get_color(),
-                        alpha=1,
-                        s=30  # Size of the dots
-                    )
-                else:
-                    print(f"No grouped data for model: {model}, region: {region}, target: {target}")
-            
-            # Add truth data to the left plot
-            region_truth = truth_data[truth_data['geo_value'] == region]
-            region_truth = region_truth.sort_values(by='time')
-
-            if not region_truth.empty and truth_column in region_truth.columns:
-                ax.plot(
-                    region_truth['time'],
-                    region_truth[truth_column],
-                    label="Truth Data",
-                    color="black",
-                    linestyle="--",
-                    linewidth=2
-                )
-            else:
-                print(f"No truth data for region: {region}")
-
-            full_region_name = locations[locations['geo_abbr']==region]['geo_name'].values[0]
-            ax.set_title(f"Forecasting Models - {full_region_name} - {target}")
-            ax.set_xlabel("Target End Date")
-            ax.set_ylabel("Forecast Value")
-            ax.legend(loc="upper left", fontsize="small")
-            ax.grid()
-
-            # Right Plot: Truth Data + Ensemble Model
-            ax = axes[1]
-            ensemble_data = region_data[region_data['model'] == 'AI4Casting_Hub-Ensemble_v1']
-            if not ensemble_data.empty:
-                grouped = calculate_intervals(ensemble_data)
-                
-                if not grouped.empty:
-                    line, = ax.plot(grouped['target_end_date'], grouped['median'], label="Ensemble")
-                    ax.fill_between(
-                        grouped['target_end_date'],
-                        grouped['lower_95'],
-                        grouped['upper_95'],
-                        alpha=0.1,
-                        color=line.get_color(),
-                        label='_nolegend_'
-                    )
-                    ax.fill_between(
-                        grouped['target_end_date'],
-                        grouped['lower_50'],
-                        grouped['upper_50'],
-                        alpha=0.2,
-                        color=line.get_color(),
-                        label='_nolegend_'
-                    )
-                    ax.scatter(
-                        grouped['target_end_date'],
-                        grouped['median'],
-                        color=line.get_color(),
-                        s=20  # Size of the dots
-                    )
-            
-            # Add truth data to the right plot
-            if not region_truth.empty and truth_column in region_truth.columns:
-                ax.plot(
-                    region_truth['time'],
-                    region_truth[truth_column],
-                    label="Truth Data",
-                    color="black",
-                    linestyle="--",
-                    linewidth=2
-                )
-            else:
-                print(f"No truth data for region: {region}")
-
-            ax.set_title(f"Ensemble Model - {full_region_name} - {target}")
-            ax.set_xlabel("Target End Date")
-            ax.legend(loc="upper left", fontsize="small")
-            ax.grid()
-
-            # Adjust layout and save the figure
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
-
-print("Plots saved!")
+from rvdss_compact import dates, day_number, load_target_data
+from rvdss_model_output import load_model_output
+from rvdss_quantiles import QuantileCube
+from rvdss_render import RENDER_WORKERS, render_pdfs
+from rvdss_report_pages import draw_forecast_page, forecast_pages
+
+TRUTH_DATA_FILE = 'target-data/season_2024_2025/target_rvdss_data.csv'
+REPORT_DIR = 'weekly-forecast-reports'
+
+
+def report_path(ref_date):
+    return(REPORT_DIR + '/' + str(ref_date) + "-Forecast_Report.pdf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the weekly forecast reports")
+    parser.add_argument("--start", help="first reference date to write a report for (yyyy-mm-dd)")
+    parser.add_argument("--end", help="last reference date to write a report for (yyyy-mm-dd)")
+    parser.add_argument("--all", action="store_true", help="write a report for every reference date")
+    parser.add_argument("--truth", default=TRUTH_DATA_FILE, help="truth data to plot the forecasts against")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="number of processes drawing pages")
+    args = parser.parse_args()
+
+    # Load the model data (parsing only the submission files that changed since the last run),
+    # with categorical keys, dates as day numbers and float32 values (see rvdss_compact)
+    model_data = load_model_output()
+
+    # Load the truth data
+    truth_data = load_target_data(args.truth)
+    truth_data = truth_data.rename(columns={"time_value": "time"})
+
+    print(model_data)
+    print(truth_data)
+    if args.all or args.start or args.end:
+        # Every reference date with forecasts in the range
+        ref_days = sorted(model_data['reference_date'].unique())
+        if args.start:
+            ref_days = [d for d in ref_days if d >= day_number(args.start)]
+        if args.end:
+            ref_days = [d for d in ref_days if d <= day_number(args.end)]
+    else:
+        # Calculate reference date
+        current_date = datetime.now().date()
+        ref_date = current_date + timedelta(days=(6 - current_date.weekday())) - timedelta(days=1, weeks=1)
+        ref_days = [day_number(ref_date)]
+
+    locations = pd.read_csv('auxiliary-data/locations.csv')
+
+    # Truth data of each region, sorted by date, with dates to plot
+    truth_by_region = {region: rows.assign(time=dates(rows['time']))
+                       for region, rows in truth_data.sort_values(by='time', kind='mergesort')
+                                                     .groupby('geo_value', observed=True)}
+
+    # Forecasts of each reference date, split in one pass
+    forecasts = {ref_day: rows for ref_day, rows in model_data.groupby('reference_date', sort=False)}
+
+    reports = []
+    for ref_day, ref_date in zip(ref_days, dates(ref_days)):
+        # Pivot the forecasts of the reference date once; each page is a slice of it
+        cube = QuantileCube(forecasts.get(ref_day, model_data.iloc[:0]))
+        pages = forecast_pages(cube, truth_by_region, locations)
+        reports.append((pages, report_path(ref_date)))
+
+    # One page per target and region; pages whose inputs changed since the last run are drawn in parallel
+    drawn = render_pdfs(draw_forecast_page, reports, workers=args.workers)
+    print(f"Drew {drawn} of {sum(len(pages) for pages, _ in reports)} pages for {len(reports)} reports")
+
+    print("Plots saved!")
+
+
+if __name__ == '__main__':
+    main()
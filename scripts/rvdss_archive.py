@@ -0,0 +1,122 @@
+"""
+Backfill the revision history of the current season from the dashboard archive
+
+The dashboard keeps a copy of its files for each update under
+DASHBOARD_W_DATE_URL (archive/{date}/). This script tries every date in a
+range, downloads the archived RVD_WeeklyData.csv and RVD_UpdateDate.csv of all
+of them concurrently (with the same per-host limit as the other downloads),
+parses each with the same code as the weekly update and adds them to the
+season's revision store. Dates with no archive are skipped.
+
+Archives whose data file has the same content as one already loaded are
+skipped too. The sha256 of each loaded data file is kept in a manifest next to
+the revision store, so re-running the backfill only parses new snapshots.
+
+    python scripts/rvdss_archive.py --start 2025-08-28 --end 2026-06-30
+
+--base-url points the backfill somewhere else, e.g. a local fixture server
+serving the same layout.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import date
+
+import pandas as pd
+
+from rvdss_fetch import MAX_WORKERS, fetch_available
+from rvdss_revisions import RevisionStore
+from rvdss_update import (CURRENT_SEASON_RAW_DIR, DASHBOARD_DATA_FILE, DASHBOARD_UPDATE_DATE_FILE,
+                          DASHBOARD_W_DATE_URL, REVISIONS_OUTPUT_FILE, parse_revised_data,
+                          prepare_target_rows, process_positive_table)
+
+ARCHIVE_DATE_FORMAT = "%Y-%m-%d"
+MANIFEST_FILE = "archive_manifest.json"
+
+
+def archive_dates(start, end):
+    """Every date from start to end (inclusive), formatted as in the archive urls"""
+    return([d.strftime(ARCHIVE_DATE_FORMAT) for d in pd.date_range(start, end, freq="D")])
+
+
+def fetch_archives(dates, archive_url=DASHBOARD_W_DATE_URL, max_workers=MAX_WORKERS):
+    """
+    Download the data and update date files archived on each date
+
+    Returns a list of {'date', 'data', 'update_date'} for the dates that have
+    an archive, in date order.
+    """
+    base_urls = [archive_url.format(date=d) for d in dates]
+    urls = [base + DASHBOARD_DATA_FILE for base in base_urls] + \
+           [base + DASHBOARD_UPDATE_DATE_FILE for base in base_urls]
+    pages = fetch_available(urls, max_workers=max_workers)
+
+    data_pages, update_pages = pages[:len(dates)], pages[len(dates):]
+    return([{'date': d, 'data': data, 'update_date': update_date}
+            for d, data, update_date in zip(dates, data_pages, update_pages)
+            if data is not None and update_date is not None])
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return(json.load(f))
+    except (OSError, ValueError):
+        return({})
+
+
+def backfill_archive(dates, revisions_path, archive_url=DASHBOARD_W_DATE_URL, max_workers=MAX_WORKERS):
+    """
+    Add the archived snapshots of the given dates to the revision store at `revisions_path`
+
+    Returns counts of the dates tried, archives found, archives skipped as
+    unchanged and snapshots loaded.
+    """
+    manifest_path = os.path.join(os.path.dirname(revisions_path), MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    archives = fetch_archives(dates, archive_url, max_workers)
+
+    tables = []
+    unchanged = 0
+    for archive in archives:
+        digest = hashlib.sha256(archive['data'].encode("utf-8")).hexdigest()
+        if digest in manifest:
+            unchanged += 1
+            continue
+
+        table = process_positive_table(parse_revised_data(archive['data'], archive['update_date'].strip()))
+        tables.append(prepare_target_rows(table))
+        manifest[digest] = {"date": archive['date'], "update_date": archive['update_date'].strip()}
+
+    if tables:
+        store = RevisionStore.load(revisions_path)
+        for table in tables:
+            store.add(table)
+        store.save(revisions_path)
+
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return({"dates": len(dates), "archives": len(archives), "unchanged": unchanged, "loaded": len(tables)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the revision history from the dashboard archive")
+    parser.add_argument("--start", required=True, help="first archive date to try (yyyy-mm-dd)")
+    parser.add_argument("--end", default=date.today().isoformat(), help="last archive date to try (default today)")
+    parser.add_argument("--revisions", default=os.path.join(CURRENT_SEASON_RAW_DIR, REVISIONS_OUTPUT_FILE),
+                        help="revision store to add the snapshots to")
+    parser.add_argument("--base-url", default=DASHBOARD_W_DATE_URL,
+                        help="archive url, with {date} where the date goes")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="number of concurrent downloads")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.revisions) or ".", exist_ok=True)
+    counts = backfill_archive(archive_dates(args.start, args.end), args.revisions, args.base_url, args.workers)
+    print(f"Tried {counts['dates']} dates, found {counts['archives']} archives, "
+          f"skipped {counts['unchanged']} unchanged, loaded {counts['loaded']}")
+
+
+if __name__ == '__main__':
+    main()
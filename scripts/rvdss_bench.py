@@ -0,0 +1,504 @@
+"""
+Offline benchmarks of the update pipeline and the weekly report
+
+Nothing in scripts/ can be timed without canada.ca and
+health-infobase.canada.ca, so the benchmarks run on a recorded corpus: the
+season landing pages, the weekly report pages and the dashboard files, kept in
+the layout of rvdss_fetch.ResponseCache. Where there's no corpus yet, `run` and
+`serve` write a synthetic one (rvdss_corpus: a season of generated pages, the
+dashboard files and three archived snapshots of them), so both work offline
+out of the box. `record` downloads a real one instead:
+
+    python scripts/rvdss_bench.py record --seasons 2022-2023 2023-2024
+    python scripts/rvdss_bench.py generate    # the synthetic corpus again, e.g. after deleting it
+
+Results name the corpus they ran on by digest, so synthetic and recorded runs
+aren't compared by mistake. `run` serves the corpus from a local HTTP stand-in (`FixtureServer`). The shared
+session routes requests for the real hosts to the stand-in, so the fetch stage
+still goes through sockets, HTTP and the connection pool, just not over the
+internet (--latency adds a delay to every response).
+
+Each stage is timed on its own, wall and CPU time, over --repeat runs, and the
+growth of the peak resident memory during its runs is kept alongside:
+
+    fetch     - the season and week pages (fetch_season_pages) and the dashboard files
+    parse     - the week pages of every season into tables (parse_season)
+    normalize - canonical columns and derived signals (process_tables, parse_revised_data)
+    merge     - every issue in a revision store and the latest one in the target table
+    write     - the raw and target tables as CSV and Parquet (write_csv_and_columnar)
+    report    - weekly forecast reports of the latest reference dates, from model-output/
+
+--scale N replicates the seasons N times (and writes N reports), to see how the
+stages grow. Results are written as JSON and can be compared with a baseline;
+a stage regresses when its wall time, CPU time or memory grows past the
+thresholds below, and the items each stage handled (pages, rows, files) are
+checked too, since different items mean the runs aren't comparable:
+
+    python scripts/rvdss_bench.py run --scale 2 --output baseline.json
+    python scripts/rvdss_bench.py run --scale 2 --baseline baseline.json   # exits 1 on a regression
+    python scripts/rvdss_bench.py compare new.json baseline.json
+
+    python scripts/rvdss_bench.py serve    # the stand-in alone, e.g. for rvdss_archive.py --base-url
+
+The report stage only needs model-output/ and runs without a corpus.
+
+RVDSS_BENCH_CORPUS - where the corpus lives (default .cache/bench-corpus)
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from rvdss_corpus import CORPUS_MANIFEST, DASHBOARD_FILES, generate
+from rvdss_fetch import MAX_WORKERS, ResponseCache, create_session, fetch_text, set_cache, set_session
+from rvdss_metrics import peak_memory_mb
+from rvdss_update import (COL_MAPPERS, DASHBOARD_BASE_URL, DASHBOARD_DATA_FILE, DASHBOARD_UPDATE_DATE_FILE,
+                          HISTORIC_SEASON_REPORTS_URL, fetch_season_pages, parse_revised_data, parse_season,
+                          process_positive_table, process_tables, season_issue_table, season_target_table)
+
+CORPUS_DIR = os.environ.get("RVDSS_BENCH_CORPUS", os.path.join(".cache", "bench-corpus"))
+
+STAGES = ['fetch', 'parse', 'normalize', 'merge', 'write', 'report']
+CORPUS_STAGES = ['fetch', 'parse', 'normalize', 'merge', 'write']
+
+DEFAULT_SEASONS = ["2022-2023", "2023-2024", "2024-2025"]
+VIRUSES = ['hcov', 'hmpv', 'sarscov2', 'rsv', 'hpiv', 'flu', 'adv', 'ev_rv']
+
+# A stage is a regression when its wall time, CPU time or memory is this much above the baseline, and by at
+# least MIN_REGRESSION_SECONDS or MIN_REGRESSION_MB
+REGRESSION_THRESHOLD = 0.10
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_MB = 10.0
+
+
+def record(seasons=DEFAULT_SEASONS, corpus=CORPUS_DIR):
+    """Download the pages and dashboard files of the seasons (e.g. "2023-2024") into the corpus"""
+    set_cache(ResponseCache(corpus, "revalidate"))
+    season_urls = [HISTORIC_SEASON_REPORTS_URL.format(year_range=season) for season in seasons]
+    season_pages = fetch_season_pages(season_urls)
+    for name in DASHBOARD_FILES:
+        fetch_text(DASHBOARD_BASE_URL + name)
+
+    manifest = {'season_urls': season_urls, 'dashboard_url': DASHBOARD_BASE_URL,
+                'dashboard_files': DASHBOARD_FILES, 'recorded': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    with open(os.path.join(corpus, CORPUS_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return(sum(len(pages['week_pages']) + 1 for pages in season_pages))
+
+
+def load_corpus(corpus=CORPUS_DIR):
+    """The corpus manifest, with the digest it's identified by in results, or None if there's no corpus"""
+    try:
+        with open(os.path.join(corpus, CORPUS_MANIFEST), "rb") as f:
+            data = f.read()
+    except OSError:
+        return(None)
+    manifest = json.loads(data)
+    manifest['digest'] = hashlib.sha256(data).hexdigest()[:16]
+    return(manifest)
+
+
+def ensure_corpus(corpus=CORPUS_DIR):
+    """The corpus manifest (see `load_corpus`), writing the synthetic corpus first where there's none"""
+    manifest = load_corpus(corpus)
+    if manifest is None:
+        print(f"No corpus at {corpus}, writing the synthetic one (`rvdss_bench.py record` downloads a real one)")
+        generate(corpus)
+        manifest = load_corpus(corpus)
+    return(manifest)
+
+
+class FixtureServer:
+    """
+    The corpus served over HTTP on localhost: GET /<host>/<path> answers https://<host>/<path>
+
+        with FixtureServer() as server:
+            set_session(server.session())
+    """
+
+    def __init__(self, corpus=CORPUS_DIR, port=0, latency=0.0):
+        cache = ResponseCache(corpus, "offline")
+        # (path, If-None-Match header) of every request served
+        self.requests = []
+        requests = self.requests
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                entry = cache.lookup("https:/" + self.path)
+                requests.append((self.path, self.headers.get("If-None-Match")))
+                if latency:
+                    time.sleep(latency)
+                etag = None
+                if entry is None:
+                    body, status, content_type = b"Not in the corpus", 404, "text/plain"
+                else:
+                    # Pages are tagged with the hash of their body, so a revalidation is answered with a 304
+                    etag = f'"{entry["sha256"]}"'
+                    body, status = cache.body(entry), 200
+                    content_type = "text/html" + (f"; charset={entry['encoding']}" if entry.get("encoding") else "")
+                    if self.headers.get("If-None-Match") == etag:
+                        body, status = b"", 304
+                self.send_response(status)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return(f"http://127.0.0.1:{self.httpd.server_address[1]}")
+
+    def session(self):
+        """A session like rvdss_fetch's, sending every request to this server"""
+        session = create_session()
+        adapter = FixtureAdapter(self.url, pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return(session)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return(self)
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FixtureAdapter(HTTPAdapter):
+    """Transport adapter rewriting https://<host>/<path> to <server_url>/<host>/<path>"""
+
+    def __init__(self, server_url, **kwargs):
+        self.server_url = server_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if not request.url.startswith(self.server_url):
+            parts = urlsplit(request.url)
+            server = urlsplit(self.server_url)
+            request.url = urlunsplit((server.scheme, server.netloc, "/" + parts.netloc + parts.path, parts.query, ""))
+        return(super().send(request, **kwargs))
+
+
+def _cpu_time():
+    """CPU time of this process and its finished children (e.g. process pools)"""
+    times = os.times()
+    return(times.user + times.system + times.children_user + times.children_system)
+
+
+def _peak_memory():
+    """The peak resident memory of this process or any finished child, in MB (None where it can't be read)"""
+    peaks = [peak for peak in (peak_memory_mb(), peak_memory_mb(children=True)) if peak is not None]
+    return(max(peaks) if peaks else None)
+
+
+def time_stage(function, repeat):
+    """
+    Run a stage `repeat` times, returning its last result, the median wall and CPU
+    times and how much the peak resident memory grew over the runs (`memory_mb`)
+
+    The peak only ever grows, so a stage that stays below the peak of an earlier
+    one shows no growth: stages are run in order, and run alone (--stages) when
+    their own memory matters.
+    """
+    runs = []
+    memory = _peak_memory()
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), _cpu_time()
+        result = function()
+        runs.append({'wall': time.perf_counter() - wall, 'cpu': _cpu_time() - cpu})
+    timing = {'wall': statistics.median(run['wall'] for run in runs),
+              'cpu': statistics.median(run['cpu'] for run in runs),
+              'memory_mb': None if memory is None else _peak_memory() - memory,
+              'runs': runs}
+    return(result, timing)
+
+
+def _rows(tables):
+    return(sum(len(table) for table in tables))
+
+
+def corpus_stages(manifest, scale, work_dir):
+    """The stages run on the corpus, as (name, function, items) in order; each function uses the result of the one before"""
+    season_urls = manifest['season_urls'] * scale
+    dashboard_url = manifest['dashboard_url']
+    state = {}
+
+    def fetch():
+        state['season_pages'] = fetch_season_pages(season_urls)
+        state['dashboard'] = [{name: fetch_text(dashboard_url + name) for name in manifest['dashboard_files']}] * scale
+        return({'pages': sum(len(pages['week_pages']) + 1 for pages in state['season_pages']) + len(manifest['dashboard_files']) * scale})
+
+    def parse():
+        state['seasons'] = [parse_season(pages['url'], pages) for pages in state['season_pages']]
+        return({'week_pages': sum(len(pages['week_pages']) for pages in state['season_pages']),
+                'rows': _rows(table for _, detections, positive in state['seasons'] for table in (detections, positive))})
+
+    def normalize():
+        # process_tables renames the columns of its arguments, so it gets copies
+        state['processed'] = [process_tables(detections.copy(), positive.copy(), COL_MAPPERS, VIRUSES)
+                              for _, detections, positive in state['seasons']]
+        state['revised'] = [process_positive_table(parse_revised_data(files[DASHBOARD_DATA_FILE],
+                                                                      files[DASHBOARD_UPDATE_DATE_FILE].strip()))
+                            for files in state['dashboard']]
+        return({'rows': _rows(table for tables in state['processed'] for table in tables) + _rows(state['revised'])})
+
+    def merge():
+        from rvdss_revisions import RevisionStore
+
+        issues = [season_issue_table(detections, positive) for detections, positive in state['processed']]
+        state['revisions'] = [RevisionStore.from_table(table) for table in issues]
+        state['targets'] = [season_target_table(table) for table in issues]
+        return({'rows_in': _rows(issues), 'rows_out': _rows(state['targets'])})
+
+    def write():
+        from rvdss_columnar import write_csv_and_columnar
+
+        files = 0
+        for i, ((detections, positive), target) in enumerate(zip(state['processed'], state['targets'])):
+            path = os.path.join(work_dir, f"season_{i}")
+            os.makedirs(path, exist_ok=True)
+            write_csv_and_columnar(detections, os.path.join(path, "respiratory_detections.csv"), index=True)
+            write_csv_and_columnar(positive, os.path.join(path, "positive_tests.csv"), index=True)
+            write_csv_and_columnar(target, os.path.join(path, "target_rvdss_data.csv"), index=False)
+            files += 3
+        return({'files': files})
+
+    return([('fetch', fetch), ('parse', parse), ('normalize', normalize), ('merge', merge), ('write', write)])
+
+
+def report_stage(scale, work_dir, workers):
+    """The weekly report of the `scale` latest reference dates, as rvdss-report.py writes them"""
+    import glob
+
+    from rvdss_compact import compact_target_data, dates
+    from rvdss_model_output import load_model_output
+    from rvdss_quantiles import QuantileCube
+    from rvdss_render import render_pdfs
+    from rvdss_report_pages import draw_forecast_page, forecast_pages
+
+    truth_files = sorted(glob.glob(os.path.join("target-data", "season_*", "target_rvdss_data.csv")) +
+                         glob.glob(os.path.join("auxiliary-data", "target-data-archive", "season_*", "target_rvdss_data.csv")))
+
+    def report():
+        model_data = load_model_output()
+        ref_days = sorted(model_data['reference_date'].unique())[-scale:]
+
+        truth = pd.concat([pd.read_csv(path) for path in truth_files], ignore_index=True).rename(columns={"time_value": "time"})
+        truth = compact_target_data(truth)
+        truth_by_region = {region: rows.assign(time=dates(rows['time']))
+                           for region, rows in truth.sort_values(by='time', kind='mergesort').groupby('geo_value', observed=True)}
+        locations = pd.read_csv(os.path.join('auxiliary-data', 'locations.csv'))
+
+        reports = []
+        for ref_day, ref_date in zip(ref_days, dates(ref_days)):
+            cube = QuantileCube(model_data[model_data['reference_date'] == ref_day])
+            reports.append((forecast_pages(cube, truth_by_region, locations),
+                            os.path.join(work_dir, f"{ref_date}-Forecast_Report.pdf")))
+        pages = render_pdfs(draw_forecast_page, reports, workers=workers, cache=False)
+        return({'reports': len(reports), 'pages': pages})
+
+    return(report)
+
+
+def run(stages=STAGES, corpus=CORPUS_DIR, scale=1, repeat=3, latency=0.0, workers=1):
+    """Time the stages, returning the results as a dict (see `compare`)"""
+    selected = [stage for stage in STAGES if stage in stages]
+    manifest = ensure_corpus(corpus) if any(stage in CORPUS_STAGES for stage in selected) else load_corpus(corpus)
+    results = {
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scale': scale,
+        'repeat': repeat,
+        'latency': latency,
+        'corpus': None if manifest is None else {'digest': manifest['digest'], 'seasons': len(manifest['season_urls'])},
+        'stages': {},
+        'peak_memory_mb': None,
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="rvdss-bench-")
+    # With the HTTP cache off every fetch reaches the stand-in
+    set_cache(ResponseCache(os.path.join(work_dir, "http"), "off"))
+    try:
+        wanted = [stage for stage in CORPUS_STAGES if stage in selected]
+        if wanted:
+            with FixtureServer(corpus, latency=latency) as server:
+                set_session(server.session())
+                # Stages before the last selected one are run once (untimed) when not selected, for their results
+                last = CORPUS_STAGES.index(wanted[-1])
+                for name, function in corpus_stages(manifest, scale, work_dir)[:last + 1]:
+                    if name in selected:
+                        items, timing = time_stage(function, repeat)
+                        results['stages'][name] = dict(timing, items=items)
+                        _print_stage(name, results['stages'][name])
+                    else:
+                        function()
+
+        if 'report' in selected:
+            items, timing = time_stage(report_stage(scale, work_dir, workers), repeat)
+            results['stages']['report'] = dict(timing, items=items)
+            _print_stage('report', results['stages']['report'])
+        results['peak_memory_mb'] = _peak_memory()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return(results)
+
+
+def _format_memory(mb):
+    return("     n/a" if mb is None else f"{mb:6.1f}MB")
+
+
+def _print_stage(name, result):
+    items = ", ".join(f"{value} {key}" for key, value in result['items'].items())
+    print(f"{name:<10} {result['wall']:8.3f}s wall {result['cpu']:8.3f}s cpu {_format_memory(result.get('memory_mb'))} "
+          f"memory   {items}")
+
+
+# What `compare` checks of every stage, with its unit
+COMPARED = [('wall', "s"), ('cpu', "s"), ('memory_mb', "MB")]
+
+
+def _compare_value(label, before, after, unit, threshold, minimum):
+    """Print one measure of both runs, returning whether it regressed (measures missing from either run never do)"""
+    before_text = "n/a" if before is None else f"{before:.3f}{unit}"
+    after_text = "n/a" if after is None else f"{after:.3f}{unit}"
+    if before is None or after is None:
+        print(f"{label:<22} {before_text:>10} {after_text:>10}")
+        return(False)
+    change = (after - before) / before if before else 0.0
+    worse = after > before * (1 + threshold) and after - before > minimum
+    print(f"{label:<22} {before_text:>10} {after_text:>10} {change:+8.1%}{'  REGRESSION' if worse else ''}")
+    return(worse)
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD, min_seconds=MIN_REGRESSION_SECONDS,
+            min_mb=MIN_REGRESSION_MB):
+    """
+    Compare two runs stage by stage, printing both
+
+    Every stage's wall time, CPU time and memory growth is compared, and so is the
+    peak memory of the whole run. Returns the regressions as "<stage> <measure>"
+    (e.g. "parse wall", "run peak_memory_mb"): measures above the baseline by more
+    than `threshold` (a fraction) and by more than `min_seconds` or `min_mb`.
+    Stages that handled different items than in the baseline are warned about.
+    """
+    for key in ['scale', 'corpus']:
+        if results.get(key) != baseline.get(key):
+            print(f"Warning: {key} differs from the baseline ({results.get(key)} vs {baseline.get(key)})")
+
+    minimums = {'s': min_seconds, 'MB': min_mb}
+    regressions = []
+    print(f"{'stage':<22} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name in STAGES:
+        if name not in results['stages'] or name not in baseline['stages']:
+            continue
+        before, after = baseline['stages'][name], results['stages'][name]
+        if before.get('items') != after.get('items'):
+            print(f"Warning: {name} handled {after.get('items')}, the baseline {before.get('items')}")
+        for key, unit in COMPARED:
+            if _compare_value(f"{name} {key}", before.get(key), after.get(key), unit, threshold, minimums[unit]):
+                regressions.append(f"{name} {key}")
+    if _compare_value("run peak_memory_mb", baseline.get('peak_memory_mb'), results.get('peak_memory_mb'), "MB",
+                      threshold, min_mb):
+        regressions.append("run peak_memory_mb")
+    return(regressions)
+
+
+def _load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the update pipeline and the report")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="download the corpus (needs the internet)")
+    record_parser.add_argument("--seasons", nargs="+", default=DEFAULT_SEASONS, help="seasons to record, e.g. 2023-2024")
+    record_parser.add_argument("--corpus", default=CORPUS_DIR)
+
+    generate_parser = commands.add_parser("generate", help="write the synthetic corpus")
+    generate_parser.add_argument("--corpus", default=CORPUS_DIR)
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="time the stages on the corpus")
+    run_parser.add_argument("--corpus", default=CORPUS_DIR)
+    run_parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    run_parser.add_argument("--scale", type=int, default=1, help="times the seasons (and reports) are replicated")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs of each stage; the median is kept")
+    run_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response of the stand-in")
+    run_parser.add_argument("--workers", type=int, default=1, help="processes drawing report pages")
+    run_parser.add_argument("--output", help="where to write the results (JSON)")
+    run_parser.add_argument("--baseline", help="results to compare with; exits 1 on a regression")
+    run_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    serve_parser = commands.add_parser("serve", help="serve the corpus until interrupted")
+    serve_parser.add_argument("--corpus", default=CORPUS_DIR)
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        pages = record(args.seasons, args.corpus)
+        print(f"Recorded {pages} pages and {len(DASHBOARD_FILES)} dashboard files in {args.corpus}")
+    elif args.command == "generate":
+        generate(args.corpus, args.seed)
+        print(f"Wrote the synthetic corpus to {args.corpus}")
+    elif args.command == "run":
+        results = run(args.stages, args.corpus, args.scale, args.repeat, args.latency, args.workers)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        if args.baseline:
+            regressions = compare(results, _load_results(args.baseline), args.threshold)
+            sys.exit(1 if regressions else 0)
+    elif args.command == "compare":
+        regressions = compare(_load_results(args.results), _load_results(args.baseline), args.threshold)
+        sys.exit(1 if regressions else 0)
+    elif args.command == "serve":
+        ensure_corpus(args.corpus)
+        with FixtureServer(args.corpus, port=args.port, latency=args.latency) as server:
+            print(f"Serving {args.corpus} at {server.url}/<host>/<path>, "
+                  f"e.g. {server.url}/{urlsplit(DASHBOARD_BASE_URL).netloc}{urlsplit(DASHBOARD_BASE_URL).path}")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Epiweek and date conversions for whole columns at once
+
+The CDC epiweeks of 2013-2030 are computed once at import into a lookup table
+keyed by yyyyww, holding each week's end date and start day. Converting a
+column of (year, week) pairs to epiweeks or week end dates is then an index
+lookup instead of building an `epiweeks.Week` per row, and dates are mapped
+back to their epiweek with a binary search over the week start days. Weeks
+outside the table fall back to `epiweeks.Week`, which also raises for weeks
+that don't exist.
+
+Report tables and the dashboard write dates as yyyy-mm-dd, dd/mm/yyyy or
+dd-mm-yyyy. `iso_dates` converts a column of them by parsing each format in
+one go over the distinct values of the column.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from epiweeks import Week, Year
+
+FIRST_YEAR = 2013
+LAST_YEAR = 2030
+
+ISO_DATE = "[0-9]{4}-[0-9]{2}-[0-9]{2}"
+DAY_FIRST_DATE = "[0-9]{2}-[0-9]{2}-[0-9]{4}"
+
+
+def _build_table(first_year, last_year):
+    weeks = [Week(year, week) for year in range(first_year, last_year + 1)
+             for week in range(1, Year(year).totalweeks() + 1)]
+    keys = pd.Index([week.year * 100 + week.week for week in weeks])
+    end_dates = np.array([str(week.enddate()) for week in weeks], dtype=object)
+    start_days = np.array([week.startdate().toordinal() for week in weeks])
+    return(keys, end_dates, start_days)
+
+
+_KEYS, _END_DATES, _START_DAYS = _build_table(FIRST_YEAR, LAST_YEAR)
+
+
+def _lookup(years, weeks):
+    """Positions of (year, week) pairs in the table, -1 for weeks outside it"""
+    years = np.asarray(years, dtype=np.int64)
+    weeks = np.asarray(weeks, dtype=np.int64)
+    keys = years * 100 + weeks
+    return(keys, _KEYS.get_indexer(keys))
+
+
+def epiweeks(years, weeks):
+    """Epiweeks as yyyyww integers, e.g. 202501, for arrays of years and week numbers"""
+    keys, positions = _lookup(years, weeks)
+    for i in np.flatnonzero(positions == -1):
+        Week(int(keys[i] // 100), int(keys[i] % 100))  # raises for weeks that don't exist
+    return(keys)
+
+
+def week_end_dates(years, weeks):
+    """End dates (yyyy-mm-dd strings) of the epiweeks given by arrays of years and week numbers"""
+    keys, positions = _lookup(years, weeks)
+    end_dates = _END_DATES[np.maximum(positions, 0)]
+    for i in np.flatnonzero(positions == -1):
+        end_dates[i] = str(Week(int(keys[i] // 100), int(keys[i] % 100)).enddate())
+    return(end_dates)
+
+
+def epiweeks_from_dates(dates):
+    """Epiweeks as yyyyww integers of the weeks containing each yyyy-mm-dd date"""
+    codes, uniques = pd.factorize(np.asarray(dates, dtype=object))
+    days = np.array([date.fromisoformat(d).toordinal() for d in uniques], dtype=np.int64)
+    positions = np.searchsorted(_START_DAYS, days, side="right") - 1
+    inside = (positions >= 0) & (days < _START_DAYS[-1] + 7)
+
+    unique_weeks = _KEYS.to_numpy()[np.maximum(positions, 0)]
+    for i in np.flatnonzero(~inside):
+        week = Week.fromdate(date.fromordinal(int(days[i])))
+        unique_weeks[i] = week.year * 100 + week.week
+    return(unique_weeks[codes])
+
+
+def iso_dates(values):
+    """
+    Convert a column of dates written as yyyy-mm-dd, dd/mm/yyyy or dd-mm-yyyy to yyyy-mm-dd strings
+
+    Values that already contain a yyyy-mm-dd date are kept as they are. Raises
+    an AssertionError if a value is in none of these formats.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    if (codes == -1).any():
+        raise AssertionError("Missing date")
+    uniques = pd.Series(uniques, dtype=object)
+
+    iso = uniques.str.contains(ISO_DATE)
+    slashed = ~iso & uniques.str.contains("/", regex=False)
+    dashed = ~iso & ~slashed & uniques.str.contains(DAY_FIRST_DATE)
+    if not (iso | slashed | dashed).all():
+        raise AssertionError("Unrecognised date format")
+
+    result = uniques.copy()
+    day_first = slashed | dashed
+    if day_first.any():
+        parsed = pd.to_datetime(uniques[day_first].str.replace("/", "-", regex=False), format="%d-%m-%Y")
+        result[day_first] = parsed.dt.strftime("%Y-%m-%d")
+    return(result.to_numpy()[codes])
@@ -0,0 +1,123 @@
+"""
+On-disk checkpoints for the historic season backfill
+
+Each season gets its own directory holding a `manifest.json` and one pickle
+per finished week with the tables parsed from that week's report page. The
+manifest records which weeks are done and whether the season's output files
+have been written. A backfill that stops part way through a season picks up
+at the first week that is not in the manifest, and finished seasons are
+skipped entirely. A season only counts as finished while the output files
+recorded with it still exist: when they are deleted (e.g. to force a new
+backfill) the season is written again, from its checkpointed weeks.
+
+Every season is only ever written by the process parsing it, so seasons can
+be checkpointed independently of each other.
+
+Each manifest records the version of the parser that wrote it, by default a
+digest of the parsing code (`source_digest`) and the pandas version the
+pickles were written with. A manifest of another version is stale: it is
+treated as empty, so its season is parsed again. Week files are recorded by
+name and found in the season's directory, so a checkpoint directory can be
+read from any working directory or moved.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+CHECKPOINT_DIR = os.environ.get("RVDSS_CHECKPOINT_DIR", os.path.join(".cache", "rvdss-backfill"))
+
+
+def source_digest(paths):
+    """Digest of the given source files and the pandas version, as a parser version"""
+    digest = hashlib.sha256(pd.__version__.encode("utf-8"))
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return(digest.hexdigest()[:16])
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    os.close(fd)
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class BackfillCheckpoint:
+    def __init__(self, path=CHECKPOINT_DIR, version=None):
+        self.path = path
+        self.version = version
+
+    def season_key(self, season_url):
+        """Directory name for a season, e.g. 2019-2020 for .../2019-2020.html"""
+        name = os.path.splitext(season_url.rstrip("/").split("/")[-1])[0]
+        return(re.sub(r"[^0-9A-Za-z_-]", "_", name))
+
+    def _season_dir(self, season_url):
+        return(os.path.join(self.path, self.season_key(season_url)))
+
+    def _manifest_path(self, season_url):
+        return(os.path.join(self._season_dir(season_url), "manifest.json"))
+
+    def _week_path(self, season_url, week_url):
+        key = hashlib.sha256(week_url.encode("utf-8")).hexdigest()[:16]
+        return(os.path.join(self._season_dir(season_url), key + ".pkl"))
+
+    def manifest(self, season_url):
+        """The season's manifest, or an empty one if there is none or it was written by another parser version"""
+        try:
+            with open(self._manifest_path(season_url), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == self.version:
+                return(manifest)
+        except (OSError, ValueError):
+            pass
+        return({"season_url": season_url, "version": self.version, "complete": False, "weeks": {}})
+
+    def _save_manifest(self, season_url, manifest):
+        data = json.dumps(manifest, indent=2, sort_keys=True)
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+        _write_atomic(self._manifest_path(season_url), write)
+
+    def season_complete(self, season_url):
+        """Whether the season was finished and every output file recorded with it still exists"""
+        manifest = self.manifest(season_url)
+        return(manifest["complete"] and "outputs" in manifest and all(os.path.exists(path) for path in manifest["outputs"]))
+
+    def completed_weeks(self, season_url):
+        """Week urls of the season whose tables are already checkpointed"""
+        weeks = self.manifest(season_url)["weeks"]
+        return(set(url for url, entry in weeks.items()
+                   if os.path.exists(os.path.join(self._season_dir(season_url), entry["file"]))))
+
+    def load_week(self, season_url, week_url):
+        """Return the dict of tables saved for a week"""
+        entry = self.manifest(season_url)["weeks"][week_url]
+        return(pd.read_pickle(os.path.join(self._season_dir(season_url), entry["file"])))
+
+    def save_week(self, season_url, week_url, week_number, tables):
+        """
+        Save the tables parsed from one week page and record the week as done
+
+        tables - dict of table name to DataFrame (or None if the week has no such table)
+        """
+        week_path = self._week_path(season_url, week_url)
+        _write_atomic(week_path, lambda tmp_path: pd.to_pickle(tables, tmp_path))
+
+        manifest = self.manifest(season_url)
+        manifest["weeks"][week_url] = {"week": int(week_number), "file": os.path.basename(week_path)}
+        self._save_manifest(season_url, manifest)
+
+    def mark_season_complete(self, season_url, outputs=()):
+        """Record the season as finished, with the output files it was written to"""
+        manifest = self.manifest(season_url)
+        manifest["complete"] = True
+        manifest["outputs"] = list(outputs)
+        self._save_manifest(season_url, manifest)
@@ -0,0 +1,187 @@
+"""
+Typed, compressed Parquet copies of the CSV outputs
+
+Next to each target and raw CSV the pipeline also writes a Parquet file. The
+columns are typed: dates are dates, issues are timestamps, locations, geo types
+and signal names are dictionary encoded (categorical in pandas) and values are
+floats, so readers don't re-infer types from text. Dates are held as day numbers
+(rvdss_compact) while the table is prepared, rather than as Python `date`
+objects, and written as Parquet dates. Rows are sorted by season,
+location and date, and row groups are split by season and then by location. A
+reader that asks for a few columns and filters on season or location only
+decodes those columns, and skips the other row groups using the statistics
+Parquet stores with them:
+
+    read_columnar(path, columns=['time_value', 'flu_pct_positive'],
+                  filters=[('geo_value', '=', 'on')])
+
+The Parquet files are committed next to their CSVs, so every clone (and the
+report and R scripts) gets them. The scheduled update commits the copies it
+rewrites with the CSVs. The CSVs stay the reference data. A table is typed
+before its CSV is written, so a table that can't be typed raises without
+leaving a CSV and a Parquet copy that disagree. Copies of CSVs edited by hand
+are rewritten with
+
+    python scripts/rvdss_columnar.py target-data/season_2025_2026/target_rvdss_data.csv
+
+pyarrow is optional. Without it the Parquet files are not written, and
+`read_columnar` raises an ImportError.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from rvdss_calendar import epiweeks_from_dates
+from rvdss_compact import MISSING_DAY, day_numbers, parse_timestamps
+
+# Weeks from this one on belong to the season starting that year (see LAST_WEEK_OF_YEAR in rvdss_update)
+SEASON_START_WEEK = 35
+
+CATEGORICAL_COLUMNS = ['geo_type', 'geo_value', 'signal', 'virus', 'season', 'model', 'location', 'target', 'output_type']
+DATE_COLUMNS = ['time_value', 'reference_date', 'target_end_date']
+TIMESTAMP_COLUMNS = ['issue']
+COMPRESSION = "zstd"
+
+
+def available():
+    return(pa is not None)
+
+
+def seasons(time_values):
+    """Season labels (e.g. 2024-2025) of a column of yyyy-mm-dd dates"""
+    weeks = epiweeks_from_dates(pd.Series(time_values).astype(str))
+    start_years = np.where(weeks % 100 >= SEASON_START_WEEK, weeks // 100, weeks // 100 - 1)
+    return(pd.Series([f"{year}-{year + 1}" for year in start_years], dtype=object))
+
+
+def _typed(table):
+    """Give the columns of a table their column types, adding a season column"""
+    table = table.reset_index() if not isinstance(table.index, pd.RangeIndex) else table.copy()
+    if 'time_value' in table.columns and 'season' not in table.columns:
+        table['season'] = seasons(table['time_value']).to_numpy()
+
+    for col in table.columns:
+        if col in DATE_COLUMNS:
+            table[col] = day_numbers(table[col])
+        elif col in TIMESTAMP_COLUMNS:
+            table[col] = parse_timestamps(table[col])
+        elif col in CATEGORICAL_COLUMNS:
+            table[col] = table[col].astype(str).astype('category')
+        elif table[col].dtype == object:
+            numeric = pd.to_numeric(table[col], errors='coerce')
+            if numeric.notna().sum() == table[col].notna().sum():
+                table[col] = numeric
+
+    order = [col for col in ['season', 'geo_value', 'time_value'] if col in table.columns]
+    return(table.sort_values(order, kind='mergesort').reset_index(drop=True) if order else table)
+
+
+def _as_dates(arrow_table, table, columns):
+    """Write the day number columns of `table` into its Arrow table as dates, as if they had been `date` objects"""
+    metadata = json.loads(arrow_table.schema.metadata[b'pandas'])
+    for entry in metadata['columns']:
+        if entry['name'] in columns:
+            entry['pandas_type'], entry['numpy_type'] = 'date', 'object'
+    for col in columns:
+        days = table[col].to_numpy()
+        dates = pa.array(days, type=pa.int32(), mask=days == MISSING_DAY).cast(pa.date32())
+        arrow_table = arrow_table.set_column(arrow_table.schema.get_field_index(col), col, dates)
+    return(arrow_table.replace_schema_metadata({b'pandas': json.dumps(metadata).encode('utf-8')}))
+
+
+def _prepare(table):
+    """The typed table and its Arrow table, raising if a column can't be typed"""
+    table = _typed(table)
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    arrow_table = _as_dates(arrow_table, table, [col for col in DATE_COLUMNS if col in table.columns])
+    return(table, arrow_table)
+
+
+def write_columnar(table, path):
+    """
+    Write a table as Parquet with one row group per season and location
+
+    Returns the path written, or None if pyarrow is not installed.
+    """
+    if not available():
+        return(None)
+    _write_prepared(_prepare(table), path)
+    return(path)
+
+
+def _write_prepared(prepared, path):
+    """Write a `_prepare`d table to path, replacing it in one step"""
+    table, arrow_table = prepared
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".parquet")
+    os.close(fd)
+    with pq.ParquetWriter(tmp_path, arrow_table.schema, compression=COMPRESSION) as writer:
+        groups = [col for col in ['season', 'geo_value'] if col in table.columns]
+        if groups and len(table):
+            changed = (table[groups] != table[groups].shift()).any(axis=1).to_numpy()
+            boundaries = list(np.flatnonzero(changed)) + [len(table)]
+            for start, end in zip(boundaries[:-1], boundaries[1:]):
+                writer.write_table(arrow_table.slice(start, end - start))
+        else:
+            writer.write_table(arrow_table)
+    os.replace(tmp_path, path)
+
+
+def columnar_path(csv_path):
+    """The Parquet file written next to a CSV file"""
+    root, _ = os.path.splitext(csv_path)
+    return(root + ".parquet")
+
+
+def write_csv_and_columnar(table, csv_path, **to_csv_args):
+    """
+    Write a table to csv_path as usual, and its Parquet copy next to it
+
+    The table is typed first, so if it can't be the error is raised before
+    either file is written.
+    """
+    prepared = None
+    if available():
+        prepared = _prepare(table if to_csv_args.get('index', True) else table.reset_index(drop=True))
+    table.to_csv(csv_path, **to_csv_args)
+    if prepared is not None:
+        _write_prepared(prepared, columnar_path(csv_path))
+
+
+def read_columnar(path, columns=None, filters=None):
+    """
+    Read a Parquet file written by `write_columnar` into a DataFrame
+
+    columns - only read these columns
+    filters - pyarrow filters, e.g. [('geo_value', '=', 'on'), ('season', '=', '2024-2025')].
+              Row groups whose statistics rule them out are not read at all.
+    """
+    if not available():
+        raise ImportError("pyarrow is needed to read Parquet files")
+    return(pq.read_table(path, columns=columns, filters=filters).to_pandas())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite the Parquet copies of CSV outputs from the CSVs")
+    parser.add_argument("csv_paths", nargs="+", help="CSV files written by the pipeline")
+    args = parser.parse_args()
+
+    if not available():
+        raise ImportError("pyarrow is needed to write Parquet files")
+    for csv_path in args.csv_paths:
+        print(write_columnar(pd.read_csv(csv_path), columnar_path(csv_path)))
+
+
+if __name__ == '__main__':
+    main()
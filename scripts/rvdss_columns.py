@@ -0,0 +1,68 @@
+"""
+Rewriting of table column names into their canonical form
+
+A `ColumnRewriter` is an ordered list of rules applied to each column name
+in turn. A rule is either (name, pattern, replacement), applied with
+`pattern.sub` on every match, or (name, function) for rewrites that need
+code. An optional mapping of exact names is applied last.
+
+The same headers come up in every week of a season, so each distinct header is
+rewritten once and the result is cached. The rewriter also remembers which
+rules changed each header, so `report()` makes it easy to see how a new
+header variant was handled (or that no rule touched it). Reports of other
+processes are added with `merge`.
+"""
+from collections import Counter
+
+import regex as re
+
+
+class ColumnRewriter:
+    def __init__(self, name, rules, mapping=None):
+        self.name = name
+        self.rules = [self._compile(rule) for rule in rules]
+        self.mapping = dict(mapping or {})
+        self.fired = Counter()
+        self._cache = {}
+
+    def _compile(self, rule):
+        if len(rule) == 2:
+            return(rule)
+        rule_name, pattern, replacement = rule
+        compiled = re.compile(pattern)
+        return((rule_name, lambda column: compiled.sub(replacement, column)))
+
+    def rewrite(self, column):
+        """Return the canonical name of a single column"""
+        cached = self._cache.get(column)
+        if cached is None:
+            new_column = column
+            fired = []
+            for rule_name, rule in self.rules:
+                rewritten = rule(new_column)
+                if rewritten != new_column:
+                    fired.append(rule_name)
+                    new_column = rewritten
+            if new_column in self.mapping:
+                fired.append("mapping")
+                new_column = self.mapping[new_column]
+
+            cached = (new_column, tuple(fired))
+            self._cache[column] = cached
+            self.fired.update(fired)
+        return(cached[0])
+
+    def __call__(self, columns):
+        return([self.rewrite(column) for column in columns])
+
+    def report(self):
+        """Every distinct header seen, with its canonical name and the rules that produced it"""
+        return({column: {"result": result, "rules": list(fired)}
+                for column, (result, fired) in self._cache.items()})
+
+    def merge(self, report):
+        """Add the headers of a `report()` from another process, e.g. a pool worker, to this rewriter's"""
+        for column, entry in report.items():
+            if column not in self._cache:
+                self._cache[column] = (entry["result"], tuple(entry["rules"]))
+                self.fired.update(entry["rules"])
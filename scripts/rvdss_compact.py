@@ -0,0 +1,144 @@
+"""
+Compact in-memory representation of model output and target data
+
+Model output repeats a handful of model, location, target and output_type
+strings on every row, has a few distinct quantile levels, and its dates are
+weeks apart. Held as object strings, float64 and Python `date` objects, a
+season of submissions takes several times the memory it needs, and every
+filter compares strings or date objects row by row. The compact schema is
+
+    model, location, target, output_type - categorical (one byte codes per row)
+    reference_date, target_end_date      - int32 days since 1970-01-01
+    horizon                              - int8
+    output_type_id                       - categorical over the quantile levels (which stay exact float64)
+    value                                - float32
+
+so a filter on a model, a target or a date compares small integers:
+
+    model_data[model_data['reference_date'] == day_number('2025-01-04')]
+
+Target data gets categorical geo_type and geo_value and day number dates, and
+keeps its float64 values, which are written back to the target CSVs.
+
+Day numbers are turned back into timestamps (`timestamps`) or dates (`dates`)
+only where they are shown or written, usually on the unique values of a column.
+
+Dates are read with explicit formats (`parse_timestamps`), yyyy-mm-dd or
+yyyy-mm-dd HH:MM:SS, so pandas 1.2 (pinned by the update job) and later
+versions read them the same way, and a value in neither format raises instead
+of becoming NaT.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64("1970-01-01", "D")
+# Day number of a missing date (int32 has no NaN)
+MISSING_DAY = np.iinfo(np.int32).min
+
+MODEL_OUTPUT_CATEGORIES = ['model', 'location', 'target', 'output_type']
+MODEL_OUTPUT_DATES = ['reference_date', 'target_end_date']
+TARGET_CATEGORIES = ['geo_type', 'geo_value']
+TARGET_DATES = ['time_value', 'time']
+
+DATE_FORMAT = "%Y-%m-%d"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_timestamps(values):
+    """
+    datetime64 of a column of yyyy-mm-dd dates or yyyy-mm-dd HH:MM:SS timestamps (as text, dates or timestamps)
+
+    Missing values are NaT; any other value in neither format raises a ValueError.
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    values = pd.Series(values, index=index)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return(values)
+
+    missing = values.isna().to_numpy()
+    text = values.astype(str).str.strip()
+    timed = (text.str.len() > 10).to_numpy() & ~missing
+    parsed = pd.to_datetime(text.where(~timed & ~missing), format=DATE_FORMAT, errors='coerce')
+    if timed.any():
+        parsed[timed] = pd.to_datetime(text[timed], format=TIMESTAMP_FORMAT, errors='coerce')
+
+    unreadable = parsed.isna().to_numpy() & ~missing
+    if unreadable.any():
+        examples = list(pd.unique(text[unreadable]))[:5]
+        raise ValueError(f"Dates not in yyyy-mm-dd or yyyy-mm-dd HH:MM:SS format: {examples}")
+    return(parsed)
+
+
+def day_numbers(values):
+    """Days since 1970-01-01 (int32) of a column of dates, timestamps or yyyy-mm-dd strings, MISSING_DAY where missing"""
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return(values.to_numpy(dtype=np.int32))
+    days = parse_timestamps(values).to_numpy(dtype='datetime64[D]')
+    numbers = (days - EPOCH).astype(np.int64)
+    numbers[np.isnat(days)] = MISSING_DAY
+    return(numbers.astype(np.int32))
+
+
+def day_number(value):
+    """Day number of a single date, timestamp or yyyy-mm-dd string"""
+    if isinstance(value, (date, str, np.datetime64)):
+        value = pd.Timestamp(value)
+    return(int(day_numbers([value])[0]))
+
+
+def timestamps(days):
+    """Timestamps (datetime64) of a column of day numbers, keeping its index; other dates are parsed as they are"""
+    index = days.index if isinstance(days, pd.Series) else None
+    days = pd.Series(days, index=index)
+    if not pd.api.types.is_integer_dtype(days.dtype):
+        return(parse_timestamps(days))
+    numbers = days.to_numpy(dtype=np.int64)
+    stamps = (EPOCH + numbers.astype('timedelta64[D]')).astype('datetime64[ns]')
+    stamps[numbers == MISSING_DAY] = np.datetime64('NaT')
+    return(pd.Series(stamps, index=index))
+
+
+def dates(days):
+    """`datetime.date` objects of day numbers, e.g. for plotting and file names"""
+    return(list(timestamps(days).dt.date))
+
+
+def compact_model_output(table, value_dtype=np.float32):
+    """
+    Give model output the compact schema, in place, returning it
+
+    value_dtype - dtype of the values; float64 keeps them exactly as submitted,
+                  for results that are written back out (ensembles, scores)
+    """
+    for col in MODEL_OUTPUT_CATEGORIES:
+        if col in table.columns and not isinstance(table[col].dtype, pd.CategoricalDtype):
+            table[col] = table[col].astype('category')
+    for col in MODEL_OUTPUT_DATES:
+        if col in table.columns:
+            table[col] = day_numbers(table[col])
+    if 'horizon' in table.columns and table['horizon'].notna().all():
+        table['horizon'] = table['horizon'].astype(np.int8)
+    if 'output_type_id' in table.columns and not isinstance(table['output_type_id'].dtype, pd.CategoricalDtype):
+        table['output_type_id'] = table['output_type_id'].astype('category')
+    if 'value' in table.columns:
+        table['value'] = table['value'].astype(value_dtype)
+    return(table)
+
+
+def compact_target_data(table):
+    """Give target data categorical locations and day number dates, in place, returning it"""
+    for col in TARGET_CATEGORIES:
+        if col in table.columns:
+            table[col] = table[col].astype(str).astype('category')
+    for col in TARGET_DATES:
+        if col in table.columns:
+            table[col] = day_numbers(table[col])
+    return(table)
+
+
+def load_target_data(path):
+    """Read a target CSV (target_rvdss_data.csv) in the compact schema"""
+    return(compact_target_data(pd.read_csv(path, dtype={col: str for col in TARGET_CATEGORIES})))
@@ -0,0 +1,155 @@
+"""
+A synthetic corpus of report pages and dashboard files, for running offline
+
+The benchmarks (rvdss_bench) and the tests need pages shaped like the ones on
+canada.ca and health-infobase.canada.ca, but a recorded corpus is too large to
+commit and can't be recorded without the internet. `generate` writes one from
+a fixed seed, in the layout of rvdss_fetch.ResponseCache and with the same
+corpus.json manifest as `rvdss_bench.py record`:
+
+    season landing pages   - links to one report page per week, 35 to 34
+    weekly report pages    - the lab detections table and the positive tests (%) tables,
+                             growing by a week every page as on the real site
+    dashboard files        - RVD_UpdateDate.csv, RVD_WeeklyData.csv, RVD_SummaryText.csv, RVD_CurrentWeekTable.csv
+    dashboard archive      - RVD_WeeklyData.csv and RVD_UpdateDate.csv under archive/{date}/ for ARCHIVE_DATES:
+                             the first two hold the same data, the third revises it
+
+The values are random and the pages only carry what the parsers read, so the
+corpus is for timing and testing the code paths, not for looking at the data.
+
+    python scripts/rvdss_corpus.py .cache/bench-corpus
+"""
+import argparse
+import json
+import os
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from epiweeks import Week
+
+from rvdss_fetch import ResponseCache
+from rvdss_update import (DASHBOARD_BASE_URL, DASHBOARD_DATA_FILE, DASHBOARD_UPDATE_DATE_FILE, DASHBOARD_W_DATE_URL,
+                          HISTORIC_SEASON_REPORTS_URL, SEASON_BASE_URL)
+
+CORPUS_MANIFEST = "corpus.json"
+SEASON_START_YEARS = [2018]
+ARCHIVE_DATES = ["2025-10-09", "2025-10-16", "2025-10-23"]
+DASHBOARD_FILES = [DASHBOARD_UPDATE_DATE_FILE, DASHBOARD_DATA_FILE, "RVD_SummaryText.csv", "RVD_CurrentWeekTable.csv"]
+
+LABS = ["Newfoundland", "Prince Edward Island", "Nova Scotia", "New Brunswick", "Province of Québec", "Ontario",
+        "Manitoba", "Saskatchewan", "Alberta", "British Columbia", "Yukon", "Northwest Territories", "Nunavut", "Canada"]
+DETECTION_HEADERS = ["Reporting Laboratory", "Flu Tests", "Flu A", "Flu B", "RSV Tested", "RSV Positive",
+                     "Para Tested", "PIV 1", "Adeno Tested", "Adeno Positive", "hMPV Tested", "hMPV Positive",
+                     "Rhino Tested"]
+REGIONS = ["Can", "At", "QC", "ON", "Pr", "BC", "Terr"]
+DASHBOARD_PROVINCES = ["Canada", "Alberta", "Ontario", "Quebec"]
+DASHBOARD_VIRUSES = ["SARS-CoV-2", "Influenza", "RSV"]
+
+
+def _store(cache, url, text):
+    cache.store(url, SimpleNamespace(content=text.encode("utf-8"), encoding="utf-8", headers={}))
+
+
+def _table(headers, rows):
+    head = "".join(f"<th>{header}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return(f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>")
+
+
+def _positive_table(rng, weeks, virus, flu=False):
+    """A positive tests (%) table by region, with a row for every week of the season so far"""
+    headers = ["Week", "Week End"]
+    for region in REGIONS:
+        headers += [f"{region} Tests"] + ([f"{region} A%", f"{region} B%"] if flu else [f"{virus}%"])
+    rows = []
+    for week in weeks:
+        row = [week.week, week.enddate().strftime("%d-%m-%Y")]
+        for _ in REGIONS:
+            row += [int(rng.integers(100, 3000))] + [round(float(rng.uniform(0, 30)), 1) for _ in range(2 if flu else 1)]
+        rows.append(row)
+    return(_table(headers, rows))
+
+
+def season_pages(cache, rng, start_year):
+    """Write the landing page and week pages of the season starting in start_year, returning its url"""
+    year_range = f"{start_year}-{start_year + 1}"
+    url = HISTORIC_SEASON_REPORTS_URL.format(year_range=year_range)
+    weeks = [Week(start_year, week) for week in range(35, 53)] + [Week(start_year + 1, week) for week in range(1, 35)]
+
+    links = []
+    for i, week in enumerate(weeks):
+        end = week.enddate()
+        path = (f"/en/public-health/services/surveillance/respiratory-virus-detections-canada/{year_range}/"
+                f"week-{week.week}-ending-{end:%B-%d-%Y}.html").lower()
+        links.append(f'<li><a href="{path}">Week {week.week} ending {end:%B %d, %Y}</a></li>')
+
+        detections = _table(DETECTION_HEADERS, [[lab] + list(rng.integers(0, 300, len(DETECTION_HEADERS) - 1))
+                                                for lab in LABS])
+        modified = end + timedelta(days=6)
+        page = (f'<html><head><meta name="dcterms.modified" title="W3CDTF" content="{modified:%Y-%m-%d}"></head><body>'
+                f'<details><summary>Table 1 - Respiratory virus detections for the week ending {end}</summary>{detections}</details>'
+                f'<details><summary>Table 2 - Positive Influenza Tests (%)</summary>{_positive_table(rng, weeks[:i + 1], "flu", flu=True)}</details>'
+                f'<details><summary>Table 3 - Positive RSV Tests (%)</summary>{_positive_table(rng, weeks[:i + 1], "RSV")}</details>'
+                f'<details><summary>Table 4 - Positive Adenovirus Tests (%)</summary>{_positive_table(rng, weeks[:i + 1], "Adeno")}</details>'
+                f'</body></html>')
+        _store(cache, SEASON_BASE_URL + path, page)
+
+    _store(cache, url, f'<html><head><link rel="canonical" href="{url}"></head><body><ul>{"".join(links)}</ul></body></html>')
+    return(url)
+
+
+def dashboard_data(rng, start_year, last_week):
+    """RVD_WeeklyData.csv of the season starting in start_year, up to last_week"""
+    rows = []
+    for week in range(35, last_week + 1):
+        for province in DASHBOARD_PROVINCES:
+            for virus in DASHBOARD_VIRUSES:
+                tests = int(rng.integers(500, 3000))
+                detections = int(rng.integers(0, tests // 5))
+                rows.append({"weekorder": week, "region": "x", "year": start_year, "week": week,
+                             "date": str(Week(start_year, week).enddate()), "province": province, "virus": virus,
+                             "tests": tests, "percentpositive": round(100 * detections / tests, 1),
+                             "detections": detections})
+    return(pd.DataFrame(rows).to_csv(index=False))
+
+
+def generate(corpus, seed=0, start_years=SEASON_START_YEARS, archive_dates=ARCHIVE_DATES):
+    """Write the synthetic corpus to `corpus`, returning its manifest"""
+    cache = ResponseCache(corpus, "revalidate")
+    rng = np.random.default_rng(seed)
+    season_urls = [season_pages(cache, rng, start_year) for start_year in start_years]
+
+    # The live dashboard, and its archive: two snapshots with the same data, then a revision
+    data = dashboard_data(rng, 2025, 41)
+    _store(cache, DASHBOARD_BASE_URL + DASHBOARD_UPDATE_DATE_FILE, "2025-10-17 10:00:00")
+    _store(cache, DASHBOARD_BASE_URL + DASHBOARD_DATA_FILE, data)
+    _store(cache, DASHBOARD_BASE_URL + "RVD_SummaryText.csv", "Section,Type,Text\nsummary,title,Week 41 summary\n")
+    _store(cache, DASHBOARD_BASE_URL + "RVD_CurrentWeekTable.csv", "reportinglaboratory,week\nCanada,41\n")
+
+    archived = [data, data, dashboard_data(rng, 2025, 41)]
+    for archive_date, archive_data in zip(archive_dates, archived):
+        base_url = DASHBOARD_W_DATE_URL.format(date=archive_date)
+        _store(cache, base_url + DASHBOARD_UPDATE_DATE_FILE, f"{archive_date} 10:00:00")
+        _store(cache, base_url + DASHBOARD_DATA_FILE, archive_data)
+
+    manifest = {'season_urls': season_urls, 'dashboard_url': DASHBOARD_BASE_URL, 'dashboard_files': DASHBOARD_FILES,
+                'archive_dates': list(archive_dates[:len(archived)]), 'recorded': f"synthetic (seed {seed})"}
+    with open(os.path.join(corpus, CORPUS_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return(manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic corpus of report pages and dashboard files")
+    parser.add_argument("corpus", help="directory to write the corpus to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate(args.corpus, args.seed)
+    print(f"Wrote {len(manifest['season_urls'])} seasons and the dashboard files to {args.corpus}")
+
+
+if __name__ == '__main__':
+    main()
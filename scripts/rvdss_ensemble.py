@@ -0,0 +1,264 @@
+"""
+Quantile ensembles of the hub's models
+
+The Python counterpart of the ensemble step of hub-model-outputs.R. The
+quantile forecasts of the ensembled models are aligned into one array
+
+    (task, model, quantile level)
+
+where a task is a reference date, location, target, horizon and target end
+date, with NaN where a model didn't forecast a task. Every ensemble is then a
+single reduction over the model axis, for all tasks and rounds at once:
+
+    mean     - mean of the models forecasting each quantile (hubEnsembles::simple_ensemble)
+    median   - their median
+    trimmed  - mean after dropping the lowest and highest `trim` fraction of them
+    weighted - weighted mean, e.g. with `inverse_wis_weights`
+
+`ensemble` then makes the quantiles non-decreasing in the level (`monotone`).
+simple_ensemble doesn't, so with monotonic=False the mean ensemble is the R
+script's, and the command line only makes them non-decreasing when asked
+(--monotone). Rebuilt now, the mean still differs from some published
+Ensemble_v1 rounds, because they were built from the submissions there were
+at the time: AI4Casting_Hub-GPT_4o's files of 2025-02-08 and 2025-02-22
+weren't in yet, a few later rounds were resubmitted after the ensemble, and
+2025-01-11 was written rounded to 1e-9. The ensembles are written as
+hub-format submission files:
+
+    python scripts/rvdss_ensemble.py                                  # last week's round, like the R script
+    python scripts/rvdss_ensemble.py --all --method median --monotone --model-id AI4Casting_Hub-Median_Ensemble \\
+        --output-dir /tmp/ensembles
+
+The weighted ensemble of a round only uses the scores of the rounds before
+it (`weighted_by_round`). Rounds whose models have no scored forecast before
+them (e.g. the first round) are skipped, and it is an error if no round is
+left.
+"""
+import argparse
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from rvdss_compact import day_number, timestamps
+from rvdss_model_output import MODEL_OUTPUT_DIR, load_model_output
+
+ENSEMBLE_MODEL = 'AI4Casting_Hub-Ensemble_v1'
+
+# Models left out of the ensembles: the hub's baseline and ensembles. hub-model-outputs.R also
+# leaves out 'AI4Casting_GPT_4o', which isn't a model id, so AI4Casting_Hub-GPT_4o is ensembled.
+EXCLUDED_MODELS = ['AI4Casting_Hub-Quantile_Baseline', 'AI4Casting_Hub-Ensemble_v1', 'AI4Casting_Hub-Weighted_Ensemble']
+
+TASK_KEYS = ['reference_date', 'location', 'target', 'horizon', 'target_end_date']
+HUB_COLUMNS = ['location', 'horizon', 'reference_date', 'target_end_date', 'target', 'output_type', 'output_type_id', 'value']
+METHODS = ['mean', 'median', 'trimmed', 'weighted']
+
+# Row order of the files hub-model-outputs.R writes
+SORT_KEYS = ['location', 'horizon', 'target_end_date', 'target', 'output_type_id']
+
+
+class AlignedQuantiles:
+    """
+    tasks  - DataFrame of TASK_KEYS, one row per task
+    models - the model ids
+    levels - the quantile levels, sorted
+    values - array of shape (tasks, models, levels), NaN where a model didn't forecast a quantile
+    """
+
+    def __init__(self, tasks, models, levels, values):
+        self.tasks = tasks
+        self.models = list(models)
+        self.levels = np.asarray(levels, dtype=float)
+        self.values = values
+
+    @classmethod
+    def from_model_output(cls, model_data, excluded=EXCLUDED_MODELS):
+        """Align the quantile rows of model output (of one or many rounds) across models"""
+        model_data = model_data[(model_data['output_type'] == 'quantile') & ~model_data['model'].isin(excluded)]
+        tasks = model_data[TASK_KEYS].reset_index(drop=True)
+
+        # Tasks numbered in the order they first appear, which is also the order of drop_duplicates
+        task_codes = tasks.groupby(TASK_KEYS, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+        tasks = tasks.drop_duplicates().reset_index(drop=True)
+        model_codes, models = pd.factorize(model_data['model'].astype(str), sort=True)
+        quantiles = model_data['output_type_id'].to_numpy(dtype=float)
+        levels = np.unique(quantiles[~np.isnan(quantiles)])
+        level_codes = np.searchsorted(levels, quantiles)
+
+        values = np.full((len(tasks), len(models), len(levels)), np.nan)
+        valid = level_codes < len(levels)
+        values[task_codes[valid], model_codes[valid], level_codes[valid]] = model_data['value'].to_numpy(dtype=float)[valid]
+        return(cls(tasks, models, levels, values))
+
+    def select(self, mask):
+        """The tasks where mask (one boolean per task) is true, with the same models and levels"""
+        mask = np.asarray(mask, dtype=bool)
+        return(AlignedQuantiles(self.tasks[mask].reset_index(drop=True), self.models, self.levels, self.values[mask]))
+
+    def ensemble(self, method='mean', weights=None, trim=0.2, monotonic=True):
+        """
+        Combine the models' quantiles, returning an array of shape (tasks, levels)
+
+        weights   - {model: weight} for the weighted ensemble; models without a weight get none, and
+                    it is a ValueError if none of the models has a weight
+        trim      - fraction of the models dropped at each end for the trimmed mean
+        monotonic - make the quantiles non-decreasing in the level (see `monotone`)
+        """
+        values = self.values
+        present = ~np.isnan(values)
+        counts = present.sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if method == 'mean':
+                combined = np.where(present, values, 0).sum(axis=1) / counts
+            elif method == 'median':
+                combined = np.full(counts.shape, np.nan)
+                if counts.any():
+                    combined[counts > 0] = np.nanmedian(values.transpose(0, 2, 1)[counts > 0], axis=-1)
+            elif method == 'trimmed':
+                # Missing values sort last, so the kept ranks of each cell are [k, count - k)
+                ordered = np.sort(values, axis=1)
+                ranks = np.arange(values.shape[1])[None, :, None]
+                k = np.floor(counts * trim).astype(int)[:, None, :]
+                keep = (ranks >= k) & (ranks < counts[:, None, :] - k)
+                combined = np.where(keep, ordered, 0).sum(axis=1) / keep.sum(axis=1)
+            elif method == 'weighted':
+                weights = weights or {}
+                w = np.array([weights.get(model, 0.0) for model in self.models], dtype=float)[None, :, None]
+                if not (w > 0).any():
+                    raise ValueError("None of the models has a weight for the weighted ensemble")
+                w = np.where(present, w, 0)
+                combined = (np.where(present, values, 0) * w).sum(axis=1) / w.sum(axis=1)
+            else:
+                raise ValueError(f"Unknown ensemble method {method!r}, expected one of {METHODS}")
+
+        return(monotone(combined) if monotonic else combined)
+
+    def to_hub_format(self, combined):
+        """Long-format hub submission rows of an ensemble, one per task and level"""
+        levels = np.tile(self.levels, len(self.tasks))
+        table = self.tasks.loc[self.tasks.index.repeat(len(self.levels))].reset_index(drop=True)
+        table['output_type'] = 'quantile'
+        table['output_type_id'] = levels
+        table['value'] = combined.reshape(-1)
+        return(table.dropna(subset=['value'])[HUB_COLUMNS].reset_index(drop=True))
+
+
+def monotone(quantiles):
+    """Make quantiles non-decreasing in the level (the last axis), leaving missing ones missing"""
+    return(np.where(np.isnan(quantiles), np.nan, np.fmax.accumulate(quantiles, axis=-1)))
+
+
+def inverse_wis_weights(scores, before=None):
+    """
+    Weights proportional to 1 / mean WIS of each model
+
+    scores - scores from rvdss_scoring.score
+    before - only use the forecasts of rounds before this reference date
+    """
+    if before is not None:
+        scores = scores[scores['reference_date'] < pd.Timestamp(before)]
+    wis = scores.dropna(subset=['wis']).groupby(scores['model'].astype(str))['wis'].mean()
+    weights = 1 / wis[wis > 0]
+    return((weights / weights.sum()).to_dict())
+
+
+def weighted_by_round(aligned, scores, monotonic=True):
+    """
+    The weighted ensemble of every round, each weighted by `inverse_wis_weights` of the rounds before it
+
+    Only the scores of the ensembled models count. Returns the hub rows of the
+    rounds ensembled, and the reference dates skipped because none of the
+    models forecasting them had a scored forecast before them.
+    """
+    scores = scores[scores['model'].astype(str).isin(aligned.models)]
+    rounds = timestamps(aligned.tasks['reference_date'])
+    tables, skipped = [], []
+    for reference_date in sorted(rounds.unique()):
+        round_quantiles = aligned.select((rounds == reference_date).to_numpy())
+        forecasting = np.asarray(round_quantiles.models)[~np.isnan(round_quantiles.values).all(axis=(0, 2))]
+        weights = inverse_wis_weights(scores, before=reference_date)
+        if not any(weights.get(model, 0.0) > 0 for model in forecasting):
+            skipped.append(pd.Timestamp(reference_date))
+            continue
+        combined = round_quantiles.ensemble('weighted', weights=weights, monotonic=monotonic)
+        tables.append(round_quantiles.to_hub_format(combined))
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=HUB_COLUMNS)
+    return(table, skipped)
+
+
+def _hub_lines(table):
+    """CSV lines of hub rows as R's write.csv writes them: strings and dates quoted, numbers to 15 digits"""
+    fields = []
+    for col in HUB_COLUMNS:
+        values = table[col]
+        if col in ('reference_date', 'target_end_date'):
+            values = '"' + timestamps(values).dt.strftime('%Y-%m-%d') + '"'
+        elif col == 'horizon':
+            values = values.astype(int).astype(str)
+        elif col in ('output_type_id', 'value'):
+            values = values.map(lambda value: f"{value:.15g}")
+        else:
+            values = '"' + values.astype(str) + '"'
+        fields.append(values.to_numpy())
+    header = ",".join(f'"{col}"' for col in HUB_COLUMNS)
+    return([header] + [",".join(row) for row in zip(*fields)])
+
+
+def write_hub_files(table, model_id, output_dir=MODEL_OUTPUT_DIR):
+    """Write one <output_dir>/<model_id>/<reference_date>-<model_id>.csv per round"""
+    table = table.sort_values(SORT_KEYS, kind='mergesort')
+    os.makedirs(os.path.join(output_dir, model_id), exist_ok=True)
+
+    paths = []
+    for reference_date, rows in table.groupby(timestamps(table['reference_date']).dt.strftime('%Y-%m-%d')):
+        path = os.path.join(output_dir, model_id, f"{reference_date}-{model_id}.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(_hub_lines(rows)) + "\n")
+        paths.append(path)
+    return(paths)
+
+
+def last_reference_date(today=None):
+    """The reference date hub-model-outputs.R ensembles: the Saturday before this week's"""
+    today = today or date.today()
+    return(today + timedelta(days=(5 - today.weekday()) % 7) - timedelta(weeks=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build quantile ensembles of the hub's models")
+    parser.add_argument("--reference-date", help="round to ensemble (default: last week's)")
+    parser.add_argument("--all", action="store_true", help="ensemble every round")
+    parser.add_argument("--method", choices=METHODS, default="mean")
+    parser.add_argument("--trim", type=float, default=0.2, help="fraction trimmed at each end (trimmed)")
+    parser.add_argument("--monotone", action="store_true",
+                        help="make the quantiles non-decreasing in the level (the R script doesn't)")
+    parser.add_argument("--model-id", default=ENSEMBLE_MODEL, help="model id to write the ensemble as")
+    parser.add_argument("--output-dir", default=MODEL_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    # The ensemble is written out, so the values are kept exactly as submitted
+    model_data = load_model_output(value_dtype=np.float64)
+    if not args.all:
+        reference_date = day_number(args.reference_date or last_reference_date())
+        model_data = model_data[model_data['reference_date'] == reference_date]
+
+    aligned = AlignedQuantiles.from_model_output(model_data, excluded=EXCLUDED_MODELS + [args.model_id])
+    if args.method == 'weighted':
+        from rvdss_scoring import QuantileForecasts, load_truth, score
+        scores = score(QuantileForecasts.from_model_output(load_model_output(value_dtype=np.float64)), load_truth())
+        table, skipped = weighted_by_round(aligned, scores, monotonic=args.monotone)
+        if skipped:
+            print(f"Skipped {len(skipped)} rounds with no scored forecasts before them: "
+                  f"{', '.join(d.strftime('%Y-%m-%d') for d in skipped)}")
+        if table.empty:
+            raise ValueError("No round has scored forecasts before it, so none can be weighted")
+    else:
+        table = aligned.to_hub_format(aligned.ensemble(args.method, trim=args.trim, monotonic=args.monotone))
+    paths = write_hub_files(table, args.model_id, args.output_dir)
+    print(f"Wrote {len(paths)} {args.method} ensemble files of {len(aligned.models)} models")
+
+
+if __name__ == '__main__':
+    main()
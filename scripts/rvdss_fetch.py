@@ -0,0 +1,285 @@
+"""
+Shared HTTP fetching for the RVDSS scrapers
+
+All requests go through one pooled `requests.Session`, so connections to
+canada.ca and health-infobase.canada.ca are reused instead of reopened for
+every page. `fetch_pages` downloads a batch of urls concurrently with a cap on
+the number of simultaneous requests per host, and returns the page texts in
+the same order as the urls so the parsing that follows stays deterministic.
+
+Responses are kept in an on-disk cache. Bodies are stored once under the hash
+of their content, and each url keeps the ETag/Last-Modified headers it was
+served with so later runs can revalidate with a conditional request instead of
+downloading the body again. Every response is counted in the run metrics
+(see rvdss_metrics): requests, bytes returned and downloaded, and cache hits.
+The cache is controlled with environment variables:
+
+RVDSS_CACHE_DIR  - where the cache lives (default .cache/rvdss-http)
+RVDSS_CACHE_MODE - "revalidate" (default) to send conditional requests,
+                   "offline" to replay from the cache without touching the network,
+                   "off" to bypass the cache entirely
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rvdss_metrics import count
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
+}
+
+# Maximum number of requests in flight to any single host. Keeps the backfill
+# polite to canada.ca while still overlapping the round trips.
+MAX_CONNECTIONS_PER_HOST = 8
+MAX_WORKERS = 16
+REQUEST_TIMEOUT = 60
+
+CACHE_DIR = os.environ.get("RVDSS_CACHE_DIR", os.path.join(".cache", "rvdss-http"))
+CACHE_MODE = os.environ.get("RVDSS_CACHE_MODE", "revalidate")
+CACHE_MODES = ("revalidate", "offline", "off")
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+_HOST_LIMITS = {}
+_CACHE = None
+
+
+class ResponseCache:
+    """
+    Content-addressed store of response bodies plus per-url validators
+
+    <path>/objects/<sha256>  - response body, shared by every url serving it
+    <path>/urls/<sha256>.json - url metadata: body hash, encoding, ETag, Last-Modified
+    """
+
+    def __init__(self, path=CACHE_DIR, mode=CACHE_MODE):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+
+    def _url_path(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return(os.path.join(self.path, "urls", key + ".json"))
+
+    def _object_path(self, digest):
+        return(os.path.join(self.path, "objects", digest))
+
+    def _write_atomic(self, path, data):
+        # Write to a temporary file first so concurrent readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, url):
+        """Return the cached metadata for a url, or None if it has not been seen"""
+        try:
+            with open(self._url_path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return(None)
+        if not os.path.exists(self._object_path(entry["sha256"])):
+            return(None)
+        return(entry)
+
+    def body(self, entry):
+        with open(self._object_path(entry["sha256"]), "rb") as f:
+            return(f.read())
+
+    def store(self, url, response):
+        """Save a 200 response, returning its metadata entry"""
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        if not os.path.exists(self._object_path(digest)):
+            self._write_atomic(self._object_path(digest), content)
+
+        entry = {
+            "url": url,
+            "sha256": digest,
+            "encoding": response.encoding or response.apparent_encoding,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._write_atomic(self._url_path(url), json.dumps(entry).encode("utf-8"))
+        return(entry)
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is None:
+            return(headers)
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return(headers)
+
+
+def create_session(pool_size=MAX_CONNECTIONS_PER_HOST):
+    """Create a session whose connection pool can hold `pool_size` connections per host"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return(session)
+
+
+def get_session():
+    """Return the module-wide session, creating it on first use"""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = create_session()
+    return(_SESSION)
+
+
+def set_session(session):
+    """Replace the module-wide session (e.g. with one routed to a local fixture server)"""
+    global _SESSION
+    with _SESSION_LOCK:
+        _SESSION = session
+
+
+def get_cache():
+    """Return the module-wide response cache, configured from the environment"""
+    global _CACHE
+    with _SESSION_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+    return(_CACHE)
+
+
+def set_cache(cache):
+    """Replace the module-wide response cache (e.g. to point at a fixture directory)"""
+    global _CACHE
+    with _SESSION_LOCK:
+        _CACHE = cache
+
+
+def _host_limit(url):
+    host = urlsplit(url).netloc
+    with _SESSION_LOCK:
+        if host not in _HOST_LIMITS:
+            _HOST_LIMITS[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+    return(_HOST_LIMITS[host])
+
+
+def _decode(content, encoding):
+    return(content.decode(encoding or "utf-8", errors="replace"))
+
+
+def _counted(content, encoding, downloaded, cache_hit=False):
+    count("requests")
+    count("bytes_fetched", len(content))
+    if downloaded:
+        count("bytes_downloaded", len(content))
+    if cache_hit:
+        count("cache_hits")
+    return(content, encoding)
+
+
+def fetch_bytes(url, session=None, cache=None, raise_for_status=False):
+    """
+    Download a single url through the cache and return (body, encoding)
+
+    In offline mode a url missing from the cache raises a ConnectionError,
+    which callers already treat like any other failed download.
+
+    raise_for_status - if True, error responses raise an HTTPError instead of
+                       returning the body of the error page
+    """
+    cache = cache or get_cache()
+    if cache.mode == "off":
+        session = session or get_session()
+        with _host_limit(url):
+            response = session.get(url, timeout=REQUEST_TIMEOUT)
+        if raise_for_status:
+            response.raise_for_status()
+        return(_counted(response.content, response.encoding or response.apparent_encoding, downloaded=True))
+
+    entry = cache.lookup(url)
+    if cache.mode == "offline":
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f"{url} is not in the cache at {cache.path} (offline mode)")
+        return(_counted(cache.body(entry), entry["encoding"], downloaded=False, cache_hit=True))
+
+    session = session or get_session()
+    with _host_limit(url):
+        response = session.get(url, headers=cache.conditional_headers(entry), timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 304 and entry is not None:
+        return(_counted(cache.body(entry), entry["encoding"], downloaded=False, cache_hit=True))
+
+    if response.status_code == 200:
+        entry = cache.store(url, response)
+        return(_counted(response.content, entry["encoding"], downloaded=True))
+
+    if raise_for_status:
+        response.raise_for_status()
+    return(_counted(response.content, response.encoding or response.apparent_encoding, downloaded=True))
+
+
+def fetch_text(url, session=None, encoding=None, cache=None, raise_for_status=False):
+    """
+    Download a single url and return the body as text
+
+    encoding - if given, overrides the encoding of the response
+    """
+    content, response_encoding = fetch_bytes(url, session, cache, raise_for_status)
+    return(_decode(content, encoding or response_encoding))
+
+
+def fetch_pages(urls, session=None, max_workers=MAX_WORKERS, cache=None):
+    """
+    Download all urls concurrently and return their texts in the order given
+
+    Any `requests.exceptions.RequestException` raised while downloading is
+    re-raised here, so callers can keep their existing retry handling.
+    """
+    urls = list(urls)
+    if not urls:
+        return([])
+
+    session = session or get_session()
+    workers = max(1, min(max_workers, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pages = list(pool.map(lambda u: fetch_text(u, session, cache=cache), urls))
+    return(pages)
+
+
+def fetch_available(urls, session=None, max_workers=MAX_WORKERS, cache=None):
+    """
+    Download all urls concurrently like `fetch_pages`, returning None for urls that don't exist (404/410)
+
+    Used for enumerating urls that may or may not have been published, such as
+    the dashboard's dated archive. Other errors are re-raised.
+    """
+    urls = list(urls)
+    if not urls:
+        return([])
+
+    def fetch(url):
+        try:
+            return(fetch_text(url, session, cache=cache, raise_for_status=True))
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code in (404, 410):
+                return(None)
+            raise
+
+    session = session or get_session()
+    workers = max(1, min(max_workers, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pages = list(pool.map(fetch, urls))
+    return(pages)
@@ -0,0 +1,36 @@
+"""
+Reduction of the rows reported for the same week and location across issues
+
+Every issue of the reports and the dashboard repeats the data for earlier
+weeks, so the target table keeps one row per (time_value, geo_type, geo_value):
+the row from the latest issue, with its missing values filled from the rows
+that follow it for the same key. This used to be a `groupby().apply()` calling
+`bfill` on every group from Python, which was the slowest step of the update.
+Here the rows are filled with the cythonised `GroupBy.bfill` in one call,
+and the latest issue per key is picked by the same sort as before, so the
+rows chosen and their order are the same as before.
+"""
+KEY_COLUMNS = ['time_value', 'geo_type', 'geo_value']
+
+
+def coalesce_latest_issue(df, keys=KEY_COLUMNS, issue='issue'):
+    """
+    Keep the row of the latest issue for each key, filling its missing values
+
+    Within each key, rows are taken in their order in `df` and missing values
+    are backfilled from the later rows, then the row with the latest `issue` is
+    kept. Rows with a missing key are dropped. The result is sorted by issue,
+    latest first.
+    """
+    keys = list(keys)
+    keyed = df.dropna(subset=keys)
+
+    # GroupBy.bfill fills each key from its own later rows and leaves the rows in
+    # their order in `df`, as apply did; the sort below isn't stable, so the order
+    # it starts from decides which of two rows with the same issue is kept
+    filled = keyed.groupby(keys, sort=False).bfill()
+    filled[keys] = keyed[keys]
+    filled = filled[keyed.columns]
+
+    latest = filled.sort_values(by=issue, ascending=False)
+    return(latest.drop_duplicates(subset=keys, keep='first'))
@@ -0,0 +1,265 @@
+"""
+Stage timings and counters of a pipeline run, written as a JSON run report
+
+Code marks its stages with `stage` (or `timed` for whole functions) and counts
+what it handles with `count`:
+
+    @timed("process_tables")
+    def process_tables(...):
+        count("rows_in", len(table))
+        with stage("derive"):
+            ...
+
+For every stage the report has the number of calls, wall and CPU time
+(including finished child processes), the counters incremented while it ran
+(bytes fetched, pages and tables parsed, rows in and out, cache hits...) and
+how much the peak memory (max RSS) of the process grew. Stages are nested: a
+stage started inside another is reported as "outer/inner". Counters are
+process-wide, so those incremented by the download threads of a stage are
+counted in it.
+
+`run_report` wraps a whole run: it writes the report when the run ends, also
+when it fails, and can profile the run at the same time:
+
+    with run_report("rvdss_update"):
+        update()
+
+RVDSS_RUN_DIR  - where the run report (run_report.json) and profiles are written (default .cache/rvdss-run)
+RVDSS_PROFILE  - "cprofile" to profile the run with cProfile (profile.prof and profile.txt),
+                 "sample" to sample the stack of the main thread (profile.folded, for flame graphs)
+RVDSS_PROFILE_INTERVAL - seconds between stack samples (default 0.005)
+"""
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RUN_DIR = os.environ.get("RVDSS_RUN_DIR", os.path.join(".cache", "rvdss-run"))
+RUN_REPORT_FILE = "run_report.json"
+PROFILE = os.environ.get("RVDSS_PROFILE", "")
+PROFILE_MODES = ("", "cprofile", "sample")
+PROFILE_INTERVAL = float(os.environ.get("RVDSS_PROFILE_INTERVAL", 0.005))
+
+_METRICS = None
+_METRICS_LOCK = threading.Lock()
+
+
+def peak_memory_mb(children=False):
+    """Peak resident memory of this process (or its largest finished child) so far, in MB (None where it can't be read)"""
+    if resource is None:
+        return(None)
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024)
+
+
+def _cpu_time():
+    """CPU time of this process and its finished children (e.g. process pools)"""
+    times = os.times()
+    return(times.user + times.system + times.children_user + times.children_system)
+
+
+class RunMetrics:
+    """
+    stages   - {path: {'calls', 'wall', 'cpu', 'memory_growth_mb', 'counters'}}, in the order stages started
+    counters - totals of the run
+    """
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.stages = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._stack = []
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    @contextmanager
+    def stage(self, name):
+        path = "/".join(self._stack + [name])
+        with self._lock:
+            record = self.stages.setdefault(path, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'memory_growth_mb': 0.0,
+                                                   'counters': Counter()})
+            counters = Counter(self.counters)
+        memory = peak_memory_mb()
+        wall, cpu = time.perf_counter(), _cpu_time()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            with self._lock:
+                record['calls'] += 1
+                record['wall'] += time.perf_counter() - wall
+                record['cpu'] += _cpu_time() - cpu
+                if memory is not None:
+                    record['memory_growth_mb'] += peak_memory_mb() - memory
+                record['counters'].update(self.counters - counters)
+
+    def merge(self, report):
+        """Add the stages and counters of a report from another process, under the current stage"""
+        prefix = "/".join(self._stack)
+        with self._lock:
+            for path, other in report['stages'].items():
+                record = self.stages.setdefault(f"{prefix}/{path}" if prefix else path,
+                                                {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'memory_growth_mb': 0.0,
+                                                 'counters': Counter()})
+                for key in ['calls', 'wall', 'cpu', 'memory_growth_mb']:
+                    record[key] += other[key]
+                record['counters'].update(other['counters'])
+            self.counters.update(report['counters'])
+
+    def report(self):
+        with self._lock:
+            return({
+                'started': self.started.strftime("%Y-%m-%d %H:%M:%S"),
+                'wall': (datetime.now() - self.started).total_seconds(),
+                'peak_memory_mb': peak_memory_mb(),
+                'peak_memory_children_mb': peak_memory_mb(children=True),
+                'counters': dict(self.counters),
+                'stages': {path: dict(record, counters=dict(record['counters'])) for path, record in self.stages.items()},
+            })
+
+
+def get_metrics():
+    """Return the metrics of the current run, creating them on first use"""
+    global _METRICS
+    with _METRICS_LOCK:
+        if _METRICS is None:
+            _METRICS = RunMetrics()
+    return(_METRICS)
+
+
+def reset_metrics():
+    """Start new metrics for this process (e.g. in a pool worker), returning them"""
+    global _METRICS
+    with _METRICS_LOCK:
+        _METRICS = RunMetrics()
+    return(_METRICS)
+
+
+def count(name, n=1):
+    get_metrics().count(name, n)
+
+
+def stage(name):
+    return(get_metrics().stage(name))
+
+
+def timed(name):
+    """Decorator timing every call of a function as a stage"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return(function(*args, **kwargs))
+        return(wrapper)
+    return(decorator)
+
+
+class StackSampler:
+    """
+    Samples the stack of a thread (the main thread by default) every `interval` seconds, as counts of folded stacks
+
+    Only one thread is sampled, so threads waiting for work (download and pool
+    threads) don't swamp the samples; the main thread waiting on them shows as
+    the stage that started them.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        """Folded stacks ("frame;frame;frame count"), the input of flamegraph.pl and speedscope"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, samples in self.samples.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+@contextmanager
+def profiled(directory=RUN_DIR, mode=PROFILE):
+    """Profile the block with cProfile or the stack sampler (see RVDSS_PROFILE), writing the profile to `directory`"""
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}")
+    if not mode:
+        yield
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, "profile.prof"))
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(60)
+            with open(os.path.join(directory, "profile.txt"), "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+    else:
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(os.path.join(directory, "profile.folded"))
+
+
+@contextmanager
+def run_report(name, directory=RUN_DIR, profile=PROFILE):
+    """Collect the metrics of a run (and profile it), writing <directory>/run_report.json when it ends"""
+    metrics = reset_metrics()
+    status, error = "ok", None
+    try:
+        with profiled(directory, profile):
+            yield metrics
+    except BaseException as e:
+        status, error = "failed", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        report = dict(metrics.report(), run=name, status=status, error=error, profile=profile or None,
+                      python=platform.python_version(), platform=platform.platform(), cpus=os.cpu_count())
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, RUN_REPORT_FILE), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
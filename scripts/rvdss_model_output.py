@@ -0,0 +1,233 @@
+"""
+Loading of the hub submissions under model-output/
+
+Every file model-output/<model>/<date>-<model>.csv is parsed once, with the
+dates and output_type_id normalised, and the parsed table is cached on disk
+under the sha256 of the file's content. Each run only stats the files: a file
+whose mtime and size haven't changed is taken from the cache without being
+read, a touched file is hashed and re-parsed only if its content changed, and
+new or changed files are parsed in parallel. The concatenation of all files is
+cached too, so a run where nothing changed loads a single pickle.
+
+Dates are normalised the way concat-model-op.R does it: yyyy-mm-dd and
+dd/mm/yyyy (or dd-mm-yyyy) dates, or numbers of days since 1970-01-01. Rows
+whose reference_date or target_end_date can't be read are dropped.
+
+The concatenation is returned in the compact schema of rvdss_compact:
+categorical keys, int32 day numbers for the dates and float32 values (or
+float64, for callers that write the values back out).
+
+    python scripts/rvdss_model_output.py
+
+writes auxiliary-data/concatenated_model_output.csv (and a Parquet copy if
+pyarrow is installed) like concat-model-op.R.
+
+RVDSS_MODEL_CACHE_DIR - where the cache lives (default .cache/model-output)
+"""
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rvdss_compact import compact_model_output, timestamps
+
+MODEL_OUTPUT_DIR = "model-output"
+CONCATENATED_OUTPUT_FILE = os.path.join("auxiliary-data", "concatenated_model_output.csv")
+CACHE_DIR = os.environ.get("RVDSS_MODEL_CACHE_DIR", os.path.join(".cache", "model-output"))
+PARSE_WORKERS = int(os.environ.get("RVDSS_PARSE_WORKERS", os.cpu_count() or 1))
+
+# Bump when the parsed or concatenated format changes, so cached tables are parsed again
+PARSER_VERSION = 2
+
+DATE_COLUMNS = ['reference_date', 'target_end_date']
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    os.close(fd)
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def scan(root=MODEL_OUTPUT_DIR):
+    """(model, path) of every submission file, ordered by model and file name"""
+    files = []
+    for model in sorted(os.listdir(root)):
+        model_dir = os.path.join(root, model)
+        if not os.path.isdir(model_dir):
+            continue
+        for name in sorted(os.listdir(model_dir)):
+            if name.endswith(".csv"):
+                files.append((model, os.path.join(model_dir, name)))
+    return(files)
+
+
+def normalise_dates(values):
+    """Dates from yyyy-mm-dd, dd/mm/yyyy, dd-mm-yyyy or day counts since 1970-01-01, NaT otherwise"""
+    text = pd.Series(values).astype(str).str.strip()
+    iso = pd.to_datetime(text, format="%Y-%m-%d", errors="coerce")
+    day_first = pd.to_datetime(text.str.replace("/", "-", regex=False), format="%d-%m-%Y", errors="coerce")
+    dates = iso.fillna(day_first)
+
+    # Only numbers that can be day counts (not e.g. 20250104) are converted
+    days = pd.to_numeric(text, errors="coerce")
+    days = days[dates.isna() & (days.abs() < 1e5)]
+    if len(days):
+        dates[days.index] = pd.Timestamp("1970-01-01") + pd.to_timedelta(days.round(), unit="D")
+    return(dates)
+
+
+def parse_file(path):
+    """Read one submission file, with dates as datetime64 and output_type_id as a number"""
+    table = pd.read_csv(path, dtype={'location': str, 'target': str, 'output_type': str, 'output_type_id': str})
+    for col in DATE_COLUMNS:
+        table[col] = normalise_dates(table[col])
+    table = table.dropna(subset=DATE_COLUMNS)
+    table['output_type_id'] = pd.to_numeric(table['output_type_id'], errors='coerce')
+    table['value'] = pd.to_numeric(table['value'], errors='coerce')
+    return(table.reset_index(drop=True))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return(digest.hexdigest())
+
+
+class ModelOutputCache:
+    """
+    <path>/files.json                - mtime, size and sha256 of every file seen
+    <path>/objects/<sha256>-v<n>.pkl - parsed table of each distinct file content
+    <path>/concatenated-<key>.pkl    - all files concatenated, for the set of contents in <key>
+    """
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+
+    def _manifest_path(self):
+        return(os.path.join(self.path, "files.json"))
+
+    def _object_path(self, digest):
+        return(os.path.join(self.path, "objects", f"{digest}-v{PARSER_VERSION}.pkl"))
+
+    def _concatenated_path(self, key):
+        return(os.path.join(self.path, f"concatenated-{key}.pkl"))
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return(json.load(f))
+        except (OSError, ValueError):
+            return({})
+
+    def save_manifest(self, manifest):
+        data = json.dumps(manifest, indent=2, sort_keys=True)
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+        _write_atomic(self._manifest_path(), write)
+
+    def digests(self, files):
+        """
+        The sha256 of each file, hashing only files whose mtime or size changed
+
+        Returns the digests in the order of `files` and the updated manifest.
+        """
+        manifest = self.manifest()
+        digests = []
+        for _, path in files:
+            stat = os.stat(path)
+            entry = manifest.get(path)
+            if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": _sha256(path)}
+                manifest[path] = entry
+            digests.append(entry["sha256"])
+        return(digests, manifest)
+
+    def has(self, digest):
+        return(os.path.exists(self._object_path(digest)))
+
+    def load(self, digest):
+        return(pd.read_pickle(self._object_path(digest)))
+
+    def store(self, digest, table):
+        _write_atomic(self._object_path(digest), lambda tmp_path: pd.to_pickle(table, tmp_path))
+
+    def load_concatenated(self, key):
+        path = self._concatenated_path(key)
+        return(pd.read_pickle(path) if os.path.exists(path) else None)
+
+    def store_concatenated(self, key, table):
+        path = self._concatenated_path(key)
+        _write_atomic(path, lambda tmp_path: pd.to_pickle(table, tmp_path))
+        for name in os.listdir(self.path):
+            if name.startswith("concatenated-") and os.path.join(self.path, name) != path:
+                os.remove(os.path.join(self.path, name))
+
+
+def _concatenate(files, tables):
+    tables = [table.assign(model=model) for (model, _), table in zip(files, tables)]
+    if not tables:
+        model_data = pd.DataFrame(columns=DATE_COLUMNS + ['model', 'value'])
+    else:
+        model_data = pd.concat(tables, axis=0, ignore_index=True)
+
+    # The values are cached as submitted, and only made float32 when loaded
+    return(compact_model_output(model_data, value_dtype=np.float64))
+
+
+def load_model_output(root=MODEL_OUTPUT_DIR, cache=None, workers=PARSE_WORKERS, value_dtype=np.float32):
+    """
+    All submissions under `root` in one DataFrame, with a `model` column, in the compact schema
+
+    Only files that are new or whose content changed since the last run are parsed.
+
+    value_dtype - dtype of the values (np.float64 to keep them exactly as submitted)
+    """
+    cache = cache or ModelOutputCache()
+    files = scan(root)
+    digests, manifest = cache.digests(files)
+
+    key = hashlib.sha256(json.dumps([PARSER_VERSION] + [[model, digest] for (model, _), digest in zip(files, digests)])
+                         .encode("utf-8")).hexdigest()[:16]
+    model_data = cache.load_concatenated(key)
+    if model_data is not None:
+        cache.save_manifest(manifest)
+        return(model_data.astype({'value': value_dtype}, copy=False))
+
+    to_parse = {digest: path for (_, path), digest in zip(files, digests) if not cache.has(digest)}
+    if to_parse:
+        paths = list(to_parse.values())
+        if workers <= 1 or len(paths) <= 1:
+            parsed = [parse_file(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+                parsed = list(pool.map(parse_file, paths))
+        for digest, table in zip(to_parse, parsed):
+            cache.store(digest, table)
+
+    model_data = _concatenate(files, [cache.load(digest) for digest in digests])
+    cache.store_concatenated(key, model_data)
+    cache.save_manifest(manifest)
+    return(model_data.astype({'value': value_dtype}, copy=False))
+
+
+def main():
+    from rvdss_columnar import write_csv_and_columnar
+
+    model_data = load_model_output(value_dtype=np.float64)
+    for col in DATE_COLUMNS:
+        model_data[col] = timestamps(model_data[col])
+    write_csv_and_columnar(model_data, CONCATENATED_OUTPUT_FILE, index=False)
+    print(f"Wrote {len(model_data)} rows from {model_data['model'].nunique()} models to {CONCATENATED_OUTPUT_FILE}")
+
+
+if __name__ == '__main__':
+    main()
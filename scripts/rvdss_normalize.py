@@ -0,0 +1,120 @@
+"""
+Normalisation of virus and location names
+
+The patterns built from VIRUSES and GEOS are compiled once at import, and the
+results are memoised: the reports and dashboard files only ever use a few
+dozen distinct province and virus spellings, so after the first few rows every
+call is a dictionary lookup. The `_series` versions normalise a whole column by
+working on its unique values only.
+"""
+from functools import lru_cache
+
+import regex as re
+
+VIRUSES = {
+    "parainfluenza": "hpiv",
+    "piv": "hpiv",
+    "para": "hpiv",
+    "adenovirus": "adv",
+    "adeno": "adv",
+    "human metapneumovirus": "hmpv",
+    "enterovirus/rhinovirus": "ev_rv",
+    "rhinovirus": "ev_rv",
+    "rhv": "ev_rv",
+    "entero/rhino": "ev_rv",
+    "rhino":"ev_rv",
+    "ev/rv":"ev_rv",
+    "coronavirus":"hcov",
+    "coron":"hcov",
+    "coro":"hcov",
+    "respiratory syncytial virus":"rsv",
+    "influenza":"flu",
+    "sars-cov-2":"sarscov2",
+}
+
+GEOS = {
+    "newfoundland": "nl",
+    "newfoundland and labrador": "nl",
+    "prince edward island":"pe",
+    "nova scotia":"ns",
+    "new brunswick":"nb",
+    "québec":"qc",
+    "quebec":"qc",
+    "ontario":"on",
+    "manitoba" : "mb",
+    "saskatchewan":"sk",
+    "alberta": "ab",
+    "british columbia" :"bc",
+    "yukon" : "yt",
+    "northwest territories" : "nt",
+    "nunavut" : "nu",
+    "canada":"ca",
+    "can":"ca" ,
+    "at":"atlantic",
+    "atl":"atlantic",
+    "pr" :"prairies" ,
+    "terr" :"territories",
+ }
+
+# Regions are groups of provinces that are geographically close together. Some single provinces are reported as their own region (e.g. Québec, Ontario).
+REGIONS = ['atlantic','atl','at','province of québec','québec','qc','province of ontario','ontario','on',
+            'prairies', 'pr', "british columbia",'bc',"territories",'terr',]
+NATION = ["canada","can",'ca',]
+
+VIRUS_PATTERN = re.compile(r'\b(' + '|'.join(re.escape(k) for k in VIRUSES.keys()) + r')\b')
+GEO_PATTERN = re.compile(r'^\b(' + '|'.join(re.escape(k) for k in GEOS.keys()) + r')\b$')
+
+_GEO_CLEANUP = (
+    (re.compile("province of "), ""),
+    (re.compile(r"\.|\*"), ""),
+    (re.compile("/territoires"), ""),
+    (re.compile("^cana$"), "can"),
+)
+
+_NATION = frozenset(NATION)
+_REGIONS = frozenset(REGIONS)
+
+
+@lru_cache(maxsize=None)
+def abbreviate_virus(full_name):
+    lowercase=full_name.lower()
+    result = VIRUS_PATTERN.sub(lambda x: VIRUSES[x.group()], lowercase)
+    return(result)
+
+
+@lru_cache(maxsize=None)
+def abbreviate_geo(full_name):
+    lowercase=full_name.lower()
+    for pattern, replacement in _GEO_CLEANUP:
+        lowercase = pattern.sub(replacement, lowercase)
+
+    result = GEO_PATTERN.sub(lambda x: GEOS[x.group()], lowercase)
+    return(result)
+
+
+def create_geo_types(geo,default_geo):
+    if geo in _NATION:
+        geo_type="nation"
+    elif geo in _REGIONS:
+        geo_type="region"
+    else:
+        geo_type = default_geo
+    return(geo_type)
+
+
+def _map_unique(series, func):
+    """Apply `func` to each distinct value of a Series and broadcast the results back"""
+    mapping = {value: func(value) for value in series.unique()}
+    return(series.map(mapping))
+
+
+def abbreviate_virus_series(series):
+    return(_map_unique(series, abbreviate_virus))
+
+
+def abbreviate_geo_series(series):
+    return(_map_unique(series, abbreviate_geo))
+
+
+def create_geo_types_series(series, default_geo):
+    return(_map_unique(series, lambda geo: create_geo_types(geo, default_geo)))
@@ -0,0 +1,122 @@
+"""
+Quantile forecasts of one reference date as a dense array
+
+The report draws one panel per target, location and model, from the forecast
+quantiles of each target_end_date. Instead of filtering the model output for
+every panel, `QuantileCube` pivots it once into an array indexed by
+
+    (target, location, model, target_end_date, quantile)
+
+with NaN where a model didn't forecast a quantile. A panel is then a slice of
+the array, and the labels of each axis map to their position with a dict.
+
+Rows forecasting the same quantile twice are averaged, as the report did.
+Categorical and day number columns (rvdss_compact) are factorized from their
+codes; target_end_date labels are `datetime.date`s either way.
+"""
+import numpy as np
+import pandas as pd
+
+from rvdss_compact import dates
+
+# Columns of `QuantileCube.intervals` and the quantile each of them holds
+INTERVALS = {
+    'median': 0.5,
+    'lower_95': 0.025,
+    'upper_95': 0.975,
+    'lower_50': 0.25,
+    'upper_50': 0.75,
+}
+
+AXES = ['target', 'location', 'model', 'target_end_date']
+
+
+class QuantileCube:
+    def __init__(self, model_data):
+        """
+        model_data - quantile forecasts (target, location, model, target_end_date,
+                     output_type_id, value), usually those of one reference date
+        """
+        codes = []
+        self.labels = {}
+        for axis in AXES:
+            column = model_data[axis]
+            axis_codes, labels = pd.factorize(column, sort=(axis == 'target_end_date'))
+            codes.append(axis_codes)
+            if axis == 'target_end_date' and pd.api.types.is_integer_dtype(column.dtype):
+                labels = dates(labels)
+            self.labels[axis] = list(labels)
+        self.positions = {axis: {label: i for i, label in enumerate(labels)} for axis, labels in self.labels.items()}
+
+        quantiles = model_data['output_type_id'].to_numpy(dtype=float)
+        is_quantile = ~np.isnan(quantiles)
+        self.quantiles = np.unique(quantiles[is_quantile])
+        quantile_codes = np.searchsorted(self.quantiles, quantiles[is_quantile])
+
+        shape = tuple(len(self.labels[axis]) for axis in AXES)
+        values = model_data['value'].to_numpy(dtype=float)[is_quantile]
+        index = tuple(axis_codes[is_quantile] for axis_codes in codes) + (quantile_codes,)
+        sums = np.zeros(shape + (len(self.quantiles),))
+        counts = np.zeros(shape + (len(self.quantiles),), dtype=np.int64)
+        np.add.at(sums, index, values)
+        np.add.at(counts, index, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.values = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+        # Dates each model has any row for, and the row each model first appears on in a panel,
+        # so panels list the same dates and models in the same order as the rows
+        self.present = np.zeros(shape, dtype=bool)
+        self.present[tuple(codes)] = True
+        self.rows = len(model_data)
+        self.first_row = np.full(shape[:3], self.rows, dtype=np.int64)
+        np.minimum.at(self.first_row, tuple(codes[:3]), np.arange(len(model_data)))
+
+        self.quantile_positions = {q: i for i, q in enumerate(self.quantiles)}
+
+    @property
+    def targets(self):
+        """Targets in the order they first appear"""
+        return(self.labels['target'])
+
+    def locations(self, target):
+        """Locations with forecasts for a target, in the order they first appear"""
+        t = self.positions['target'][target]
+        present = self.present[t].any(axis=(1, 2))
+        return([label for label, p in zip(self.labels['location'], present) if p])
+
+    def models(self, target, location):
+        """Models forecasting a target at a location, in the order they first appear"""
+        t, l = self.positions['target'][target], self.positions['location'][location]
+        first_row = self.first_row[t, l]
+        order = np.argsort(first_row, kind='stable')
+        return([self.labels['model'][m] for m in order if first_row[m] < self.rows])
+
+    def quantile(self, target, location, model, q):
+        """Forecasts of one quantile for every target_end_date (NaN where missing)"""
+        t, l, m = self.positions['target'][target], self.positions['location'][location], self.positions['model'][model]
+        if q not in self.quantile_positions:
+            return(np.full(len(self.labels['target_end_date']), np.nan))
+        return(self.values[t, l, m, :, self.quantile_positions[q]])
+
+    def value_range(self, target, location, q=0.5):
+        """Smallest and largest forecast of a quantile over all models and dates"""
+        t, l = self.positions['target'][target], self.positions['location'][location]
+        if q not in self.quantile_positions:
+            return(np.nan, np.nan)
+        values = self.values[t, l, :, :, self.quantile_positions[q]]
+        if np.isnan(values).all():
+            return(np.nan, np.nan)
+        return(np.nanmin(values), np.nanmax(values))
+
+    def intervals(self, target, location, model, intervals=INTERVALS):
+        """
+        One row per target_end_date the model forecast, with the median and interval bounds
+
+        Bounds the model didn't forecast are NaN.
+        """
+        t, l, m = self.positions['target'][target], self.positions['location'][location], self.positions['model'][model]
+        dates = self.present[t, l, m]
+        table = {'target_end_date': [d for d, p in zip(self.labels['target_end_date'], dates) if p]}
+        for name, q in intervals.items():
+            table[name] = self.quantile(target, location, model, q)[dates]
+        return(pd.DataFrame(table))
@@ -0,0 +1,248 @@
+"""
+Rendering of multi-page PDF reports in parallel
+
+A report is a list of pages and a function `draw(page)` that draws one page
+into a matplotlib figure. `render_pdf` draws the pages in a process pool, each
+worker saving its figure as a single-page (vector) PDF in memory, and then
+copies the pages into one file in their original order with pypdf. Drawing and
+saving a page is what takes the time, so the report is written about as many
+times faster as there are cores.
+
+Drawn pages are kept in a `PageCache`, under a hash of everything the page is
+drawn from: the page's data (its forecast intervals, truth series, titles and
+limits), the source of the module drawing it and the matplotlib version. When
+the report is rebuilt only the pages whose inputs changed are drawn again -
+a late submission redraws the pages of its model, a truth revision the pages of
+its region - and if no page changed the report isn't written at all.
+
+pypdf is optional: without it the pages are drawn one after another into a
+PdfPages file as before, with no page cache.
+
+RVDSS_RENDER_WORKERS  - number of processes drawing pages (default: number of CPUs)
+RVDSS_PAGE_CACHE_DIR  - where drawn pages are kept (default .cache/report-pages)
+RVDSS_PAGE_CACHE_DAYS - pages not used for this many days are removed (default 90)
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = None
+    PdfWriter = None
+
+RENDER_WORKERS = int(os.environ.get("RVDSS_RENDER_WORKERS", os.cpu_count() or 1))
+PAGE_CACHE_DIR = os.environ.get("RVDSS_PAGE_CACHE_DIR", os.path.join(".cache", "report-pages"))
+PAGE_CACHE_DAYS = int(os.environ.get("RVDSS_PAGE_CACHE_DAYS", 90))
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    # mkstemp creates files only the owner can read; reports are published
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def _update_digest(digest, value):
+    """Feed a page's data into a hash: dicts, lists, DataFrames, arrays and scalars"""
+    if isinstance(value, dict):
+        digest.update(b"dict")
+        for key in sorted(value):
+            _update_digest(digest, key)
+            _update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"list{len(value)}".encode("utf-8"))
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, pd.DataFrame):
+        digest.update(f"frame{value.shape}".encode("utf-8"))
+        for col in value.columns:
+            values = value[col].to_numpy()
+            digest.update(f"{col}:{values.dtype}".encode("utf-8"))
+            if values.dtype == object:
+                digest.update("\x1f".join(map(str, values)).encode("utf-8"))
+            else:
+                digest.update(np.ascontiguousarray(values).tobytes())
+    elif isinstance(value, (pd.Series, np.ndarray)):
+        _update_digest(digest, pd.DataFrame({'value': value}))
+    else:
+        digest.update(repr(value).encode("utf-8"))
+
+
+def drawing_version(draw):
+    """Hash of the code drawing the pages, so pages are redrawn when it changes"""
+    digest = hashlib.sha256(matplotlib.__version__.encode("utf-8"))
+    module = sys.modules.get(draw.__module__)
+    source = getattr(module, "__file__", None)
+    if source and os.path.exists(source):
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    digest.update(draw.__qualname__.encode("utf-8"))
+    return(digest.hexdigest())
+
+
+def page_digest(page, version):
+    digest = hashlib.sha256(version.encode("utf-8"))
+    _update_digest(digest, page)
+    return(digest.hexdigest())
+
+
+class PageCache:
+    """
+    <path>/pages/<digest>.pdf - a drawn page, as a single-page PDF
+    <path>/reports.json       - the page digests each report was last written from
+    """
+
+    def __init__(self, path=PAGE_CACHE_DIR, max_age_days=PAGE_CACHE_DAYS):
+        self.path = path
+        self.max_age_days = max_age_days
+
+    def _page_path(self, digest):
+        return(os.path.join(self.path, "pages", f"{digest}.pdf"))
+
+    def _reports_path(self):
+        return(os.path.join(self.path, "reports.json"))
+
+    def has(self, digest):
+        return(os.path.exists(self._page_path(digest)))
+
+    def touch(self, digest):
+        """Mark a page as used, so `prune` keeps it"""
+        os.utime(self._page_path(digest))
+
+    def load(self, digest):
+        self.touch(digest)
+        with open(self._page_path(digest), "rb") as f:
+            return(f.read())
+
+    def store(self, digest, data):
+        _write_atomic(self._page_path(digest), data)
+
+    def reports(self):
+        try:
+            with open(self._reports_path(), encoding="utf-8") as f:
+                return(json.load(f))
+        except (OSError, ValueError):
+            return({})
+
+    def save_reports(self, reports):
+        _write_atomic(self._reports_path(), json.dumps(reports, indent=2, sort_keys=True).encode("utf-8"))
+
+    def prune(self):
+        """Remove pages no report has used for `max_age_days`"""
+        pages_dir = os.path.join(self.path, "pages")
+        if not os.path.isdir(pages_dir):
+            return
+        cutoff = time.time() - self.max_age_days * 24 * 3600
+        for name in os.listdir(pages_dir):
+            path = os.path.join(pages_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+
+def render_page(draw, page):
+    """Draw a page and return it as a single-page PDF"""
+    fig = draw(page)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="pdf")
+    plt.close(fig)
+    return(buffer.getvalue())
+
+
+def render_pages(draw, pages, workers=RENDER_WORKERS):
+    """Draw pages as single-page PDFs, in order, in a process pool if there are several workers"""
+    if workers <= 1 or len(pages) <= 1:
+        for page in pages:
+            yield render_page(draw, page)
+        return
+
+    workers = min(workers, len(pages))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(render_page, [draw] * len(pages), pages,
+                            chunksize=max(1, len(pages) // (workers * 4)))
+
+
+def write_pdf(page_pdfs, path):
+    """Write single-page PDFs one after another into one file"""
+    writer = PdfWriter()
+    for data in page_pdfs:
+        writer.append(PdfReader(io.BytesIO(data)))
+    # Each page brings its own copy of the fonts and styles it uses; keep one of each
+    writer.compress_identical_objects()
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    _write_atomic(os.path.abspath(path), buffer.getvalue())
+
+
+def render_pdfs(draw, reports, workers=RENDER_WORKERS, cache=None):
+    """
+    Draw several reports, each a list of pages and the path of its PDF file
+
+    The pages of all the reports are drawn in the same process pool, and a page
+    shared by several reports is drawn once.
+
+    reports - [(pages, path), ...]
+    cache   - PageCache to reuse pages from, default PageCache(); False to draw every page
+
+    Returns the number of pages drawn (the others came from the cache).
+    """
+    if PdfWriter is None or (cache is False and workers <= 1):
+        for pages, path in reports:
+            with PdfPages(path) as pdf:
+                for page in pages:
+                    fig = draw(page)
+                    pdf.savefig(fig)
+                    plt.close(fig)
+        return(sum(len(pages) for pages, _ in reports))
+
+    if cache is False:
+        page_pdfs = render_pages(draw, [page for pages, _ in reports for page in pages], workers)
+        for pages, path in reports:
+            write_pdf([next(page_pdfs) for _ in pages], path)
+        return(sum(len(pages) for pages, _ in reports))
+
+    cache = cache or PageCache()
+    version = drawing_version(draw)
+    digests = [[page_digest(page, version) for page in pages] for pages, _ in reports]
+    missing = {}
+    for (pages, _), report_digests in zip(reports, digests):
+        for digest, page in zip(report_digests, pages):
+            if digest not in missing and not cache.has(digest):
+                missing[digest] = page
+
+    for digest, data in zip(missing, render_pages(draw, list(missing.values()), workers)):
+        cache.store(digest, data)
+
+    written = cache.reports()
+    for (_, path), report_digests in zip(reports, digests):
+        key = os.path.abspath(path)
+        if os.path.exists(path) and written.get(key) == report_digests:
+            for digest in report_digests:
+                cache.touch(digest)
+            continue
+        write_pdf([cache.load(digest) for digest in report_digests], path)
+        written[key] = report_digests
+    cache.save_reports(written)
+    cache.prune()
+    return(len(missing))
+
+
+def render_pdf(draw, pages, path, workers=RENDER_WORKERS, cache=None):
+    """Draw every page with `draw` into the PDF file at `path`, in order (see `render_pdfs`)"""
+    return(render_pdfs(draw, [(pages, path)], workers, cache))
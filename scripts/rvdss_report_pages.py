@@ -0,0 +1,168 @@
+"""
+Pages of the weekly forecast report
+
+The report has one page per target and region: the forecasts of every model
+on the left, the ensemble on the right, both over the truth data.
+`forecast_pages` works out what goes on each page, in report order, as plain
+data (the intervals of each model, the truth series, titles and axis limits),
+so pages can be drawn in other processes (see rvdss_render) and compared
+between runs. `draw_forecast_page` draws one page into a matplotlib figure.
+"""
+import matplotlib.pyplot as plt
+
+ENSEMBLE_MODEL = 'AI4Casting_Hub-Ensemble_v1'
+
+
+def truth_column(target):
+    """Column of the truth data a target is forecasting (e.g., covid, flu, rsv), or None"""
+    return(
+        "sarscov2_pct_positive" if "covid lab" in target.lower() else
+        "flu_pct_positive" if "flu lab" in target.lower() else
+        "rsv_pct_positive" if "rsv lab" in target.lower() else
+        None
+    )
+
+
+def forecast_pages(cube, truth_by_region, locations):
+    """
+    The pages of the report, in order
+
+    cube            - QuantileCube of the forecasts of the reference date
+    truth_by_region - truth data (time and the pct_positive columns) of each region, sorted by time
+    locations       - auxiliary-data/locations.csv
+    """
+    region_names = dict(zip(locations['geo_abbr'], locations['geo_name']))
+
+    pages = []
+    for target in cube.targets:
+        target_regions = cube.locations(target)
+
+        # Reorder regions: Canada first, then alphabetical for the rest
+        regions = sorted([region for region in target_regions if region != "ca"])
+        if "ca" in target_regions:
+            regions = ["ca"] + regions
+
+        column = truth_column(target)
+        if column is None:
+            print(f"Skipping target '{target}' as it doesn't match truth data columns.")
+            continue
+
+        for region in regions:
+            region_models = cube.models(target, region)
+            if not region_models:
+                print(f"No data for region: {region}, target: {target}")
+                continue
+
+            models = []
+            for model in region_models:
+                if model == ENSEMBLE_MODEL:
+                    continue
+                grouped = cube.intervals(target, region, model)
+                if grouped.empty:
+                    print(f"No grouped data for model: {model}, region: {region}, target: {target}")
+                    continue
+                models.append((model, grouped))
+
+            region_truth = truth_by_region.get(region)
+            if region_truth is None or region_truth.empty or column not in region_truth.columns:
+                print(f"No truth data for region: {region}")
+                truth = None
+            else:
+                truth = region_truth[['time', column]].reset_index(drop=True)
+
+            median_min, median_max = cube.value_range(target, region, 0.5)
+            pages.append({
+                'target': target,
+                'region': region,
+                'region_name': region_names[region],
+                'ylim': [median_min/2, median_max * 2],
+                'models': models,
+                'ensemble': cube.intervals(target, region, ENSEMBLE_MODEL) if ENSEMBLE_MODEL in region_models else None,
+                'truth': truth,
+            })
+    return(pages)
+
+
+def _plot_truth(ax, truth):
+    if truth is not None:
+        ax.plot(
+            truth['time'],
+            truth.iloc[:, 1],
+            label="Truth Data",
+            color="black",
+            linestyle="--",
+            linewidth=2
+        )
+
+
+def draw_forecast_page(page):
+    """Draw one page of the report, returning the figure"""
+    # Create figure with two subplots
+    fig, axes = plt.subplots(1, 2, figsize=(13, 5), sharey=True)
+
+    # Left Plot: All Models (excluding ensemble)
+    ax = axes[0]
+    ax.set_ylim(page['ylim'])
+    for model, grouped in page['models']:
+        # Plot the median and confidence intervals
+        line, = ax.plot(grouped['target_end_date'], grouped['median'], label=f"{model}")
+        ax.fill_between(
+            grouped['target_end_date'],
+            grouped['lower_95'],
+            grouped['upper_95'],
+            alpha=0.2,
+            color=line.get_color(),
+            label='_nolegend_'
+        )
+        ax.scatter(
+            grouped['target_end_date'],
+            grouped['median'],
+            color=line.get_color(),
+            alpha=1,
+            s=30  # Size of the dots
+        )
+
+    _plot_truth(ax, page['truth'])
+    ax.set_title(f"Forecasting Models - {page['region_name']} - {page['target']}")
+    ax.set_xlabel("Target End Date")
+    ax.set_ylabel("Forecast Value")
+    ax.legend(loc="upper left", fontsize="small")
+    ax.grid()
+
+    # Right Plot: Truth Data + Ensemble Model
+    ax = axes[1]
+    grouped = page['ensemble']
+    if grouped is not None and not grouped.empty:
+        line, = ax.plot(grouped['target_end_date'], grouped['median'], label="Ensemble")
+        ax.fill_between(
+            grouped['target_end_date'],
+            grouped['lower_95'],
+            grouped['upper_95'],
+            alpha=0.1,
+            color=line.get_color(),
+            label='_nolegend_'
+        )
+        ax.fill_between(
+            grouped['target_end_date'],
+            grouped['lower_50'],
+            grouped['upper_50'],
+            alpha=0.2,
+            color=line.get_color(),
+            label='_nolegend_'
+        )
+        ax.scatter(
+            grouped['target_end_date'],
+            grouped['median'],
+            color=line.get_color(),
+            s=20  # Size of the dots
+        )
+
+    _plot_truth(ax, page['truth'])
+    ax.set_title(f"Ensemble Model - {page['region_name']} - {page['target']}")
+    ax.set_xlabel("Target End Date")
+    ax.legend(loc="upper left", fontsize="small")
+    ax.grid()
+
+    # Adjust layout
+    fig.tight_layout()
+    return(fig)
@@ -0,0 +1,215 @@
+"""
+Issue-versioned store of every value reported for each week and location
+
+The target tables keep only the latest issue of each week, which is what the
+forecasts are scored against but not what a forecaster could see at the time.
+A `RevisionStore` keeps the issues of each value as long-format rows
+
+    time_value, geo_value, signal, issue, value
+
+sorted by (geo_value, signal, time_value, issue), so the issues of one value
+sit next to each other. Each row is valid from the day of its issue until the
+day of the next issue of the same value, which turns "the data as of date X"
+into an interval test that works on whole columns at once. `snapshots` builds
+the data as of many dates in one pass by repeating each row for the dates its
+interval covers, instead of filtering the store once per date.
+
+Only values that changed are stored. An issue that reports the same value as
+the previous issue of that value adds no row, since the previous row stays
+current until the value changes, and a value that is missing from an issue
+keeps the value of the previous issue that reported it. Issues are compared
+with the ones already in the store, so an issue added later than newer issues
+(e.g. an archive backfill after weekly updates) can't bring back unchanged
+rows that were dropped after it.
+
+The store is saved as Parquet with the writer of the other outputs
+(rvdss_columnar), which needs pyarrow. Dates are read with explicit formats
+(rvdss_compact.parse_timestamps).
+"""
+import os
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from rvdss_columnar import available, read_columnar, write_columnar
+from rvdss_compact import parse_timestamps
+
+KEY_COLUMNS = ['time_value', 'geo_value', 'signal', 'issue']
+SORT_COLUMNS = ['geo_value', 'signal', 'time_value', 'issue']
+
+# Columns of the raw tables holding reported values
+SIGNAL_PATTERN = r"_(tests|positive_tests|pct_positive)$"
+
+
+def signal_columns(table):
+    return([col for col in table.columns if re.search(SIGNAL_PATTERN, str(col))])
+
+
+def to_long(table, signals=None):
+    """
+    Turn a wide table (time_value, geo_value, issue and one column per signal)
+    into long-format revision rows, dropping missing values
+    """
+    table = table.reset_index() if 'issue' not in table.columns else table
+    signals = signal_columns(table) if signals is None else list(signals)
+    long = table.melt(id_vars=['time_value', 'geo_value', 'issue'], value_vars=signals,
+                      var_name='signal', value_name='value')
+    long['value'] = pd.to_numeric(long['value'], errors='coerce')
+    return(long.dropna(subset=['value'])[KEY_COLUMNS + ['value']])
+
+
+class RevisionStore:
+    def __init__(self, data=None):
+        if data is None:
+            data = pd.DataFrame(columns=KEY_COLUMNS + ['value'])
+        self.data = self._normalise(data)
+
+    @staticmethod
+    def _normalise(data):
+        data = data[KEY_COLUMNS + ['value']].copy()
+        data['time_value'] = parse_timestamps(data['time_value']).dt.normalize()
+        data['issue'] = parse_timestamps(data['issue'])
+        data['geo_value'] = data['geo_value'].astype(str).astype('category')
+        data['signal'] = data['signal'].astype(str).astype('category')
+        data['value'] = data['value'].astype(float)
+
+        # A value reported twice in the same issue keeps the last report
+        data = data.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+        data = data.sort_values(SORT_COLUMNS, kind='mergesort').reset_index(drop=True)
+
+        # Issues that report the same value as the previous issue of that value
+        unchanged = np.zeros(len(data), dtype=bool)
+        if len(data):
+            keys = data[['geo_value', 'signal', 'time_value']].to_numpy()
+            values = data['value'].to_numpy()
+            unchanged[1:] = (keys[1:] == keys[:-1]).all(axis=1) & (values[1:] == values[:-1])
+        return(data[~unchanged].reset_index(drop=True))
+
+    @classmethod
+    def from_table(cls, table, signals=None):
+        return(cls(to_long(table, signals)))
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return(cls())
+        return(cls(read_columnar(path, columns=KEY_COLUMNS + ['value'])))
+
+    def save(self, path):
+        """Write the store to a Parquet file, replacing it in one step"""
+        if not available():
+            raise ImportError("pyarrow is needed to save a revision store")
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".parquet")
+        os.close(fd)
+        write_columnar(self.data, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def append(cls, path, table, signals=None):
+        """Add the rows of a wide table to a saved store, which only grows by the values that changed"""
+        cls.load(path).add(table, signals).save(path)
+
+    def add(self, table, signals=None):
+        """Add the rows of a wide table, or of long-format revision rows"""
+        rows = table if 'signal' in table.columns else to_long(table, signals)
+        self.data = self._normalise(pd.concat([self.data, rows], axis=0, ignore_index=True))
+        return(self)
+
+    def _validity(self):
+        """
+        The days each row is the current value on, as [start, end) dates
+
+        A row is current from the day of its issue until the day of the next
+        issue of the same value; if there are several issues on one day only
+        the last is current.
+        """
+        data = self.data
+        start = data['issue'].dt.normalize().to_numpy()
+        same_value = np.zeros(len(data), dtype=bool)
+        if len(data):
+            keys = data[['geo_value', 'signal', 'time_value']]
+            same_value[:-1] = (keys.iloc[:-1].to_numpy() == keys.iloc[1:].to_numpy()).all(axis=1)
+
+        end = np.full(len(data), np.datetime64('NaT'), dtype='datetime64[ns]')
+        end[:-1] = start[1:]
+        end[~same_value] = np.datetime64('NaT')
+        return(start, end)
+
+    def snapshots(self, dates):
+        """
+        The data as of each date, in one pass
+
+        Returns long-format rows with an `as_of` column. For every date, each
+        (time_value, geo_value, signal) has the value of its latest issue on or
+        before that date.
+        """
+        dates = np.sort(pd.to_datetime(pd.Series(dates)).dt.normalize().unique())
+        start, end = self._validity()
+
+        # Positions in `dates` of the first date each row is current on, and the first it no longer is
+        first = np.searchsorted(dates, start, side='left')
+        last = np.where(pd.isna(end), len(dates), np.searchsorted(dates, end, side='left'))
+        counts = np.maximum(last - first, 0)
+
+        rows = np.repeat(np.arange(len(self.data)), counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        snapshot = self.data.iloc[rows].reset_index(drop=True)
+        snapshot.insert(0, 'as_of', dates[first[rows] + offsets])
+        return(snapshot)
+
+    def as_of(self, date):
+        """The data as of a single date (see `snapshots`)"""
+        return(self.snapshots([date]).drop(columns='as_of'))
+
+    def at_lags(self, lags):
+        """
+        The value of every (time_value, geo_value, signal) as it was `lag` days after time_value
+
+        lags - day counts, e.g. [0, 7, 14]. Values not reported yet at a lag are left out.
+        """
+        lags = np.asarray(lags, dtype=np.int64)
+        start, end = self._validity()
+        time_values = self.data['time_value'].to_numpy()
+
+        # Every row against every lag, keeping the pairs where the row was current at time_value + lag
+        rows = np.repeat(np.arange(len(self.data)), len(lags))
+        row_lags = np.tile(lags, len(self.data))
+        days = time_values[rows] + row_lags.astype('timedelta64[D]')
+        current = (start[rows] <= days) & (pd.isna(end[rows]) | (days < end[rows]))
+
+        at_lag = self.data.iloc[rows[current]].reset_index(drop=True)
+        at_lag.insert(0, 'lag', row_lags[current])
+        return(at_lag)
+
+    def revision_lags(self):
+        """
+        How long after time_value each value was last revised
+
+        One row per (time_value, geo_value, signal) with the number of issues
+        that changed it, the first and final values and `lag`, the number of
+        days from time_value to the issue that set the final value.
+        """
+        data = self.data
+        keys = ['geo_value', 'signal', 'time_value']
+        previous = data.groupby(keys, sort=False, observed=True)['value'].shift()
+        changed = data[previous.isna() | (previous != data['value'])]
+
+        grouped = changed.groupby(keys, sort=False, observed=True)
+        lags = grouped.agg(first_value=('value', 'first'), final_value=('value', 'last'),
+                           final_issue=('issue', 'last'), revisions=('value', 'size'))
+        lags['revisions'] -= 1
+        lags = lags.reset_index()
+        lags['lag'] = (lags['final_issue'].dt.normalize() - lags['time_value']).dt.days
+        return(lags)
+
+
+def wide(snapshot, index=('time_value', 'geo_value')):
+    """Pivot long-format rows back to one column per signal"""
+    index = [col for col in ['as_of', 'lag'] if col in snapshot.columns] + list(index)
+    table = snapshot.pivot_table(index=index, columns='signal', values='value', aggfunc='last', observed=True)
+    table.columns = list(table.columns)
+    return(table.reset_index())
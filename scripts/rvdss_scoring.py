@@ -0,0 +1,223 @@
+"""
+Scoring of the quantile forecasts in model-output/ against the target data
+
+The Python counterpart of model-eval.R. Instead of reading each submission
+and looking up the truth for every model, round, location, target and horizon
+one at a time, the forecasts are pivoted once into a matrix with one row per
+forecast and one column per quantile level (`QuantileForecasts`), the truth is
+joined to all rows in one merge, and every score is a column operation over
+the whole matrix:
+
+    wis              - weighted interval score of the median and the 50%, 80% and 95% intervals,
+                       with the same weights as model-eval.R
+    dispersion, overprediction, underprediction
+                     - the parts of the WIS coming from the width of the intervals, and from the
+                       truth falling below or above them; they add up to the WIS
+    ae, se           - absolute and squared error of the median
+    coverage_50, coverage_95
+                     - whether the truth is inside the 50% and 95% intervals
+
+Forecasts missing one of the scored quantiles aren't scored. The forecast
+matrix only depends on the submissions, so after a truth revision only the
+join and the column operations are redone:
+
+    forecasts = QuantileForecasts.from_model_output(load_model_output(value_dtype=np.float64))
+    scores = score(forecasts, load_truth())
+    leaderboard(scores)
+
+    python scripts/rvdss_scoring.py --output-dir rvdss-output
+
+writes the score of every forecast, the averages by model and horizon and the
+leaderboard (OUTPUT_FILES). model-eval.R writes all_rvdss_scores.csv and
+WIS_average.csv to the same directory with its own columns, so these files
+have other names and both scripts can be run.
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from rvdss_compact import timestamps
+from rvdss_model_output import load_model_output
+
+# Lower quantiles of the 95%, 80% and 50% intervals (the upper ones are 1 - these), as in model-eval.R
+INTERVAL_LEVELS = [0.025, 0.1, 0.25]
+MEDIAN_LEVEL = 0.5
+
+# Rounds and horizons scored by model-eval.R
+FIRST_REFERENCE_DATE = "2024-10-19"
+EXCLUDED_REFERENCE_DATES = ["2024-12-28"]
+SCORED_HORIZONS = [0, 1, 2, 3]
+
+# Files written by `main`, named apart from model-eval.R's all_rvdss_scores.csv and WIS_average.csv
+OUTPUT_FILES = {'scores': "forecast_scores.csv", 'by_horizon': "horizon_scores.csv", 'leaderboard': "leaderboard.csv"}
+
+TARGET_COLUMNS = {
+    'pct wk flu lab det': 'flu_pct_positive',
+    'pct wk covid lab det': 'sarscov2_pct_positive',
+    'pct wk rsv lab det': 'rsv_pct_positive',
+}
+
+FORECAST_KEYS = ['model', 'reference_date', 'target', 'location', 'horizon', 'target_end_date']
+SCORE_COLUMNS = ['wis', 'dispersion', 'overprediction', 'underprediction', 'ae', 'se', 'coverage_50', 'coverage_95']
+
+# Archived seasons first, so the current target data wins where seasons overlap
+TRUTH_FILES = [os.path.join("auxiliary-data", "target-data-archive", "season_*", "target_rvdss_data.csv"),
+               os.path.join("target-data", "season_*", "target_rvdss_data.csv")]
+
+
+def _level_key(levels):
+    """Quantile levels as integers, so 1 - 0.025 finds 0.975"""
+    return(np.rint(np.asarray(levels, dtype=float) * 1e6).astype(np.int64))
+
+
+class QuantileForecasts:
+    """
+    keys   - DataFrame of FORECAST_KEYS, one row per forecast
+    levels - the quantile levels, sorted
+    values - array of shape (forecasts, levels), NaN where a quantile wasn't submitted
+    """
+
+    def __init__(self, keys, levels, values):
+        self.keys = keys
+        self.levels = np.asarray(levels, dtype=float)
+        self.values = values
+        self._positions = {key: i for i, key in enumerate(_level_key(self.levels))}
+
+    @classmethod
+    def from_model_output(cls, model_data):
+        """Pivot long-format quantile rows (model output) into one row per forecast"""
+        model_data = model_data[model_data['output_type'] == 'quantile']
+        keys = model_data[FORECAST_KEYS].reset_index(drop=True)
+        for col in ['reference_date', 'target_end_date']:
+            keys[col] = timestamps(keys[col])
+
+        # Forecasts numbered in the order they first appear, which is also the order of drop_duplicates
+        codes = keys.groupby(FORECAST_KEYS, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+        uniques = keys.drop_duplicates().reset_index(drop=True)
+        levels = np.unique(model_data['output_type_id'].to_numpy(dtype=float))
+        levels = levels[~np.isnan(levels)]
+        level_codes = np.searchsorted(levels, model_data['output_type_id'].to_numpy(dtype=float))
+
+        values = np.full((len(uniques), len(levels)), np.nan)
+        valid = level_codes < len(levels)
+        values[codes[valid], level_codes[valid]] = model_data['value'].to_numpy(dtype=float)[valid]
+
+        uniques['model'] = uniques['model'].astype(str).astype('category')
+        return(cls(uniques, levels, values))
+
+    def quantile(self, level):
+        """The forecasts of one quantile level, NaN for forecasts that don't have it"""
+        position = self._positions.get(_level_key([level])[0])
+        if position is None:
+            return(np.full(len(self.keys), np.nan))
+        return(self.values[:, position])
+
+    def select(self, mask):
+        return(QuantileForecasts(self.keys[mask].reset_index(drop=True), self.levels, self.values[np.asarray(mask)]))
+
+    def scored_rounds(self, start=FIRST_REFERENCE_DATE, excluded=EXCLUDED_REFERENCE_DATES, horizons=SCORED_HORIZONS):
+        """The forecasts model-eval.R scores: rounds from `start`, except `excluded`, for the given horizons"""
+        reference_dates = self.keys['reference_date']
+        mask = (reference_dates >= pd.Timestamp(start)) & ~reference_dates.isin(pd.to_datetime(excluded)) & \
+            self.keys['horizon'].isin(horizons)
+        return(self.select(mask.to_numpy()))
+
+
+def load_truth(paths=None):
+    """
+    Target data of every season in long format (target_end_date, location, target, observed)
+
+    paths - target_rvdss_data.csv files, later ones winning where they overlap (default TRUTH_FILES)
+    """
+    if paths is None:
+        paths = [path for pattern in TRUTH_FILES for path in sorted(glob.glob(pattern))]
+    truth = pd.concat([pd.read_csv(path) for path in paths], axis=0, ignore_index=True)
+    truth['time_value'] = pd.to_datetime(truth['time_value'], format="%Y-%m-%d")
+    truth = truth.drop_duplicates(subset=['time_value', 'geo_value'], keep='last')
+
+    columns = {column: target for target, column in TARGET_COLUMNS.items() if column in truth.columns}
+    truth = truth.melt(id_vars=['time_value', 'geo_value'], value_vars=list(columns),
+                       var_name='target', value_name='observed')
+    truth['target'] = truth['target'].map(columns)
+    truth['observed'] = pd.to_numeric(truth['observed'], errors='coerce')
+    return(truth.rename(columns={'time_value': 'target_end_date', 'geo_value': 'location'}))
+
+
+def score(forecasts, truth):
+    """
+    Score every forecast against the truth
+
+    Returns the forecast keys with `observed` and SCORE_COLUMNS. Forecasts with no
+    truth yet, or missing a scored quantile, have NaN scores.
+    """
+    keys = forecasts.keys[['target', 'location', 'target_end_date']].astype({'target': str, 'location': str})
+    observed = keys.merge(truth, on=['target', 'location', 'target_end_date'], how='left')['observed'].to_numpy()
+
+    median = forecasts.quantile(MEDIAN_LEVEL)
+    alphas = np.asarray(INTERVAL_LEVELS)
+    lower = np.column_stack([forecasts.quantile(level) for level in alphas])
+    upper = np.column_stack([forecasts.quantile(1 - level) for level in alphas])
+    y = observed[:, None]
+
+    # WIS = (|y - median| / 2 + sum over intervals of alpha/2 * interval score) / (intervals + 1/2)
+    scale = len(alphas) + 0.5
+    dispersion = (alphas * (upper - lower)).sum(axis=1) / scale
+    overprediction = (np.maximum(median - observed, 0) / 2 + np.maximum(lower - y, 0).sum(axis=1)) / scale
+    underprediction = (np.maximum(observed - median, 0) / 2 + np.maximum(y - upper, 0).sum(axis=1)) / scale
+
+    complete = ~np.isnan(median) & ~np.isnan(lower).any(axis=1) & ~np.isnan(upper).any(axis=1) & ~np.isnan(observed)
+    scores = forecasts.keys.copy()
+    scores['observed'] = observed
+    scores['wis'] = dispersion + overprediction + underprediction
+    scores['dispersion'] = dispersion
+    scores['overprediction'] = overprediction
+    scores['underprediction'] = underprediction
+    scores['ae'] = np.abs(observed - median)
+    scores['se'] = (observed - median) ** 2
+    inside = (lower <= y) & (y <= upper)
+    scores['coverage_50'] = inside[:, list(alphas).index(0.25)].astype(float)
+    scores['coverage_95'] = inside[:, list(alphas).index(0.025)].astype(float)
+    scores.loc[~complete, SCORE_COLUMNS] = np.nan
+    return(scores)
+
+
+def leaderboard(scores, by=('model',)):
+    """
+    Mean of every score of the scored forecasts by model, best WIS first
+
+    by - model and other columns to split the scores by, e.g. ('model', 'horizon'); models are
+         then ranked within each horizon
+    """
+    by = list(by)
+    scored = scores.dropna(subset=['wis'])
+    board = scored.groupby(by, observed=True)[SCORE_COLUMNS].mean()
+    board.insert(0, 'forecasts', scored.groupby(by, observed=True).size())
+    return(board.reset_index().sort_values(by[1:] + ['wis'], kind='mergesort').reset_index(drop=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score the model output against the target data")
+    parser.add_argument("--output-dir", default="rvdss-output", help="where to write the scores")
+    parser.add_argument("--truth", nargs="*", help="target data files (default: every season's target_rvdss_data.csv)")
+    parser.add_argument("--start", default=FIRST_REFERENCE_DATE, help="first reference date to score")
+    args = parser.parse_args()
+
+    # Scores are written out, so the values are kept exactly as submitted
+    forecasts = QuantileForecasts.from_model_output(load_model_output(value_dtype=np.float64))
+    forecasts = forecasts.scored_rounds(start=args.start)
+    scores = score(forecasts, load_truth(args.truth))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    scores.to_csv(os.path.join(args.output_dir, OUTPUT_FILES['scores']), index=False, date_format="%Y-%m-%d")
+    leaderboard(scores, by=['model', 'horizon']).to_csv(os.path.join(args.output_dir, OUTPUT_FILES['by_horizon']),
+                                                        index=False)
+    board = leaderboard(scores)
+    board.to_csv(os.path.join(args.output_dir, OUTPUT_FILES['leaderboard']), index=False)
+    print(board.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
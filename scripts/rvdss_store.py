@@ -0,0 +1,213 @@
+"""
+Append-only storage of the raw tables of the current season
+
+Every weekly update adds one issue of the dashboard tables. Instead of reading
+the whole season's CSV, appending the new rows and writing it all back, each
+issue is written once as its own partition, and a small index of the keys
+already stored is kept alongside:
+
+<path>/partitions/<seq>_<issue>.csv - the rows of one issue, in the order they were appended
+<path>/parquet/<seq>_<issue>.parquet - typed copy of each partition, if pyarrow is installed (see rvdss_columnar)
+<path>/index.csv                    - epiweek, time_value, issue, geo_type, geo_value and partition of every stored row
+<path>/source.json                  - size of the published CSV the store was last in step with
+
+The store is a local working copy under STORE_DIR (RVDSS_STORE_DIR, default
+.cache/rvdss-store) and is not committed; the published CSV stays the data.
+`sync_csv` fills the store from the CSV (`import_csv`) when the store is
+missing or the CSV has changed since, and empties it when there is no CSV, so
+a store never outlives the CSV it copies. `append_csv` appends the rows of a
+new partition to the end of the CSV instead of rewriting it.
+
+Keys in the index are stored as the text written to the partitions, so a new
+issue is compared with what is on disk regardless of how its columns are typed
+in memory, and `partitions_with` finds the partitions holding some keys without
+opening any partition. Concatenating the partitions in order gives back the same
+table as the published CSV.
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from rvdss_columnar import write_columnar
+
+INDEX_COLUMNS = ['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value']
+STORE_DIR = os.environ.get("RVDSS_STORE_DIR", os.path.join(".cache", "rvdss-store"))
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class IssueStore:
+    def __init__(self, path, keys=INDEX_COLUMNS):
+        self.path = path
+        self.keys = list(keys)
+
+    @property
+    def _partition_dir(self):
+        return(os.path.join(self.path, "partitions"))
+
+    @property
+    def _index_path(self):
+        return(os.path.join(self.path, "index.csv"))
+
+    @property
+    def _source_path(self):
+        return(os.path.join(self.path, "source.json"))
+
+    def partitions(self):
+        """Names of the stored partitions, in the order they were appended"""
+        if not os.path.isdir(self._partition_dir):
+            return([])
+        return(sorted(name for name in os.listdir(self._partition_dir) if name.endswith(".csv")))
+
+    def is_empty(self):
+        return(not self.partitions())
+
+    def _read_keys(self, text_or_path):
+        keys = pd.read_csv(text_or_path, usecols=self.keys, dtype=str, keep_default_na=False)
+        return(keys[self.keys])
+
+    def index(self):
+        """The keys of every stored row with the partition holding it, all as text"""
+        if os.path.exists(self._index_path):
+            index = pd.read_csv(self._index_path, dtype=str, keep_default_na=False)
+        else:
+            index = pd.DataFrame(columns=self.keys + ['partition'], dtype=str)
+
+        # Partitions written by a run that stopped before updating the index
+        missing = [name for name in self.partitions() if name not in set(index['partition'])]
+        for name in missing:
+            keys = self._read_keys(os.path.join(self._partition_dir, name)).assign(partition=name)
+            self._append_index(keys)
+            index = pd.concat([index, keys], ignore_index=True)
+        return(index)
+
+    def _append_index(self, keys):
+        os.makedirs(self.path, exist_ok=True)
+        header = not os.path.exists(self._index_path)
+        keys.to_csv(self._index_path, mode="a", header=header, index=False)
+
+    def append(self, table):
+        """
+        Store a table (indexed by the key columns) as a new partition
+
+        Returns the name of the new partition, or None if any of its keys are
+        already stored, in which case nothing is written.
+        """
+        text = table.to_csv(index=True)
+        keys = self._read_keys(io.StringIO(text))
+
+        index = self.index()
+        stored = pd.MultiIndex.from_frame(index[self.keys])
+        if pd.MultiIndex.from_frame(keys).isin(stored).any():
+            return(None)
+
+        return(self._write_partition(text, keys))
+
+    def _write_partition(self, text, keys):
+        issue = keys['issue'].iloc[0][:10] if len(keys) else "empty"
+        name = f"{len(self.partitions()):04d}_{issue}.csv"
+        _write_atomic(os.path.join(self._partition_dir, name), text)
+        if len(keys):
+            os.makedirs(os.path.join(self.path, "parquet"), exist_ok=True)
+            write_columnar(pd.read_csv(io.StringIO(text)), os.path.join(self.path, "parquet", name[:-4] + ".parquet"))
+        self._append_index(keys.assign(partition=name))
+        return(name)
+
+    def partitions_with(self, keys, columns):
+        """
+        Names of the partitions holding any row whose `columns` (some of the key
+        columns) are in `keys`, a MultiIndex of text values, in append order
+
+        Only the index is read, so the partitions can be picked without opening them.
+        """
+        index = self.index()
+        held = pd.MultiIndex.from_frame(index[list(columns)]).isin(keys)
+        names = set(index.loc[held, 'partition'])
+        return([name for name in self.partitions() if name in names])
+
+    def read(self, partitions=None):
+        """Concatenate the given partitions (default all) in order, indexed by the key columns"""
+        if partitions is None:
+            partitions = self.partitions()
+        tables = [pd.read_csv(os.path.join(self._partition_dir, name)) for name in partitions]
+        if not tables:
+            return(pd.DataFrame(columns=self.keys).set_index(self.keys))
+        return(pd.concat(tables, axis=0).set_index(self.keys))
+
+    def import_csv(self, csv_path):
+        """
+        Split a single-file table into partitions, one per run of rows with the same issue
+
+        Runs are kept in file order, so `read()` returns the rows in the same order.
+        """
+        table = pd.read_csv(csv_path)
+        runs = (table['issue'] != table['issue'].shift()).cumsum()
+        for _, rows in table.groupby(runs, sort=False):
+            text = rows.to_csv(index=False)
+            self._write_partition(text, self._read_keys(io.StringIO(text)))
+
+    def clear(self):
+        """Remove every partition and the index"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _csv_size(self):
+        try:
+            with open(self._source_path, encoding="utf-8") as f:
+                return(json.load(f)['size'])
+        except (OSError, ValueError, KeyError):
+            return(None)
+
+    def _record_csv(self, csv_path):
+        _write_atomic(self._source_path, json.dumps({'size': os.path.getsize(csv_path)}))
+
+    def sync_csv(self, csv_path):
+        """
+        Bring the store in step with the published CSV at csv_path
+
+        The store is rebuilt from the CSV when the CSV is not the size it had
+        when the store last wrote or read it (e.g. the store is new, or the
+        CSV was updated elsewhere), and emptied when there is no CSV: a table
+        that isn't kept between runs starts again from the next issue alone,
+        whatever a restored store holds.
+        """
+        if not os.path.exists(csv_path):
+            self.clear()
+            return
+        if os.path.getsize(csv_path) == self._csv_size():
+            return
+        self.clear()
+        self.import_csv(csv_path)
+        self._record_csv(csv_path)
+
+    def append_csv(self, csv_path, partition):
+        """
+        Add the rows of a stored partition to the end of the published CSV
+
+        The CSV is only rewritten in full (from all partitions) when it doesn't
+        exist yet or its columns differ from the partition's.
+        """
+        with open(os.path.join(self._partition_dir, partition), encoding="utf-8") as f:
+            header = f.readline()
+            rows = f.read()
+
+        published_header = None
+        if os.path.exists(csv_path):
+            with open(csv_path, encoding="utf-8") as f:
+                published_header = f.readline()
+
+        if published_header == header:
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write(rows)
+        else:
+            _write_atomic(csv_path, self.read().to_csv(index=True))
+        self._record_csv(csv_path)
@@ -0,0 +1,154 @@
+"""
+lxml based table extraction for the weekly report pages
+
+Each report page is parsed once with lxml. Tables are read straight from the
+parsed tree into rows of cell text, so they don't need to be serialised back
+to html and parsed again by `pd.read_html`. The cell handling follows
+`pd.read_html` (thead/tbody/tfoot rows, header rows made of <th> cells,
+rowspan/colspan copying, whitespace clean up, hidden elements removed) and
+the rows are handed to the same `TextParser` it uses, so column names, dtypes
+and missing values come out the same.
+"""
+import regex as re
+from lxml import html
+from pandas.io.parsers import TextParser
+
+# Abbreviations used in the reports for missing data
+NA_VALUES = ['N.A.','N.A', 'N.C.','N.R.','Not Available','Not Tested',"N.D.","-"]
+
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+def parse_page(page):
+    """Parse the html of a report page into an lxml document"""
+    return(html.document_fromstring(page, parser=html.HTMLParser(recover=True)))
+
+
+def table_after(element):
+    """Return the first table that comes after `element` in the page, or None"""
+    tables = element.xpath("following::table[1]")
+    return(tables[0] if tables else None)
+
+
+def _remove_hidden(table):
+    for element in table.xpath(".//style"):
+        element.drop_tree()
+    for element in table.xpath(".//*[@style]"):
+        if "display:none" in element.get("style", "").replace(" ", ""):
+            element.drop_tree()
+
+
+def _cells(row):
+    return(row.xpath("./td|./th"))
+
+
+def _table_rows(table):
+    """Split the rows of a table into header, body and footer rows"""
+    header_rows = []
+    for thead in table.xpath(".//thead"):
+        header_rows.extend(thead.xpath("./tr"))
+        # A <thead> holding cells without a <tr> is treated as a row itself
+        if _cells(thead):
+            header_rows.append(thead)
+
+    body_rows = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    footer_rows = table.xpath(".//tfoot//tr")
+
+    # Without a <thead>, the leading rows made only of <th> cells are the header
+    if not header_rows:
+        while body_rows and all(cell.tag == "th" for cell in _cells(body_rows[0])):
+            header_rows.append(body_rows.pop(0))
+
+    return(header_rows, body_rows, footer_rows)
+
+
+def _expand_spans(rows, clean_text):
+    """Turn <tr> elements into lists of text, copying cells with rowspan/colspan"""
+    all_texts = []
+    remainder = []  # (column index, text, rows left) carried down from rowspans
+
+    for tr in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for td in _cells(tr):
+            while remainder and remainder[0][0] <= index:
+                prev_i, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+                index += 1
+
+            text = clean_text(td.text_content())
+            rowspan = int(td.get("rowspan") or 1)
+            colspan = int(td.get("colspan") or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    while remainder:
+        next_remainder = []
+        texts = []
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    return(all_texts)
+
+
+def read_table(table, comma_as_decimal=True, na_values=NA_VALUES):
+    """
+    Read an lxml <table> element into a DataFrame
+
+    comma_as_decimal - if True, commas in cells become periods (some tables use
+                       commas as decimal points), otherwise they are dropped
+                       (thousands separators, e.g. 1,000)
+    na_values - cell values that are read as missing
+    """
+    _remove_hidden(table)
+    for br in table.xpath(".//br"):
+        br.tail = "\n" + (br.tail or "")
+
+    comma = "." if comma_as_decimal else ""
+    def clean_text(text):
+        return(_RE_WHITESPACE.sub(" ", text.replace(",", comma).strip()))
+
+    header_rows, body_rows, footer_rows = _table_rows(table)
+    head = _expand_spans(header_rows, clean_text)
+    body = _expand_spans(body_rows, clean_text) + _expand_spans(footer_rows, clean_text)
+
+    # Missing data codes are blanked here, blank cells are read as NaN
+    na_values = set(na_values)
+    body = [["" if cell in na_values else cell for cell in row] for row in body]
+
+    header = None
+    if head:
+        if len(head) == 1:
+            header = 0
+        else:
+            # ignore header rows with no text
+            header = [i for i, row in enumerate(head) if any(text for text in row)]
+    rows = head + body
+
+    # Pad out rows that are shorter than the longest row
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+
+    parser = TextParser(rows, header=header)
+    try:
+        return(parser.read())
+    finally:
+        parser.close()
@@ -2,58 +2,31 @@ from bs4 import BeautifulSoup
 import requests
 import regex as re
 import io
+import json
 import pandas as pd
+import numpy as np
 import os
 from epiweeks import Week
 from datetime import datetime, timedelta
 import math
 import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from dateutil import parser
-
-VIRUSES = {
-    "parainfluenza": "hpiv",
-    "piv": "hpiv",
-    "para": "hpiv",
-    "adenovirus": "adv",
-    "adeno": "adv",
-    "human metapneumovirus": "hmpv",
-    "enterovirus/rhinovirus": "ev_rv",
-    "rhinovirus": "ev_rv",
-    "rhv": "ev_rv",
-    "entero/rhino": "ev_rv",
-    "rhino":"ev_rv",
-    "ev/rv":"ev_rv",
-    "coronavirus":"hcov",
-    "coron":"hcov",
-    "coro":"hcov",
-    "respiratory syncytial virus":"rsv",
-    "influenza":"flu",
-    "sars-cov-2":"sarscov2",
-}
-
-GEOS = {
-    "newfoundland": "nl",
-    "newfoundland and labrador": "nl",
-    "prince edward island":"pe",
-    "nova scotia":"ns",
-    "new brunswick":"nb",
-    "québec":"qc",
-    "quebec":"qc",
-    "ontario":"on",
-    "manitoba" : "mb",
-    "saskatchewan":"sk",
-    "alberta": "ab",
-    "british columbia" :"bc",
-    "yukon" : "yt",
-    "northwest territories" : "nt",
-    "nunavut" : "nu",
-    "canada":"ca",
-    "can":"ca" ,
-    "at":"atlantic",
-    "atl":"atlantic",
-    "pr" :"prairies" ,
-    "terr" :"territories",
- }
+from rvdss_fetch import fetch_text, fetch_pages
+from rvdss_checkpoint import BackfillCheckpoint, source_digest
+from rvdss_normalize import (VIRUSES, GEOS, REGIONS, NATION, abbreviate_virus, abbreviate_geo,
+                             create_geo_types, abbreviate_virus_series, abbreviate_geo_series,
+                             create_geo_types_series)
+from rvdss_columns import ColumnRewriter
+from rvdss_merge import KEY_COLUMNS, coalesce_latest_issue
+from rvdss_store import STORE_DIR, IssueStore
+from rvdss_revisions import RevisionStore
+from rvdss_columnar import write_csv_and_columnar
+from rvdss_compact import parse_timestamps
+from rvdss_calendar import epiweeks, week_end_dates, epiweeks_from_dates, iso_dates
+from rvdss_tables import NA_VALUES, parse_page, read_table, table_after
+from rvdss_metrics import count, get_metrics, reset_metrics, run_report, stage, timed
+from lxml import etree
 
 COL_MAPPERS = {   #RESP-DET			POSITIVE TESTS
 	'sarscov2tested' :  'sarscov2_tests',
@@ -135,12 +108,6 @@ LOC_CORRECTION = {
 
 COLUMNS_TARGET = ['time_value','geo_type','geo_value','flu_pct_positive','rsv_pct_positive','sarscov2_pct_positive']
 
-# Regions are groups of provinces that are geographically close together. Some single provinces are reported as their own region (e.g. Québec, Ontario).
-REGIONS = ['atlantic','atl','at','province of québec','québec','qc','province of ontario','ontario','on',
-            'prairies', 'pr', "british columbia",'bc',"territories",'terr',]
-NATION = ["canada","can",'ca',]
-
-
 DASHBOARD_BASE_URL = "https://health-infobase.canada.ca/src/data/respiratory-virus-detections/"
 DASHBOARD_W_DATE_URL = DASHBOARD_BASE_URL + "archive/{date}/"
 DASHBOARD_UPDATE_DATE_FILE = "RVD_UpdateDate.csv"
@@ -149,7 +116,7 @@ SEASON_BASE_URL = "https://www.canada.ca"
 ALTERNATIVE_SEASON_BASE_URL = "www.phac-aspc.gc.ca/bid-bmi/dsd-dsm/rvdi-divr/"
 HISTORIC_SEASON_REPORTS_URL = SEASON_BASE_URL+"/en/public-health/services/surveillance/respiratory-virus-detections-canada/{year_range}.html"
 
-HISTORIC_SEASON_URL = (HISTORIC_SEASON_REPORTS_URL.format(year_range = year_range) for year_range in
+HISTORIC_SEASON_URL = tuple(HISTORIC_SEASON_REPORTS_URL.format(year_range = year_range) for year_range in
     (
         "2013-2014",
         "2014-2015",
@@ -166,43 +133,31 @@ HISTORIC_SEASON_URL = (HISTORIC_SEASON_REPORTS_URL.format(year_range = year_rang
         )
 )
 
-HISTORIC_SEASON_URL_CHECKPOINT = []
-
 
 RESP_COUNTS_OUTPUT_FILE = "respiratory_detections.csv"
 POSITIVE_TESTS_OUTPUT_FILE = "positive_tests.csv"
+REVISIONS_OUTPUT_FILE = "revisions.parquet"
+CURRENT_SEASON_RAW_DIR = "./auxiliary-data/season_2025_2026_raw_files/"
+CURRENT_SEASON_TARGET_FILE = "./target-data/season_2025_2026/target_rvdss_data.csv"
 
 LAST_WEEK_OF_YEAR = 35
 
+# Percent positive signals derived from the counts, as output column -> (positive tests column, tests column).
+# Every virus gets `{virus}_pct_positive` from its own columns (see `pct_positive_signals`), these are the
+# signals whose tests column is shared with another signal.
+DERIVED_SIGNALS = {
+    'flua_pct_positive': ('flua_positive_tests', 'flu_tests'),
+    'flub_pct_positive': ('flub_positive_tests', 'flu_tests'),
+}
 
-def abbreviate_virus(full_name):
-    lowercase=full_name.lower()
-    keys = (re.escape(k) for k in VIRUSES.keys())
-    pattern = re.compile(r'\b(' + '|'.join(keys) + r')\b')
-    result = pattern.sub(lambda x: VIRUSES[x.group()], lowercase)
-    return(result)
-
-def abbreviate_geo(full_name):
-    lowercase=full_name.lower()
-    lowercase = re.sub("province of ","",lowercase)
-    lowercase=re.sub("\.|\*","",lowercase)
-    lowercase=re.sub("/territoires","",lowercase)
-    lowercase=re.sub("^cana$","can",lowercase)
+# Number of processes used to parse seasons during the historic backfill
+PARSE_WORKERS = int(os.environ.get("RVDSS_PARSE_WORKERS", os.cpu_count() or 1))
 
-    keys = (re.escape(k) for k in GEOS.keys())
-    pattern = re.compile(r'^\b(' + '|'.join(keys) + r')\b$')
+# Code that turns report pages into the checkpointed week tables; checkpoints written by other versions are stale
+PARSER_SOURCES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+                  for name in ["rvdss_update.py", "rvdss_tables.py", "rvdss_columns.py",
+                               "rvdss_normalize.py", "rvdss_calendar.py"]]
 
-    result = pattern.sub(lambda x: GEOS[x.group()], lowercase)
-    return(result)
-
-def create_geo_types(geo,default_geo):
-    if geo in NATION:
-        geo_type="nation"
-    elif geo in REGIONS:
-        geo_type="region"
-    else:
-        geo_type = default_geo
-    return(geo_type)
 
 def check_date_format(date_string):
     if not re.search("[0-9]{4}-[0-9]{2}-[0-9]{2}",date_string):
@@ -218,32 +173,36 @@ def check_date_format(date_string):
 
     return(new_date)
 
+@timed("get_revised_data")
 def get_revised_data(base_url):
-    headers = {
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
-    }
+    with stage("fetch"):
+        # Get update date
+        update_date_url =  base_url + DASHBOARD_UPDATE_DATE_FILE
+        update_date_url_response = fetch_text(update_date_url)
 
-    # Get update date
-    update_date_url =  base_url + DASHBOARD_UPDATE_DATE_FILE
-    update_date_url_response = requests.get(update_date_url, headers=headers)
-    update_date = datetime.strptime(update_date_url_response.text, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d")
+        # Get update data
+        url = base_url+DASHBOARD_DATA_FILE
+
+        url_response = fetch_text(url)
+    with stage("parse"):
+        revised_data = parse_revised_data(url_response, update_date_url_response)
+        count("rows_out", len(revised_data))
+    return(revised_data)
 
-    #update_date = datetime.strptime(update_date_url_response.text,"%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d") #"%m/%d/%Y %H:%M:%S"
+def parse_revised_data(data_text, update_date_text):
+    """ Parse the dashboard's weekly data file and update date (as downloaded by `get_revised_data`) """
+    update_date = datetime.strptime(update_date_text, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d")
 
-    # Get update data
-    url = base_url+DASHBOARD_DATA_FILE
+    #update_date = datetime.strptime(update_date_url_response,"%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d") #"%m/%d/%Y %H:%M:%S"
 
-    url_response = requests.get(url, headers=headers)
-    df = pd.read_csv(io.StringIO(url_response.text))
+    df = pd.read_csv(io.StringIO(data_text))
 
-    df['virus'] = [abbreviate_virus(v) for v in df['virus']]
-    epiw =  df.apply(lambda x: Week(x['year'],x['week']),axis=1)
-    df.insert(0,"epiweek",[int(str(w)) for w in epiw])
-    df['epiweek'] = [int(str(w)) for w in df['epiweek']]
-    df['province'] = [abbreviate_geo(g) for g in df['province']]
+    df['virus'] = abbreviate_virus_series(df['virus'])
+    df.insert(0,"epiweek",epiweeks(df['year'],df['week']))
+    df['province'] = abbreviate_geo_series(df['province'])
     df=df.rename(columns={'province':"geo_value",'date':'time_value',"detections":"positivetests"})
-    df['time_value'] = [check_date_format(d) for d in df['time_value']]
-    df['geo_type'] = [create_geo_types(g,"province") for g in df['geo_value']]
+    df['time_value'] = iso_dates(df['time_value'])
+    df['geo_type'] = create_geo_types_series(df['geo_value'],"province")
     df.insert(1,"issue",update_date)
 
     df=df.drop(["weekorder","region","year","week"],axis=1)
@@ -251,31 +210,24 @@ def get_revised_data(base_url):
     df = df.pivot(index=['epiweek','time_value','issue','geo_type','geo_value'],
                   columns="virus",values=['tests','percentpositive','positivetests'])
     df.columns = ['_'.join(col).strip() for col in df.columns.values]
-    df = df.rename(columns=lambda x: '_'.join(x.split('_')[1:]+x.split('_')[:1]))
-    df.columns=[re.sub("positivetests", "positive_tests",col) for col in df.columns]
-    df.columns=[re.sub("percentpositive", "pct_positive",col) for col in df.columns]
-    df.columns=[re.sub(r' ','_',c) for c in df.columns]
+    df.columns = REVISED_COLUMNS(df.columns)
 
-    for k in range(len(df.columns)):
-        if "pct_positive" in df.columns[k]:
-            assert all([0 <= val <= 100 or math.isnan(val) for val in  df[df.columns[k]]]), "Percentage not from 0-100"
+    for col in df.columns:
+        if "pct_positive" in col:
+            assert (df[col].between(0, 100) | df[col].isna()).all(), "Percentage not from 0-100"
 
     return(df)
 
 def get_weekly_data(base_url,start_year):
-    headers = {
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
-    }
-
     # Get update date
     update_date_url =  base_url + "RVD_UpdateDate.csv"
-    update_date_url_response = requests.get(update_date_url, headers=headers)
-    update_date = datetime.strptime(update_date_url_response.text,"%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d")
+    update_date_url_response = fetch_text(update_date_url)
+    update_date = datetime.strptime(update_date_url_response,"%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d")
 
     # Get current week and year
     summary_url =  base_url + "RVD_SummaryText.csv"
-    summary_url_response = requests.get(summary_url, headers=headers)
-    summary_df = pd.read_csv(io.StringIO(summary_url_response.text))
+    summary_url_response = fetch_text(summary_url)
+    summary_df = pd.read_csv(io.StringIO(summary_url_response))
 
     week_df = summary_df[(summary_df['Section'] == "summary") & (summary_df['Type']=="title")]
     week_string = week_df.iloc[0]['Text'].lower()
@@ -290,26 +242,15 @@ def get_weekly_data(base_url,start_year):
 
     # Get weekly data
     weekly_url = base_url + "RVD_CurrentWeekTable.csv"
-    weekly_url_response = requests.get(weekly_url, headers=headers)
-    weekly_url_response.encoding='UTF-8'
-    df_weekly = pd.read_csv(io.StringIO(weekly_url_response.text))
+    weekly_url_response = fetch_text(weekly_url, encoding='UTF-8')
+    df_weekly = pd.read_csv(io.StringIO(weekly_url_response))
 
-    df_weekly = df_weekly.rename(columns=lambda x: '_'.join(x.split('_')[1:]+x.split('_')[:1]))
+    df_weekly.columns = DASHBOARD_WEEKLY_COLUMNS(df_weekly.columns)
     df_weekly.insert(0,"epiweek",int(str(current_epiweek)))
     df_weekly.insert(1,"time_value",str(current_epiweek.enddate()))
     df_weekly.insert(2,"issue",update_date)
-    df_weekly.columns=[abbreviate_virus(c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'test\b','tests',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'pos\b','positive_tests',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'flua_','flu_a',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'flub_','flu_b',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'bpositive','b_positive',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'apositive','a_positive',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r'flu_ah1_','flu_ah1pdm09_',c) for c in df_weekly.columns]
-    df_weekly.columns=[re.sub(r' ','_',c) for c in df_weekly.columns]
-    df_weekly=df_weekly.rename(columns={'reportinglaboratory':"geo_value"})
-    df_weekly['geo_value'] = [abbreviate_geo(g) for g in df_weekly['geo_value']]
-    df_weekly['geo_type'] = [create_geo_types(g,"lab") for g in df_weekly['geo_value']]
+    df_weekly['geo_value'] = abbreviate_geo_series(df_weekly['geo_value'])
+    df_weekly['geo_type'] = create_geo_types_series(df_weekly['geo_value'],"lab")
 
     #if df_weekly.columns.isin(["weekorder","date","week"]).all():
     df_weekly=df_weekly.drop(["weekorder","date","week"],axis=1)
@@ -382,22 +323,43 @@ def get_report_date(week,start_year,epi=False):
 
     return(report_date)
 
-def extract_captions_of_interest(soup):
+def get_report_dates(weeks,start_year,epi=False):
+    """
+    Get the end dates of a column of reporting/epiweeks, as `get_report_date` does for one week
+
+    weeks - the epidemiological week numbers
+    start_year - the year the season starts in
+    epi - if True, return the dates in cdc format (yearweek)
+
+    """
+    weeks = np.asarray(weeks, dtype=np.int64)
+    years = np.where(weeks < LAST_WEEK_OF_YEAR, int(start_year)+1, int(start_year))
+
+    if not epi:
+        report_dates = week_end_dates(years, weeks)
+    else:
+        report_dates = epiweeks(years, weeks).astype(str).astype(object)
+
+    return(report_dates)
+
+def extract_captions_of_interest(doc):
     """
     finds all the table captions for the current week so tables can be identified
 
     The captions from the 'summary' tag require less parsing, but sometimes they
     are missing. In that case, use the figure captions
+
+    doc - the lxml document of the week's report page
     """
-    captions = soup.findAll('summary')
+    captions = doc.xpath('//summary')
 
     table_identifiers = ["respiratory","number","positive","abbreviation"]
 
     # For every caption, check if all of the table identifiers are missing. If they are,
     # this means the caption is noninformative (i.e just says Figure 1). If any of the captions are
     # noninformative, use the figure captions as captions
-    if sum([all(name not in cap.text.lower() for name in table_identifiers) for cap in captions]) != 0:
-        figcaptions = soup.findAll('figcaption')
+    if sum([all(name not in cap.text_content().lower() for name in table_identifiers) for cap in captions]) != 0:
+        figcaptions = doc.xpath('//figcaption')
         captions = captions + figcaptions
 
     remove_list=[]
@@ -406,15 +368,22 @@ def extract_captions_of_interest(soup):
 
         matches = ["period","abbreviation","cumulative", "compared"] #skip historic comparisons and cumulative tables
         # remove any captions with a class or that are uninformative
-        if any(x in caption.text.lower() for x in matches) or caption.has_attr('class') or all(name not in caption.text.lower() for name in table_identifiers):
+        caption_text = caption.text_content().lower()
+        if any(x in caption_text for x in matches) or 'class' in caption.attrib or all(name not in caption_text for name in table_identifiers):
             remove_list.append(caption)
 
-    new_captions = [cap for cap in captions if cap not in remove_list]
-    new_captions = list(set(new_captions))
+    # Captions with identical markup refer to the same table, so only keep the first
+    new_captions = []
+    seen = set()
+    for cap in captions:
+        key = etree.tostring(cap, with_tail=False)
+        if cap not in remove_list and key not in seen:
+            seen.add(key)
+            new_captions.append(cap)
 
     return(new_captions)
 
-def get_modified_dates(soup,week_end_date):
+def get_modified_dates(doc,week_end_date):
     """
     Get the date the report page was modfified
 
@@ -424,7 +393,7 @@ def get_modified_dates(soup,week_end_date):
     updated full-week data. Therefore, we use the modified date as the issue
     date for a given report.
     """
-    meta_tags=soup.find_all("meta",title="W3CDTF")
+    meta_tags=doc.xpath('//meta[@title="W3CDTF"]')
     for tag in meta_tags:
         if tag.get("name", None) == "dcterms.modified" or tag.get("property", None) == "dcterms.modified":
             modified_date = tag.get("content", None)
@@ -503,6 +472,116 @@ def make_signal_type_spelling_consistent(signal):
     new_signal = re.sub("total ", "",signal)
     return(new_signal)
 
+def swap_name_parts(name):
+    """ Move the first underscore separated part of a name to the end (e.g. test_flu -> flu_test)"""
+    return('_'.join(name.split('_')[1:]+name.split('_')[:1]))
+
+def add_positive_tests_suffix(name):
+    """ Columns that are not test counts or the location hold positive tests """
+    if any(x in name for x in ['test','geo_value']):
+        return(name)
+    return(name + " positive_tests")
+
+def abbreviate_virus_positive_tests(name):
+    """ In the number of detections table, every column other than the weeks is a virus """
+    if 'week' in name:
+        return(name)
+    return(abbreviate_virus(name) + " positive_tests")
+
+# Column name rewrite rules for each kind of table, applied in order.
+# Report tables (all tables on the weekly report pages)
+REPORT_COLUMNS = ColumnRewriter("report", [
+    ("nbsp", "\xa0", " "), # \xa0 to space
+    ("duplicate suffix", r"(.*?)(\.\d+)", r"\1"), # remove .# for duplicated columns
+    ("periods", r"\.", ""), #remove periods
+    ("all", r"\((all)\)", ""), # remove (all)
+    ("brackets with space", r"\s*\(|\)", ""),
+    ("multiple spaces", ' +', ' '), # Make any muliple spaces into one space
+    ("brackets", r'\(|\)', ''),
+    ("slash", r'/', '_'), # replace / with _
+    ("atlantic", r"^at\b", "atl "),
+    ("canada", "canada", "can"),
+    ("h1n1", r"h1n1 2009 |h1n12009", "ah1n1pdm09"),
+    ("virus", abbreviate_virus), # abbreviate viruses
+    ("flu a", r"flu a", "flua"),
+    ("flu b", r"flu b", "flub"),
+    ("flu test", "flutest", "flu test"),
+    ("other hpiv", r"other hpiv", "hpivother"),
+])
+
+# Lab level respiratory virus detections table
+DETECTIONS_COLUMNS = ColumnRewriter("detections", [
+    ("signal spelling", make_signal_type_spelling_consistent),
+    ("flu prefix", add_flu_prefix),
+    ("positive tests", add_positive_tests_suffix),
+    ("positive space", " positive", "_positive"),
+    ("tests space", " tests", "_tests"),
+    ("spaces", " ", ""),
+])
+
+# National number of positive detections table
+NUMBER_DETECTIONS_COLUMNS = ColumnRewriter("number_detections", [
+    ("virus positive tests", abbreviate_virus_positive_tests),
+    ("week end", "^week end$", "time_value"),
+    ("spaces", " ", "_"),
+    ("week", "^week$", "epiweek"),
+])
+
+# Regional positive tests (%) tables
+PERCENT_POSITIVE_RULES = [
+    ("percent", " *%", "_pct_positive"),
+    ("multiple spaces", ' +', ' '),
+]
+PERCENT_POSITIVE_COLUMNS = ColumnRewriter("percent_positive", PERCENT_POSITIVE_RULES)
+FLU_PERCENT_POSITIVE_COLUMNS = ColumnRewriter("flu_percent_positive", PERCENT_POSITIVE_RULES + [
+    ("flu a", "a_pct", "flua_pct"),
+    ("flu b", "b_pct", "flub_pct"),
+])
+
+# Dashboard files
+REVISED_COLUMNS = ColumnRewriter("revised", [
+    ("swap", swap_name_parts),
+    ("positive tests", "positivetests", "positive_tests"),
+    ("percent positive", "percentpositive", "pct_positive"),
+    ("spaces", r' ', '_'),
+])
+
+DASHBOARD_WEEKLY_COLUMNS = ColumnRewriter("dashboard_weekly", [
+    ("swap", swap_name_parts),
+    ("virus", abbreviate_virus),
+    ("tests", r'test\b', 'tests'),
+    ("positive tests", r'pos\b', 'positive_tests'),
+    ("flu a", r'flua_', 'flu_a'),
+    ("flu b", r'flub_', 'flu_b'),
+    ("b positive", r'bpositive', 'b_positive'),
+    ("a positive", r'apositive', 'a_positive'),
+    ("h1", r'flu_ah1_', 'flu_ah1pdm09_'),
+    ("spaces", r' ', '_'),
+], mapping={'reportinglaboratory': "geo_value"})
+
+# Final names shared by the report and dashboard tables
+CANONICAL_COLUMNS = ColumnRewriter("canonical", [], mapping=COL_MAPPERS)
+
+COLUMN_REWRITERS = [REPORT_COLUMNS, DETECTIONS_COLUMNS, NUMBER_DETECTIONS_COLUMNS,
+                    PERCENT_POSITIVE_COLUMNS, FLU_PERCENT_POSITIVE_COLUMNS,
+                    REVISED_COLUMNS, DASHBOARD_WEEKLY_COLUMNS, CANONICAL_COLUMNS]
+
+def column_rewrite_report():
+    """ The headers seen by each column rewriter in this process, and the rules that fired for them """
+    return({rewriter.name: rewriter.report() for rewriter in COLUMN_REWRITERS})
+
+def merge_column_rewrite_report(report):
+    """ Add a `column_rewrite_report` of another process (e.g. a pool worker) to this process's rewriters """
+    for rewriter in COLUMN_REWRITERS:
+        rewriter.merge(report.get(rewriter.name, {}))
+
+def write_column_rewrite_report():
+    """ Write `column_rewrite_report` to the file named by RVDSS_COLUMN_REPORT, if it is set """
+    column_report_path = os.environ.get("RVDSS_COLUMN_REPORT")
+    if column_report_path:
+        with open(column_report_path, "w", encoding="utf-8") as f:
+            json.dump(column_rewrite_report(), f, indent=2, ensure_ascii=False)
+
 def preprocess_table_columns(table):
     """
     Remove characters like . or * from columns
@@ -510,24 +589,7 @@ def preprocess_table_columns(table):
     Change some naming of signals in columns (i.e order of hpiv and other)
     Change some naming of locations in columns (i.e at instead of atl)
     """
-    table.columns = [re.sub("\xa0"," ", col) for col in table.columns] # \xa0 to space
-    table.columns = [re.sub("(.*?)(\.\d+)", "\\1", c) for c in table.columns] # remove .# for duplicated columns
-    table.columns =[re.sub("\.", "", s)for s in table.columns] #remove periods
-    table.columns =[re.sub(r"\((all)\)", "", s)for s in table.columns] # remove (all)
-    table.columns =[re.sub(r"\s*\(|\)", "", s)for s in table.columns]
-    table.columns = [re.sub(' +', ' ', col) for col in table.columns] # Make any muliple spaces into one space
-    table.columns = [re.sub(r'\(|\)', '', col) for col in table.columns] # replace () for _
-    table.columns = [re.sub(r'/', '_', col) for col in table.columns] # replace / with _
-
-    table.columns = [re.sub(r"^at\b","atl ",t) for t in table.columns]
-    table.columns = [re.sub("canada","can",t) for t in table.columns]
-
-    table.columns =[re.sub(r"h1n1 2009 |h1n12009", "ah1n1pdm09", s)for s in table.columns]
-    table.columns =[abbreviate_virus(col) for col in table.columns] # abbreviate viruses
-    table.columns = [re.sub(r"flu a","flua",t) for t in table.columns]
-    table.columns = [re.sub(r"flu b","flub",t) for t in table.columns]
-    table.columns = [re.sub("flutest","flu test", col) for col in table.columns]
-    table.columns = [re.sub(r"other hpiv","hpivother",t) for t in table.columns]
+    table.columns = REPORT_COLUMNS(table.columns)
 
     return(table)
 
@@ -539,59 +601,70 @@ def create_detections_table(table,modified_date,week_number,week_end_date,start_
     if start_year==2016 and week_number==3:
         table["geo_value"]=[re.sub("^province of$","alberta",c) for c in table["geo_value"]]
 
-    # make naming consistent
-    table.columns=[make_signal_type_spelling_consistent(col) for col in table.columns]
-    table.columns=[add_flu_prefix(col) for col in table.columns]
-    matches=['test','geo_value']
-
-    new_names = []
-    for i in range(len(table.columns)):
-        if not any(x in table.columns[i] for x in matches):
-            new_names.append(table.columns[i]+ " positive_tests")
-        else:
-            new_names.append(table.columns[i])
-
-    table.columns=new_names
-
-    # remove any underscores or spaces from virus names
-    table.columns=[re.sub(" positive","_positive",t) for t in table.columns]
-    table.columns=[re.sub(" tests","_tests",t) for t in table.columns]
-    table.columns=[re.sub(" ","",t) for t in table.columns]
+    # make naming consistent, and remove any underscores or spaces from virus names
+    # (DETECTIONS_COLUMNS leaves no spaces in any column name)
+    table.columns = DETECTIONS_COLUMNS(table.columns)
 
-    table['geo_value'] = [abbreviate_geo(g) for g in table['geo_value']]
-    geo_types = [create_geo_types(g,"lab") for g in table['geo_value']]
+    table['geo_value'] = abbreviate_geo_series(table['geo_value'])
+    geo_types = create_geo_types_series(table['geo_value'],"lab")
 
     table = table.assign(**{'epiweek': get_report_date(week_number, start_year,epi=True),
                     'time_value': week_end_date,
                     'issue': modified_date,
                     'geo_type':geo_types})
-
-    table.columns =[re.sub(" ","_",col) for col in table.columns]
     return(table)
 
 def create_number_detections_table(table,modified_date,start_year):
-    week_columns = table.columns.get_indexer(table.columns[~table.columns.str.contains('week')])
-
-    for index in week_columns:
-        new_name = abbreviate_virus(table.columns[index]) + " positive_tests"
-        table.rename(columns={table.columns[index]: new_name}, inplace=True)
-
     if "week end" not in table.columns:
-        week_ends = [get_report_date(week,start_year) for week in table["week"]]
+        week_ends = get_report_dates(table["week"],start_year)
         table.insert(1,"week end",week_ends)
 
+    table.columns = NUMBER_DETECTIONS_COLUMNS(table.columns)
     table = table.assign(**{'issue': modified_date,
                     'geo_type': "nation",
                     'geo_value': "ca"})
 
-    table=table.rename(columns={'week end':"time_value"})
-    table.columns =[re.sub(" ","_",col) for col in table.columns]
-    table['time_value'] = [check_date_format(d) for d in table['time_value']]
-
-    table=table.rename(columns={'week':"epiweek"})
-    table['epiweek'] = [get_report_date(week, start_year,epi=True) for week in table['epiweek']]
+    table['time_value'] = iso_dates(table['time_value'])
+    table['epiweek'] = get_report_dates(table['epiweek'], start_year,epi=True)
     return(table)
 
+def pct_positive_signals(viruses):
+    """ The `{virus}_pct_positive` signal of each virus, in the format of DERIVED_SIGNALS """
+    return({f"{virus}_pct_positive": (f"{virus}_positive_tests", f"{virus}_tests") for virus in viruses})
+
+def derive_pct_positive(df, signals):
+    """
+    Compute percent positive signals as 100 * positive tests / tests, for all signals at once
+
+    Where the number of tests is 0 the percentage is set to 0, and where either count
+    is missing it is NaN. The count columns are converted to numeric first.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to modify.
+    signals (dict): output column -> (positive tests column, tests column). Signals
+                    whose count columns are not in the DataFrame are skipped.
+
+    Returns:
+    pd.DataFrame: The modified DataFrame with the signal columns added or replaced.
+    """
+    signals = {name: cols for name, cols in signals.items()
+               if cols[0] in df.columns and cols[1] in df.columns}
+    if not signals:
+        return df
+
+    count_columns = list(dict.fromkeys(col for cols in signals.values() for col in cols))
+    for col in count_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    positives = df[[cols[0] for cols in signals.values()]].to_numpy(dtype=float)
+    tests = df[[cols[1] for cols in signals.values()]].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(tests != 0, positives / tests * 100, 0.0)
+
+    for i, name in enumerate(signals):
+        df[name] = pct[:, i]
+    return df
+
 def create_pct_positive_col(df, viruses):
     """
     This function creates '_pct_positive' columns in the DataFrame for each virus 
@@ -604,38 +677,20 @@ def create_pct_positive_col(df, viruses):
     Returns:
     pd.DataFrame: The modified DataFrame with new '_pct_positive' columns.
     """
-    for virus in viruses:
-        positive_column = f"{virus}_positive_tests"
-        tests_column = f"{virus}_tests"
-        pct_column = f"{virus}_pct_positive"
-
-        # Ensure both positive tests and total tests columns exist
-        if positive_column in df.columns and tests_column in df.columns:
-             df[positive_column] = pd.to_numeric(df[positive_column], errors='coerce')
-             df[tests_column] = pd.to_numeric(df[tests_column], errors='coerce')
-            # Calculate the percentage and handle division by zero
-             df[pct_column] = df.apply(
-                lambda row: (row[positive_column] / row[tests_column] * 100) if row[tests_column] != 0 else 0,
-                axis=1
-            )
-    
-    return df
+    return derive_pct_positive(df, pct_positive_signals(viruses))
 
 def create_percent_positive_detection_table(table,modified_date,start_year, flu=False,overwrite_weeks=False):
     table = deduplicate_rows(table)
-    table.columns=[re.sub(" *%", "_pct_positive",col) for col in table.columns]
-    table.columns = [re.sub(' +', ' ',col) for col in table.columns]
+    table.columns = FLU_PERCENT_POSITIVE_COLUMNS(table.columns) if flu else PERCENT_POSITIVE_COLUMNS(table.columns)
     table.insert(2,"issue",modified_date)
     table=table.rename(columns={'week end':"time_value"})
-    table['time_value'] = [check_date_format(d) for d in table['time_value']]
+    table['time_value'] = iso_dates(table['time_value'])
 
     # get the name of the virus for the table to append to column names
     virus_prefix=[]
     if flu:
         virus_prefix=['flua_pct_positive','flub_pct_positive']
         virus="flu"
-        table.columns=[re.sub("a_pct","flua_pct",c) for c in table.columns]
-        table.columns=[re.sub("b_pct","flub_pct",c) for c in table.columns]
     else:
         names=[]
         for j in range(len(table.columns)):
@@ -652,8 +707,7 @@ def create_percent_positive_detection_table(table,modified_date,start_year, flu=
 
     # Remake the weeks column from dates
     if overwrite_weeks:
-        week_ends = [datetime.strptime(date_string, "%Y-%m-%d") for date_string in table['time_value']]
-        table["week"] = [Week.fromdate(d).week for d in week_ends]
+        table["week"] = epiweeks_from_dates(table['time_value']) % 100
 
     # Change order of column names so tthey start with stubbnames
     table  = table.rename(columns=lambda x: ' '.join(x.split(' ')[::-1])) #
@@ -665,10 +719,10 @@ def create_percent_positive_detection_table(table,modified_date,start_year, flu=
     table.columns =[re.sub(" ","_",col) for col in table.columns]
 
     table=table.rename(columns={'week':"epiweek"})
-    table['epiweek'] = [get_report_date(week, start_year,epi=True) for week in table['epiweek']]
+    table['epiweek'] = get_report_dates(table['epiweek'], start_year,epi=True)
 
-    table['geo_value']= [abbreviate_geo(g) for g in table['geo_value']]
-    geo_types = [create_geo_types(g,"lab") for g in table['geo_value']]
+    table['geo_value']= abbreviate_geo_series(table['geo_value'])
+    geo_types = create_geo_types_series(table['geo_value'],"lab")
     table.insert(3,"geo_type",geo_types)
 
     # Calculate number of positive tests based on pct_positive and total tests
@@ -757,14 +811,24 @@ def rename_and_merge_duplicate_columns(df):
 
     return df
 
+def process_positive_table(table):
+    """ Make the columns of a positive tests table canonical, as `process_tables` does """
+    table.columns = CANONICAL_COLUMNS(table.columns)
+    table = table.drop(columns=['flu_a_tests', 'flu_b_tests'], errors='ignore')
+    table = table.drop(columns=table.filter(regex=r'fluah1|fluah3|fluauns').columns)
+    table = table.drop(columns=table.filter(regex=r'flu_ah1|flu_ah3|flu_auns').columns)
+    table = rename_and_merge_duplicate_columns(table)
+    return(table)
+
+@timed("process_tables")
 def process_tables(all_respiratory_detection_table, all_positive_tables, COL_MAPPERS, viruses):
+    count("rows_in", len(all_respiratory_detection_table) + len(all_positive_tables))
+
     # Step 1: Rename columns in both tables using COL_MAPPERS
-    all_respiratory_detection_table = all_respiratory_detection_table.rename(columns=COL_MAPPERS)
-    all_positive_tables = all_positive_tables.rename(columns=COL_MAPPERS)
+    all_respiratory_detection_table.columns = CANONICAL_COLUMNS(all_respiratory_detection_table.columns)
 
     # Drop 'flu_a_tests' and 'flu_b_tests' columns if they exist
     all_respiratory_detection_table = all_respiratory_detection_table.drop(columns=['flu_a_tests', 'flu_b_tests'], errors='ignore')
-    all_positive_tables = all_positive_tables.drop(columns=['flu_a_tests', 'flu_b_tests'], errors='ignore')
 
     # Step 2: Create hpiv_positive_tests by summing relevant columns
     all_respiratory_detection_table = create_hpiv_positive_tests(all_respiratory_detection_table)
@@ -773,20 +837,15 @@ def process_tables(all_respiratory_detection_table, all_positive_tables, COL_MAP
     all_respiratory_detection_table = all_respiratory_detection_table.drop(
         columns=all_respiratory_detection_table.filter(regex=r'fluah1|fluah3|fluauns').columns
     )
-
-    all_positive_tables = all_positive_tables.drop(
-        columns=all_positive_tables.filter(regex=r'fluah1|fluah3|fluauns').columns
-    )
     all_respiratory_detection_table = all_respiratory_detection_table.drop(
         columns=all_respiratory_detection_table.filter(regex=r'flu_ah1|flu_ah3|flu_auns').columns
     )
 
-    all_positive_tables = all_positive_tables.drop(
-        columns=all_positive_tables.filter(regex=r'flu_ah1|flu_ah3|flu_auns').columns
-    )
-    # Step 4: Rename and merge duplicate columns in both tables
+    # Step 4: Rename and merge duplicate columns
     all_respiratory_detection_table = rename_and_merge_duplicate_columns(all_respiratory_detection_table)
-    all_positive_tables = rename_and_merge_duplicate_columns(all_positive_tables)
+
+    # The positive tests tables only need steps 1, 3 and 4
+    all_positive_tables = process_positive_table(all_positive_tables)
 
     # Step 5: Convert 'flu_tests' to numeric
     all_respiratory_detection_table['flu_tests'] = pd.to_numeric(all_respiratory_detection_table['flu_tests'], errors='coerce')
@@ -796,36 +855,215 @@ def process_tables(all_respiratory_detection_table, all_positive_tables, COL_MAP
         all_respiratory_detection_table['flua_positive_tests'] + all_respiratory_detection_table['flub_positive_tests']
     )
 
-    # Step 7: Create percentage columns for various viruses
-    all_respiratory_detection_table = create_pct_positive_col(all_respiratory_detection_table, viruses)
+    # Step 7: Create percentage columns for each virus, and for flu a and b out of all flu tests
+    signals = {**pct_positive_signals(viruses), **DERIVED_SIGNALS}
+    all_respiratory_detection_table = derive_pct_positive(all_respiratory_detection_table, signals)
 
-    # Step 8: Ensure 'flua_positive_tests' and 'flub_positive_tests' are numeric
-    all_respiratory_detection_table['flua_positive_tests'] = pd.to_numeric(all_respiratory_detection_table['flua_positive_tests'], errors='coerce')
-    all_respiratory_detection_table['flub_positive_tests'] = pd.to_numeric(all_respiratory_detection_table['flub_positive_tests'], errors='coerce')
+    count("rows_out", len(all_respiratory_detection_table) + len(all_positive_tables))
+    return all_respiratory_detection_table, all_positive_tables
 
-    # Step 9: Create 'flua_pct_positive' as (flua_positive_tests / flu_tests) * 100
-    all_respiratory_detection_table['flua_pct_positive'] = all_respiratory_detection_table.apply(
-        lambda row: (row['flua_positive_tests'] / row['flu_tests'] * 100) if row['flu_tests'] != 0 else 0, axis=1
-    )
+def is_skipped_week(start_year, week):
+    """
+    In the 2019-2020 season, the webpages for weeks 5 and 47 only have
+    the abbreviations table and the headers for the respiratory detections
+    table, so they are effectively empty, and skipped
+    """
+    return(start_year == '2019' and week in (5, 47))
 
-    # Step 10: Create 'flub_pct_positive' as (flub_positive_tests / flu_tests) * 100
-    all_respiratory_detection_table['flub_pct_positive'] = all_respiratory_detection_table.apply(
-        lambda row: (row['flub_positive_tests'] / row['flu_tests'] * 100) if row['flu_tests'] != 0 else 0, axis=1
-    )
+@timed("fetch_season_pages")
+def fetch_season_pages(season_urls, checkpoint=None):
+    """
+    Download the landing page and every weekly report page for each season
 
-    return all_respiratory_detection_table, all_positive_tables
+    All landing pages are fetched together, then the week pages of every season
+    are fetched together in one batch, so the wall-clock time is set by the slowest
+    page rather than the sum of all of them. Returns one dict per season, in the
+    order of `season_urls`, holding the landing page text and the week page texts
+    keyed by url. Weeks already saved in `checkpoint` are not downloaded again.
+    """
+    season_urls = list(season_urls)
+    landing_pages = fetch_pages(season_urls)
+
+    week_urls = []
+    with stage("landing_pages"):
+        for url, landing_page in zip(season_urls, landing_pages):
+            soup = BeautifulSoup(landing_page, 'html.parser')
+            season = get_report_season_years(soup)
+            urls = construct_weekly_report_urls(soup)
+            weeks = report_weeks(soup)
+            completed_weeks = checkpoint.completed_weeks(url) if checkpoint is not None else set()
+            week_urls.append([u for u, w in zip(urls, weeks)
+                              if not is_skipped_week(season[0], w) and u not in completed_weeks])
+            count("pages_parsed")
+
+    all_week_urls = [u for urls in week_urls for u in urls]
+    all_week_pages = dict(zip(all_week_urls, fetch_pages(all_week_urls)))
+
+    season_pages = []
+    for url, landing_page, urls in zip(season_urls, landing_pages, week_urls):
+        season_pages.append({'url': url,
+                             'landing_page': landing_page,
+                             'week_pages': {u: all_week_pages[u] for u in urls}})
+    return(season_pages)
+
+def parse_week_report(page, season, current_week, current_week_end):
+    """
+    Parse the tables of interest out of one weekly report page
 
-def get_season_reports(url):
-    # From the url, go to the main landing page for a season
-    # which contains all the links to each week in the season
-    page=requests.get(url)
-    soup=BeautifulSoup(page.text,'html.parser')
+    Returns a dict with the lab level respiratory detections table, the combined
+    positive tests tables and the national number of detections table. Tables
+    that are not on the page are None.
+    """
+    respiratory_detection_table = None
+    number_detections_table = None
+
+    count("pages_parsed")
+    with stage("parse_html"):
+        doc = parse_page(page)
+    captions = extract_captions_of_interest(doc)
+    modified_date = get_modified_dates(doc,current_week_end)
+
+    positive_tables=[]
+    for i in range(len(captions)):
+        caption=captions[i]
+        caption_text = caption.text_content()
+        tab = table_after(caption)
+
+        # Remove footers from tables so the text isn't read in as a table row
+        tfoot = tab.find('.//tfoot')
+        if tfoot is not None:
+            tfoot.drop_tree()
+
+        # In the positive adenovirus table in week 35 of the 2019-2020 season
+        # The week number has been duplicated, which makes all the entries in the table
+        # are one column to the right of where they should be. To fix this the
+        # entry in the table (which is the first "td" element in the html) is deleted
+        if season[0] == '2019' and current_week == 35:
+            if "Positive Adenovirus" in caption_text:
+                tab.find('.//td').drop_tree()
+
+        # Read table, coding all the abbreviations for missing data into NA
+        # Some "number of detections" tables have number with commas (i.e 1,000)
+        # In this case the commas must be deleted, otherwise turn into periods
+        # because some tables have commas instead of decimal points
+        # Also use dropna because removing footers causes the html to have an empty row
+        with stage("read_table"):
+            table = read_table(tab, comma_as_decimal="number" not in caption_text.lower(),
+                               na_values=NA_VALUES).dropna(how="all")
+        count("tables_parsed")
+
+        # Check for multiline headers
+        # If there are any, combine them into a single line header
+        if isinstance(table.columns, pd.MultiIndex):
+            table.columns = [c[0] + " " + c[1] if c[0] != c[1] else c[0] for c in table.columns]
+
+        # Make column names lowercase
+        table.columns=table.columns.str.lower()
+
+        # One-off edge cases where tables need to be manually adjusted because
+        # they will cause errors otherwise
+        if season[0] == '2017':
+            if current_week == 35 and "entero" in caption_text.lower():
+                # The positive enterovirus table in week 35 of the 2017-2018 season has french
+                # in the headers,so the french needs to be removed
+                table.columns = ['week', 'week end', 'canada tests', 'entero/rhino%', 'at tests',
+                   'entero/rhino%.1', 'qc tests', 'entero/rhino%.2', 'on tests',
+                   'entero/rhino%.3', 'pr tests', 'entero/rhino%.4', 'bc tests',
+                   'entero/rhino%.5']
+            elif current_week == 35 and "adeno" in caption_text.lower():
+                # In week 35 of the 2017-2018, the positive adenovirus table has ">week end"
+                # instead of "week end", so remove > from the column
+                table = table.rename(columns={'>week end':"week end"})
+            elif current_week == 47 and "rsv" in caption_text.lower():
+                #  In week 47 of the 2017-2018 season, a date is written as 201-11-25,
+                #  instead of 2017-11-25
+                table.loc[table['week'] == 47, 'week end'] = "2017-11-25"
+        elif season[0] == '2015' and current_week == 41:
+            # In week 41 of the 2015-2016 season, a date written in m-d-y format not d-m-y
+            table=table.replace("10-17-2015","17-10-2015",regex=True)
+        elif season[0] == '2022' and current_week == 11 and "hmpv" in caption_text.lower():
+            #  In week 11 of the 2022-2023 season, in the positive hmpv table,
+            # a date is written as 022-09-03, instead of 2022-09-03
+             table.loc[table['week'] == 35, 'week end'] = "2022-09-03"
+
+        # Rename columns
+        table= preprocess_table_columns(table)
+
+        # If "reporting laboratory" is one of the columns of the table, the table must be
+        # the "Respiratory virus detections " table for a given week
+        # this is the lab level table that has weekly positive tests for each virus, with no revisions
+        # and each row represents a lab
+
+        # If "number" is in the table caption, the table must be the
+        # "Number of positive respiratory detections" table, for a given week
+        # this is a national level table, reporting the number of detections for each virus,
+        # this table has revisions, so each row is a week in the season, with weeks going from the
+        # start of the season up to and including the current week
+
+        # If "positive" is in the table caption, the table must be one of the
+        # "Positive [virus] Tests (%)" table, for a given week
+        # This is a region level table, reporting the total tests and percent positive tests  for each virus,
+        # this table has revisions, so each row is a week in the season, with weeks going from the
+        # start of the season up to and including the current week
+        # The columns have the region information (i.e Pr tests, meaning this columns has the tests for the prairies)
+
+        if "reporting laboratory" in str(table.columns):
+           respiratory_detection_table = create_detections_table(table,modified_date,current_week,current_week_end,season[0])
+           respiratory_detection_table = respiratory_detection_table.set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
+        elif "number" in caption_text.lower():
+           number_detections_table = create_number_detections_table(table,modified_date,season[0])
+           number_detections_table = number_detections_table.set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
+        elif "positive" in caption_text.lower():
+           flu = " influenza" in caption_text.lower()
+
+           # tables are missing week 53
+           # In the 2014-2015 season the year ends at week 53 before starting at week 1 again.
+           # weeks 53,2 and 3 skip week 53 in the positive detection tables, going from 52 to 1,
+           # this means the week numbers following 52 are 1 larger then they should be
+           # fix this by overwriting the week number columns
+
+           missing_week_53 = [53,2,3]
+           if season[0]=="2014" and current_week in missing_week_53:
+               overwrite_weeks=True
+           else:
+               overwrite_weeks=False
+
+           pos_table = create_percent_positive_detection_table(table,modified_date,season[0],flu,overwrite_weeks)
+
+           # Check for percentages >100
+           # One in 2014-2015 week 39, left in
+           if season[0] != '2014' and current_week != 39:
+               for k in range(len(pos_table.columns)):
+                   if "pct_positive" in pos_table.columns[k]:
+                       assert all([0 <= val <= 100 or math.isnan(val) for val in  pos_table[pos_table.columns[k]]]), "Percentage not from 0-100"
+
+           positive_tables.append(pos_table)
+
+    # combine all the positive tables
+    combined_positive_tables=pd.concat(positive_tables,axis=1)
+
+    return({'respiratory_detection': respiratory_detection_table,
+            'positive': combined_positive_tables,
+            'number': number_detections_table})
+
+@timed("parse_season")
+def parse_season(url, season_pages, checkpoint=None):
+    """
+    Parse the weekly report pages of a season into its respiratory detections and positive tests tables
+
+    Returns the season's (start year, end year) and the two tables, with the columns as read from the pages.
+    """
+    with stage("landing_page"):
+        soup=BeautifulSoup(season_pages['landing_page'],'html.parser')
+
+        # get season, week numbers, urls and week ends
+        season = get_report_season_years(soup)
+        urls=construct_weekly_report_urls(soup)
+        weeks= report_weeks(soup)
+        end_dates = list(get_report_dates(weeks, season[0]))
+        count("pages_parsed")
 
-    # get season, week numbers, urls and week ends
-    season = get_report_season_years(soup)
-    urls=construct_weekly_report_urls(soup)
-    weeks= report_weeks(soup)
-    end_dates = [get_report_date(week, season[0]) for week in weeks]
+    completed_weeks = checkpoint.completed_weeks(url) if checkpoint is not None else set()
 
     # create tables to hold all the data for the season
     all_positive_tables=pd.DataFrame()
@@ -836,142 +1074,24 @@ def get_season_reports(url):
         current_week = weeks[week_num]
         current_week_end = end_dates[week_num]
 
-        # In the 2019=2020 season, the webpages for weeks 5 and 47 only have
-        # the abbreviations table and the headers for the respiratory detections
-        # table, so they are effectively empty, and skipped
-        if season[0] == '2019':
-            if current_week == 5 or current_week == 47:
-                continue
+        if is_skipped_week(season[0], current_week):
+            continue
 
-        # Get page for the current week
+        # Get the tables for the current week, from the checkpoint if this
+        # week was already parsed by an earlier, interrupted run
         temp_url=urls[week_num]
-        temp_page=requests.get(temp_url)
-        new_soup = BeautifulSoup(temp_page.text, 'html.parser')
-        captions = extract_captions_of_interest(new_soup)
-        modified_date = get_modified_dates(new_soup,current_week_end)
-
-        positive_tables=[]
-        number_table_exists = False
-        for i in range(len(captions)):
-            caption=captions[i]
-            tab = caption.find_next('table')
-
-            # Remove footers from tables so the text isn't read in as a table row
-            if tab.find('tfoot'):
-                tab.tfoot.decompose()
-
-            # In the positive adenovirus table in week 35 of the 2019-2020 season
-            # The week number has been duplicated, which makes all the entries in the table
-            # are one column to the right of where they should be. To fix this the
-            # entry in the table (which is the first "td" element in the html) is deleted
-            if season[0] == '2019' and current_week == 35:
-                if "Positive Adenovirus" in caption.text:
-                    tab.select_one('td').decompose()
-
-            # Replace commas with periods
-            # Some "number of detections" tables have number with commas (i.e 1,000)
-            # In this case the commas must be deleted, otherwise turn into periods
-            # because some tables have commas instead of decimal points
-            if "number" not in caption.text.lower():
-                tab = re.sub(",",r".",str(tab))
-            else:
-                tab = re.sub(",","",str(tab))
-
-            # Read table, coding all the abbreviations for missing data into NA
-            # Also use dropna because removing footers causes the html to have an empty row
-            na_values = ['N.A.','N.A', 'N.C.','N.R.','Not Available','Not Tested',"N.D.","-"]
-            table =  pd.read_html(tab,na_values=na_values)[0].dropna(how="all")
-
-            # Check for multiline headers
-            # If there are any, combine them into a single line header
-            if isinstance(table.columns, pd.MultiIndex):
-                table.columns = [c[0] + " " + c[1] if c[0] != c[1] else c[0] for c in table.columns]
-
-            # Make column names lowercase
-            table.columns=table.columns.str.lower()
-
-            # One-off edge cases where tables need to be manually adjusted because
-            # they will cause errors otherwise
-            if season[0] == '2017':
-                if current_week == 35 and "entero" in caption.text.lower():
-                    # The positive enterovirus table in week 35 of the 2017-2018 season has french
-                    # in the headers,so the french needs to be removed
-                    table.columns = ['week', 'week end', 'canada tests', 'entero/rhino%', 'at tests',
-                       'entero/rhino%.1', 'qc tests', 'entero/rhino%.2', 'on tests',
-                       'entero/rhino%.3', 'pr tests', 'entero/rhino%.4', 'bc tests',
-                       'entero/rhino%.5']
-                elif current_week == 35 and "adeno" in caption.text.lower():
-                    # In week 35 of the 2017-2018, the positive adenovirus table has ">week end"
-                    # instead of "week end", so remove > from the column
-                    table = table.rename(columns={'>week end':"week end"})
-                elif current_week == 47 and "rsv" in caption.text.lower():
-                    #  In week 47 of the 2017-2018 season, a date is written as 201-11-25,
-                    #  instead of 2017-11-25
-                    table.loc[table['week'] == 47, 'week end'] = "2017-11-25"
-            elif season[0] == '2015' and current_week == 41:
-                # In week 41 of the 2015-2016 season, a date written in m-d-y format not d-m-y
-                table=table.replace("10-17-2015","17-10-2015",regex=True)
-            elif season[0] == '2022' and current_week == 11 and "hmpv" in caption.text.lower():
-                #  In week 11 of the 2022-2023 season, in the positive hmpv table,
-                # a date is written as 022-09-03, instead of 2022-09-03
-                 table.loc[table['week'] == 35, 'week end'] = "2022-09-03"
-
-            # Rename columns
-            table= preprocess_table_columns(table)
-
-            # If "reporting laboratory" is one of the columns of the table, the table must be
-            # the "Respiratory virus detections " table for a given week
-            # this is the lab level table that has weekly positive tests for each virus, with no revisions
-            # and each row represents a lab
-
-            # If "number" is in the table caption, the table must be the
-            # "Number of positive respiratory detections" table, for a given week
-            # this is a national level table, reporting the number of detections for each virus,
-            # this table has revisions, so each row is a week in the season, with weeks going from the
-            # start of the season up to and including the current week
-
-            # If "positive" is in the table caption, the table must be one of the
-            # "Positive [virus] Tests (%)" table, for a given week
-            # This is a region level table, reporting the total tests and percent positive tests  for each virus,
-            # this table has revisions, so each row is a week in the season, with weeks going from the
-            # start of the season up to and including the current week
-            # The columns have the region information (i.e Pr tests, meaning this columns has the tests for the prairies)
-
-            if "reporting laboratory" in str(table.columns):
-               respiratory_detection_table = create_detections_table(table,modified_date,current_week,current_week_end,season[0])
-               respiratory_detection_table = respiratory_detection_table.set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
-            elif "number" in caption.text.lower():
-               number_table_exists = True
-               number_detections_table = create_number_detections_table(table,modified_date,season[0])
-               number_detections_table = number_detections_table.set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
-            elif "positive" in caption.text.lower():
-               flu = " influenza" in caption.text.lower()
-
-               # tables are missing week 53
-               # In the 2014-2015 season the year ends at week 53 before starting at week 1 again.
-               # weeks 53,2 and 3 skip week 53 in the positive detection tables, going from 52 to 1,
-               # this means the week numbers following 52 are 1 larger then they should be
-               # fix this by overwriting the week number columns
-
-               missing_week_53 = [53,2,3]
-               if season[0]=="2014" and current_week in missing_week_53:
-                   overwrite_weeks=True
-               else:
-                   overwrite_weeks=False
-
-               pos_table = create_percent_positive_detection_table(table,modified_date,season[0],flu,overwrite_weeks)
-
-               # Check for percentages >100
-               # One in 2014-2015 week 39, left in
-               if season[0] != '2014' and current_week != 39:
-                   for k in range(len(pos_table.columns)):
-                       if "pct_positive" in pos_table.columns[k]:
-                           assert all([0 <= val <= 100 or math.isnan(val) for val in  pos_table[pos_table.columns[k]]]), "Percentage not from 0-100"
-
-               positive_tables.append(pos_table)
-
-        # combine all the positive tables
-        combined_positive_tables=pd.concat(positive_tables,axis=1)
+        if temp_url in completed_weeks:
+            week_tables = checkpoint.load_week(url, temp_url)
+            count("checkpoint_hits")
+        else:
+            week_tables = parse_week_report(season_pages['week_pages'][temp_url], season, current_week, current_week_end)
+            if checkpoint is not None:
+                checkpoint.save_week(url, temp_url, current_week, week_tables)
+
+        if week_tables['respiratory_detection'] is not None:
+            respiratory_detection_table = week_tables['respiratory_detection']
+        combined_positive_tables = week_tables['positive']
+        number_detections_table = week_tables['number']
 
         # Check if the indices are already in the season table
         # If not, add the weeks tables into the season table
@@ -981,10 +1101,53 @@ def get_season_reports(url):
         if not combined_positive_tables.index.isin(all_positive_tables.index).any():
             all_positive_tables=pd.concat([all_positive_tables,combined_positive_tables])
 
-        if number_table_exists:
+        if number_detections_table is not None:
             if not number_detections_table.index.isin(all_number_tables.index).any():
                 all_number_tables=pd.concat([all_number_tables,number_detections_table])
 
+    count("rows_out", len(all_respiratory_detection_table) + len(all_positive_tables))
+    return(season, all_respiratory_detection_table, all_positive_tables)
+
+def season_issue_table(all_respiratory_detection_table, all_positive_tables):
+    """ Every issue of the season's processed tables in one table, for the locations of the target data """
+    # Merge repiratory_detection and positive_test files
+    concatenated_table = pd.concat([all_respiratory_detection_table, all_positive_tables], axis=0)
+    concatenated_table = concatenated_table.reset_index()
+
+    concatenated_table = concatenated_table[concatenated_table['geo_value'].isin(LOC_CORRECTION.keys())]
+    concatenated_table['geo_type'] = concatenated_table['geo_value'].map(LOC_CORRECTION)
+
+    concatenated_table['issue'] = pd.to_datetime(concatenated_table['issue'])
+    return(concatenated_table)
+
+def season_target_table(concatenated_table):
+    """ The season's target data: the latest issue of every row, with the target columns """
+    concatenated_table = coalesce_latest_issue(concatenated_table, ['time_value', 'geo_type', 'geo_value'])
+
+    concatenated_table = concatenated_table.drop(columns=['issue'], errors='ignore')
+    concatenated_table = concatenated_table.drop(columns=['epiweek'], errors='ignore')
+
+    #concatenated_table = concatenated_table.drop(columns=[col for col in concatenated_table.columns if 'pct_positive' in col])
+    #concatenated_table.to_csv(path+"/" + 'raw.csv', index=False)
+
+    for col in concatenated_table.columns:
+        if col not in COLUMNS_TARGET:
+            concatenated_table = concatenated_table.drop(columns=[col])
+        elif 'pct_positive' in col:
+            # Round percentage columns to 2 decimal places
+            concatenated_table[col] = concatenated_table[col].round(2)
+    return(concatenated_table)
+
+@timed("get_season_reports")
+def get_season_reports(url, season_pages=None, checkpoint=None):
+    # From the url, go to the main landing page for a season
+    # which contains all the links to each week in the season.
+    # The pages can be prefetched with `fetch_season_pages`, otherwise
+    # they are downloaded here
+    if season_pages is None:
+        season_pages = fetch_season_pages([url], checkpoint)[0]
+    season, all_respiratory_detection_table, all_positive_tables = parse_season(url, season_pages, checkpoint)
+
     viruses = ['hcov', 'hmpv', 'sarscov2', 'rsv', 'hpiv', 'flu', 'adv', 'ev_rv']
     all_respiratory_detection_table, all_positive_tables = process_tables( all_respiratory_detection_table, all_positive_tables, 
                                                                           COL_MAPPERS, viruses)
@@ -1005,38 +1168,173 @@ def get_season_reports(url):
     if not os.path.exists(path):
         os.makedirs(path)
 
-    all_respiratory_detection_table.to_csv(path_aux+"/" + RESP_COUNTS_OUTPUT_FILE, index=True)
-    all_positive_tables.to_csv(path_aux+"/" + POSITIVE_TESTS_OUTPUT_FILE, index=True)
+    outputs = [path_aux+"/" + RESP_COUNTS_OUTPUT_FILE, path_aux+"/" + POSITIVE_TESTS_OUTPUT_FILE,
+               path_aux+"/" + REVISIONS_OUTPUT_FILE, path+"/" + 'target_rvdss_data.csv']
 
-	# Merge repiratory_detection and positive_test files
-    concatenated_table = pd.concat([all_respiratory_detection_table, all_positive_tables], axis=0)
-    concatenated_table = concatenated_table.reset_index()
-	
-    concatenated_table = concatenated_table[concatenated_table['geo_value'].isin(LOC_CORRECTION.keys())]
-    concatenated_table['geo_type'] = concatenated_table['geo_value'].map(LOC_CORRECTION)
+    with stage("write_raw"):
+        write_csv_and_columnar(all_respiratory_detection_table, outputs[0], index=True)
+        write_csv_and_columnar(all_positive_tables, outputs[1], index=True)
 
-    concatenated_table['issue'] = pd.to_datetime(concatenated_table['issue'])
-    concatenated_table = concatenated_table.groupby(['time_value', 'geo_type', 'geo_value']).apply(lambda x: x.bfill()).sort_values(by='issue', ascending=False)
-    concatenated_table = concatenated_table.drop_duplicates(subset=['time_value', 'geo_type', 'geo_value'], keep='first')
+    with stage("issue_table"):
+        concatenated_table = season_issue_table(all_respiratory_detection_table, all_positive_tables)
 
-    concatenated_table = concatenated_table.drop(columns=['issue'], errors='ignore')
-    concatenated_table = concatenated_table.drop(columns=['epiweek'], errors='ignore')
+    # Keep every issue of the season before only the latest is kept
+    with stage("write_revisions"):
+        RevisionStore.from_table(concatenated_table).save(outputs[2])
 
-    #concatenated_table = concatenated_table.drop(columns=[col for col in concatenated_table.columns if 'pct_positive' in col])
-    #concatenated_table.to_csv(path+"/" + 'raw.csv', index=False)
-    
-    for col in concatenated_table.columns:   
+    with stage("merge"):
+        target_table = season_target_table(concatenated_table)
+        count("rows_in", len(concatenated_table))
+        count("rows_out", len(target_table))
+
+    with stage("write_target"):
+        write_csv_and_columnar(target_table, outputs[3], index=False)
+
+    # A season only stays complete while these files exist, so deleting them writes it again
+    if checkpoint is not None:
+        checkpoint.mark_season_complete(url, outputs)
+
+def season_reports_with_metrics(url, season_pages=None, checkpoint=None):
+    """ `get_season_reports` in a pool worker, returning the worker's run metrics and column rewrite report for the parent to merge """
+    metrics = reset_metrics()
+    get_season_reports(url, season_pages, checkpoint)
+    return({'metrics': metrics.report(), 'columns': column_rewrite_report()})
+
+@timed("backfill_seasons")
+def backfill_seasons(season_urls, checkpoint=None, workers=PARSE_WORKERS):
+    """
+    Fetch and parse historic seasons one at a time, spreading the seasons over a process pool
+
+    The pages of a season are fetched (concurrently) and handed to a worker,
+    which parses and checkpoints them week by week while the next season is
+    fetched. At most `workers` seasons' pages are held at once, and a backfill
+    that stops part way has checkpointed every week parsed until then.
+
+    Each season is parsed on its own and writes to its own directory, so the
+    results don't depend on which worker finishes first. If a season fails, the
+    seasons already handed out still run to completion (and are checkpointed)
+    before the first error is raised. The metrics of the workers are merged into
+    this process's, so their wall times add up to more than the backfill's, and
+    so are the headers their column rewriters saw (see column_rewrite_report).
+    """
+    season_urls = list(season_urls)
+    if workers <= 1 or len(season_urls) <= 1:
+        for url in season_urls:
+            get_season_reports(url, fetch_season_pages([url], checkpoint)[0], checkpoint)
+        return
+
+    workers = min(workers, len(season_urls))
+    futures = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for url in season_urls:
+            running = [future for future in futures if not future.done()]
+            if len(running) >= workers:
+                wait(running, return_when=FIRST_COMPLETED)
+            season_pages = fetch_season_pages([url], checkpoint)[0]
+            futures.append(pool.submit(season_reports_with_metrics, url, season_pages, checkpoint))
+            del season_pages
+    for future in futures:
+        result = future.result()
+        get_metrics().merge(result['metrics'])
+        merge_column_rewrite_report(result['columns'])
+
+def prepare_target_rows(table):
+    """ Put the rows of a raw table in the form used for the target table: parsed issue dates and corrected geo types """
+    table = table.reset_index()
+    table['issue'] = parse_timestamps(table['issue'])
+
+    # Update the geo_type based on LOC_CORRECTION values
+    table = table[table['geo_value'].isin(LOC_CORRECTION.keys())]
+    table['geo_type'] = table['geo_value'].map(LOC_CORRECTION)
+    return(table)
+
+def finish_target_table(table):
+    """ Keep the target columns of coalesced rows, with percentages rounded to 2 decimal places """
+    table = table.drop(columns=['issue'], errors='ignore')
+    table = table.drop(columns=['epiweek','week','date','weekorder'], errors='ignore')
+
+    for col in table.columns:
         if col not in COLUMNS_TARGET:
-            concatenated_table = concatenated_table.drop(columns=[col])
+            table = table.drop(columns=[col])
         elif 'pct_positive' in col:
-            # Round percentage columns to 2 decimal places
-            concatenated_table[col] = concatenated_table[col].round(2)
+            table[col] = table[col].round(2)
 
-    concatenated_table.to_csv(path+"/" + 'target_rvdss_data.csv', index=False)
+    return(table.reset_index(drop=True))
 
-    HISTORIC_SEASON_URL_CHECKPOINT.append(url)
+def coalesce_stores(stores, keys=None):
+    """
+    Coalesce the rows of the stores, only for the given keys (default all)
+
+    With keys, only the partitions holding them (found from each store's index)
+    are read, so a weekly update reads the few issues that report those weeks.
+    """
+    if keys is None:
+        tables = [store.read() for store in stores]
+    else:
+        # geo_type is corrected after reading (prepare_target_rows), so partitions are picked by date and location
+        located = keys.droplevel('geo_type')
+        tables = [store.read(store.partitions_with(located, ['time_value', 'geo_value'])) for store in stores]
+    table = pd.concat([prepare_target_rows(table) for table in tables], axis=0, ignore_index=True)
+    if keys is not None:
+        table = table[pd.MultiIndex.from_frame(table[KEY_COLUMNS].astype(str)).isin(keys)]
+    return(finish_target_table(coalesce_latest_issue(table, KEY_COLUMNS)))
+
+def replace_target_rows(target, rows):
+    """ Replace the rows of the target table whose keys are in `rows`, in place, and add the new keys """
+    columns = list(target.columns) + [col for col in rows.columns if col not in target.columns]
+    target = target.reindex(columns=columns)
+    rows = rows.reindex(columns=columns)
+
+    target_keys = pd.MultiIndex.from_frame(target[KEY_COLUMNS].astype(str))
+    row_keys = pd.MultiIndex.from_frame(rows[KEY_COLUMNS].astype(str))
+    positions = target_keys.get_indexer(row_keys)
+    existing = positions >= 0
+    for col in columns:
+        target.loc[target.index[positions[existing]], col] = rows.loc[existing, col].to_numpy()
+
+    target = pd.concat([target, rows[~existing]], axis=0, ignore_index=True)
+    return(target.sort_values('time_value', ascending=False, kind='mergesort'))
+
+@timed("update_target_table")
+def update_target_table(stores, new_partitions, target_path):
+    """
+    Bring the target table up to date with the partitions just added to the stores
+
+    Only the rows for the keys in the new issue are recomputed and replaced, the
+    rest of the target table is kept as it is. The whole table is rebuilt from
+    the stores when it doesn't exist yet or has duplicate keys.
+    """
+    if not any(new_partitions) and os.path.exists(target_path):
+        return
+
+    target = pd.read_csv(target_path) if os.path.exists(target_path) else None
+    if target is None or target[KEY_COLUMNS].astype(str).duplicated().any():
+        target = coalesce_stores(stores).sort_values('time_value', ascending=False)
+    else:
+        new_keys = [prepare_target_rows(store.read([partition]))[KEY_COLUMNS].astype(str)
+                    for store, partition in zip(stores, new_partitions) if partition]
+        new_keys = pd.MultiIndex.from_frame(pd.concat(new_keys, axis=0, ignore_index=True))
+        target = replace_target_rows(target, coalesce_stores(stores, new_keys))
+
+    write_csv_and_columnar(target, target_path, index=False)
+
+@timed("update_revisions")
+def update_revisions(stores, new_partitions, revisions_path):
+    """ Add the new partitions of the stores to the season's revision store, creating it from every partition the first time """
+    if not os.path.exists(revisions_path):
+        tables = [prepare_target_rows(store.read()) for store in stores]
+        RevisionStore.from_table(pd.concat(tables, axis=0, ignore_index=True)).save(revisions_path)
+        return
+
+    tables = [prepare_target_rows(store.read([partition])) for store, partition in zip(stores, new_partitions) if partition]
+    if tables:
+        RevisionStore.append(revisions_path, pd.concat(tables, axis=0, ignore_index=True))
+
+def update():
+    # Progress of the historic backfill is kept on disk, so a retry (or a new run
+    # after a crash) resumes from the first unfinished week instead of starting over
+    checkpoint = BackfillCheckpoint(version=source_digest(PARSER_SOURCES))
 
-def main():
     max_retries=3
     retries = 0
     while retries < max_retries:
@@ -1047,7 +1345,9 @@ def main():
                 warnings.simplefilter("ignore", category=DeprecationWarning)
                 # Check if previous seasons' lab data exists
                 if os.path.exists('./auxiliary-data/target-data-archive/season_2024_2025/target_rvdss_data.csv')==False:
-                    [get_season_reports(url) for url in HISTORIC_SEASON_URL if url not in HISTORIC_SEASON_URL_CHECKPOINT]
+                    season_urls = [url for url in HISTORIC_SEASON_URL if not checkpoint.season_complete(url)]
+                    backfill_seasons(season_urls, checkpoint)
+                    write_column_rewrite_report()
             break
         except requests.exceptions.RequestException as e:
             # Handle specific connection errors
@@ -1067,22 +1367,18 @@ def main():
 
 
     def get_weekly_data2(base_url,start_year):
-        headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
-        }
-
         # Get update date
         update_date_url =  base_url + "RVD_UpdateDate.csv"
-        update_date_url_response = requests.get(update_date_url, headers=headers)
-        #print(update_date_url_response.text)
-        update_date = datetime.strptime(update_date_url_response.text, "%Y-%m-%d %H:%M:%S")
+        update_date_url_response = fetch_text(update_date_url)
+        #print(update_date_url_response)
+        update_date = datetime.strptime(update_date_url_response, "%Y-%m-%d %H:%M:%S")
 
-        #update_date = datetime.strptime(update_date_url_response.text,"%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d")
+        #update_date = datetime.strptime(update_date_url_response,"%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d")
 
         # Get current week and year
         summary_url =  base_url + "RVD_SummaryText.csv"
-        summary_url_response = requests.get(summary_url, headers=headers)
-        summary_df = pd.read_csv(io.StringIO(summary_url_response.text))
+        summary_url_response = fetch_text(summary_url)
+        summary_df = pd.read_csv(io.StringIO(summary_url_response))
 
         week_df = summary_df[(summary_df['Section'] == "summary") & (summary_df['Type']=="title")]
         week_string = week_df.iloc[0]['Text'].lower()
@@ -1097,26 +1393,15 @@ def main():
 
         # Get weekly data
         weekly_url = base_url + "RVD_CurrentWeekTable.csv"
-        weekly_url_response = requests.get(weekly_url, headers=headers)
-        weekly_url_response.encoding='UTF-8'
-        df_weekly = pd.read_csv(io.StringIO(weekly_url_response.text))
+        weekly_url_response = fetch_text(weekly_url, encoding='UTF-8')
+        df_weekly = pd.read_csv(io.StringIO(weekly_url_response))
 
-        df_weekly = df_weekly.rename(columns=lambda x: '_'.join(x.split('_')[1:]+x.split('_')[:1]))
+        df_weekly.columns = DASHBOARD_WEEKLY_COLUMNS(df_weekly.columns)
         df_weekly.insert(0,"epiweek",int(str(current_epiweek)))
         df_weekly.insert(1,"time_value",str(current_epiweek.enddate()))
         df_weekly.insert(2,"issue",update_date)
-        df_weekly.columns=[abbreviate_virus(c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'test\b','tests',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'pos\b','positive_tests',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'flua_','flu_a',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'flub_','flu_b',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'bpositive','b_positive',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'apositive','a_positive',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r'flu_ah1_','flu_ah1pdm09_',c) for c in df_weekly.columns]
-        df_weekly.columns=[re.sub(r' ','_',c) for c in df_weekly.columns]
-        df_weekly=df_weekly.rename(columns={'reportinglaboratory':"geo_value"})
-        df_weekly['geo_value'] = [abbreviate_geo(g) for g in df_weekly['geo_value']]
-        df_weekly['geo_type'] = [create_geo_types(g,"lab") for g in df_weekly['geo_value']]
+        df_weekly['geo_value'] = abbreviate_geo_series(df_weekly['geo_value'])
+        df_weekly['geo_type'] = create_geo_types_series(df_weekly['geo_value'],"lab")
 
         df_weekly = df_weekly.drop(columns=['time_value','epiweek'])
         df_weekly = df_weekly.rename(columns={'date':'time_value','week':'epiweek'})
@@ -1130,7 +1415,8 @@ def main():
         return(df_weekly)
 
 
-    weekly_data = get_weekly_data2(DASHBOARD_BASE_URL,2025).set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
+    with stage("get_weekly_data"):
+        weekly_data = get_weekly_data2(DASHBOARD_BASE_URL,2025).set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
     positive_data = get_revised_data(DASHBOARD_BASE_URL)
     # print('weekly_data cols:', weekly_data.columns)
     # print('positive_data cols:', positive_data.columns)
@@ -1139,67 +1425,32 @@ def main():
     weekly_data, positive_data = process_tables(weekly_data, positive_data, COL_MAPPERS, viruses)
 
 
-    path1 = './auxiliary-data/season_2025_2026_raw_files/respiratory_detections.csv'
-    path2 = './auxiliary-data/season_2025_2026_raw_files/positive_tests.csv'
-
-
-    if os.path.exists('./auxiliary-data/season_2025_2026_raw_files/')==False:
-        os.makedirs('./auxiliary-data/season_2025_2026_raw_files/')
-
-    if os.path.exists(path1)==False:
-        weekly_data.to_csv(path1,index=True)
-        old_detection_data = weekly_data
-    else:
-        old_detection_data = pd.read_csv(path1).set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
-        if weekly_data.index.isin(old_detection_data.index).any() == False:
-            old_detection_data= pd.concat([old_detection_data,weekly_data],axis=0)
-            old_detection_data.to_csv(path1,index=True)
-
-    if os.path.exists(path2)==False:
-        positive_data.to_csv(path2,index=True)
-        old_positive_data = positive_data
-    else:
-        old_positive_data = pd.read_csv(path2).set_index(['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value'])
-        if positive_data.index.isin(old_positive_data.index).any() == False:
-            old_positive_data= pd.concat([old_positive_data,positive_data],axis=0)
-            old_positive_data.to_csv(path2,index=True)
+    # Each issue is stored as its own partition in a local store (see rvdss_store), which is
+    # filled from the published CSV when it is missing, and the new rows are appended to the CSV
+    with stage("store_append"):
+        stores = []
+        new_partitions = []
+        for output_file, table in zip([RESP_COUNTS_OUTPUT_FILE, POSITIVE_TESTS_OUTPUT_FILE], [weekly_data, positive_data]):
+            csv_path = os.path.join(CURRENT_SEASON_RAW_DIR, output_file)
+            store = IssueStore(os.path.join(STORE_DIR, "season_2025_2026", os.path.splitext(output_file)[0]))
+            store.sync_csv(csv_path)
+            partition = store.append(table)
+            if partition:
+                store.append_csv(csv_path, partition)
+            stores.append(store)
+            new_partitions.append(partition)
+    update_target_table(stores, new_partitions, CURRENT_SEASON_TARGET_FILE)
+    update_revisions(stores, new_partitions, os.path.join(CURRENT_SEASON_RAW_DIR, REVISIONS_OUTPUT_FILE))
+
+    # Optionally record how every table header was renamed, to spot new header variants
+    # (also written after the backfill, so its headers are kept if the weekly update fails)
+    write_column_rewrite_report()
 
-    if os.path.exists(path2) and os.path.exists(path1) ==True:
-        concatenated_table = pd.concat([old_detection_data, old_positive_data], axis=0)
-    else:
-        concatenated_table = pd.concat([weekly_data, positive_data], axis=0)
-
-    
-    concatenated_table = concatenated_table.reset_index()
-    #print(concatenated_table['issue'])
-    #concatenated_table['issue'] = pd.to_datetime(concatenated_table['issue'])
-    concatenated_table['issue'] = pd.to_datetime(concatenated_table['issue'], format='mixed', errors='coerce')
-
-
-    # Update the geo_type based on LOC_CORRECTION values
-    concatenated_table = concatenated_table[concatenated_table['geo_value'].isin(LOC_CORRECTION.keys())]
-    concatenated_table['geo_type'] = concatenated_table['geo_value'].map(LOC_CORRECTION)
-
-    concatenated_table = concatenated_table.groupby(['time_value', 'geo_type', 'geo_value']).apply(lambda x: x.bfill()).sort_values(by='issue', ascending=False)
-    concatenated_table = concatenated_table.drop_duplicates(subset=['time_value', 'geo_type', 'geo_value'], keep='first')
-
-    concatenated_table = concatenated_table.drop(columns=['issue'], errors='ignore') 
-    concatenated_table = concatenated_table.drop(columns=['epiweek','week','date','weekorder'], errors='ignore')
-    
-    #concatenated_table.to_csv('./auxiliary-data/season_2024_2025_raw_files/raw.csv', index=False)
-    
-    for col in concatenated_table.columns:   
-        if col not in COLUMNS_TARGET:
-            concatenated_table = concatenated_table.drop(columns=[col])
-        elif 'pct_positive' in col:
-            # Round percentage columns to 2 decimal places
-            concatenated_table[col] = concatenated_table[col].round(2)
-	
-    concatenated_table = concatenated_table.reset_index(drop=True)
-    #print(concatenated_table)
-    concatenated_table = concatenated_table.sort_values('time_value', ascending=False)
-
-    concatenated_table.to_csv('./target-data/season_2025_2026/target_rvdss_data.csv', index=False)
+def main():
+    # Stage timings, counters and peak memory go to a run report (see rvdss_metrics),
+    # which is written even when the run fails, optionally with a profile of the run
+    with run_report("rvdss_update"):
+        update()
    
 if __name__ == '__main__':
     main()
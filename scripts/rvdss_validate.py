@@ -0,0 +1,382 @@
+"""
+Validation of hub submissions against hub-config/tasks.json
+
+A Python counterpart of the checks hubValidations runs on a pull request, fast
+enough to run on the whole of model-output/ and reporting every violation of a
+file at once instead of stopping at the first.
+
+tasks.json (which has // comments) is compiled once into a `TaskConfig`: for
+every model task, the set of allowed values of each task id, output type and
+output_type_id, the output_type_ids every forecast must have and the value
+limits. Each file is then read once, as text, and every check is a column
+operation over the whole file:
+
+    columns      - the task id columns, output_type, output_type_id and value, nothing else
+    round        - the file is model-output/<model>/<reference_date>-<model>.csv and has only that round
+    task ids     - every row is a task of one of the model tasks
+    output types - output types and output_type_ids are allowed for the row's model task
+    duplicates   - no two rows for the same task and output_type_id
+    required     - every forecast has all the required output_type_ids (e.g. all 7 quantiles)
+    values       - numbers, within the minimum and maximum (pct values are >= 0)
+    monotone     - quantiles don't decrease with the level
+    dates        - target_end_date is reference_date + horizon weeks for step-ahead targets
+
+Files are validated in a process pool:
+
+    python scripts/rvdss_validate.py                              # every file in model-output/
+    python scripts/rvdss_validate.py model-output/X/2025-05-17-X.csv ...
+
+exits with status 1 if any file has a violation.
+
+RVDSS_VALIDATE_WORKERS - number of processes validating files (default: number of CPUs)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rvdss_model_output import MODEL_OUTPUT_DIR, scan
+
+TASKS_CONFIG_FILE = os.path.join("hub-config", "tasks.json")
+VALIDATE_WORKERS = int(os.environ.get("RVDSS_VALIDATE_WORKERS", os.cpu_count() or 1))
+
+OUTPUT_COLUMNS = ['output_type', 'output_type_id', 'value']
+
+# Rows listed in a violation message, of however many there are
+EXAMPLE_ROWS = 3
+
+DAYS_PER_TIME_UNIT = {'day': 1, 'week': 7}
+
+_FILE_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2})-(.+)\.csv$")
+_COMMENT = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+
+def read_config(path):
+    """A hub-config JSON file, which may have // and /* */ comments"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return(json.loads(_COMMENT.sub(lambda match: match.group(1) or "", text)))
+
+
+def _number_key(value):
+    """A number as an integer, so 0.1 read from a file finds the 0.1 of the config; None if it isn't one"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return(None)
+    return(int(round(number * 1e9)) if np.isfinite(number) else None)
+
+
+class ValueSet:
+    """The allowed values of a column, compared as numbers if the config lists numbers, as text otherwise"""
+
+    def __init__(self, values):
+        self.values = [value for value in values if value is not None]
+        self.numeric = bool(self.values) and all(isinstance(value, (int, float)) for value in self.values)
+        self.keys = {self.key(value) for value in self.values}
+
+    def key(self, value):
+        if value is None:
+            return(None)
+        return(_number_key(value) if self.numeric else str(value))
+
+    def contains(self, column):
+        """Whether each row of a `Column` has an allowed value"""
+        return(np.array([self.key(value) in self.keys for value in column.uniques], dtype=bool)[column.codes])
+
+
+def _allowed(spec):
+    return((spec.get("required") or []) + (spec.get("optional") or []))
+
+
+class ModelTask:
+    """The compiled task ids, output types and targets of one model task of tasks.json"""
+
+    def __init__(self, spec):
+        self.task_ids = {name: ValueSet(_allowed(values)) for name, values in spec["task_ids"].items()}
+        self.output_types = {}
+        for name, output in spec["output_type"].items():
+            ids = output.get("output_type_id", {})
+            value = output.get("value", {})
+            self.output_types[name] = {
+                'ids': ValueSet(_allowed(ids)),
+                'required_ids': ValueSet(ids.get("required") or []),
+                'type': value.get("type"),
+                'minimum': value.get("minimum"),
+                'maximum': value.get("maximum"),
+            }
+        # Days per step of the step-ahead targets, by target
+        self.steps = {}
+        for target in spec.get("target_metadata", []):
+            if target.get("is_step_ahead") and target.get("time_unit") in DAYS_PER_TIME_UNIT:
+                for value in target.get("target_keys", {}).values():
+                    self.steps[str(value)] = DAYS_PER_TIME_UNIT[target["time_unit"]]
+
+    def matches(self, columns):
+        """Rows of a file whose task ids are all allowed in this model task"""
+        mask = np.ones(len(next(iter(columns.values())).codes), dtype=bool)
+        for name, values in self.task_ids.items():
+            mask &= values.contains(columns[name])
+        return(mask)
+
+
+class TaskConfig:
+    """
+    tasks.json compiled for validating files
+
+    task_id_names - the task id columns, in the order of tasks.json
+    round_id      - the task id naming the round of a file (e.g. reference_date)
+    model_tasks   - a ModelTask for every model task of every round
+    """
+
+    def __init__(self, config):
+        self.model_tasks = []
+        self.task_id_names = []
+        self.round_id = None
+        for round_ in config["rounds"]:
+            if round_.get("round_id_from_variable"):
+                self.round_id = round_["round_id"]
+            for spec in round_["model_tasks"]:
+                self.model_tasks.append(ModelTask(spec))
+                for name in spec["task_ids"]:
+                    if name not in self.task_id_names:
+                        self.task_id_names.append(name)
+
+    @classmethod
+    def load(cls, path=TASKS_CONFIG_FILE):
+        return(cls(read_config(path)))
+
+
+class Column:
+    """
+    A column of a file read as text, factorized: checks look at each distinct value once
+
+    codes   - position of each row's value in `uniques`
+    uniques - the distinct values, stripped, followed by None for the missing ones
+    """
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        inverse, stripped = pd.factorize(pd.Index(uniques, dtype=object).astype(str).str.strip())
+        inverse = np.append(inverse, len(stripped)).astype(np.int64)
+        self.codes = inverse[codes]
+        self.uniques = np.append(np.asarray(stripped, dtype=object), None)
+
+    def values(self):
+        return(self.uniques[self.codes])
+
+    def map(self, function):
+        """`function` of every distinct value, by row"""
+        return(np.array([function(value) for value in self.uniques[:-1]] + [function(None)])[self.codes])
+
+
+def _rows(mask):
+    """The number and file line numbers of the rows in a mask, for messages"""
+    lines = np.flatnonzero(mask)[:EXAMPLE_ROWS] + 2
+    more = ", ..." if mask.sum() > EXAMPLE_ROWS else ""
+    return(f"{int(mask.sum())} rows (line {', '.join(map(str, lines))}{more})")
+
+
+def _examples(values, mask):
+    values = pd.unique(values[mask])
+    return(", ".join(repr(value) for value in values[:EXAMPLE_ROWS]) + (", ..." if len(values) > EXAMPLE_ROWS else ""))
+
+
+def _date(value):
+    return(pd.to_datetime(value, format="%Y-%m-%d", errors="coerce") if value is not None else pd.NaT)
+
+
+class _Violations:
+    """Rows failing each check, collected over the model tasks and reported once per check"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.masks = {}
+        self.messages = []
+
+    def add(self, check, message):
+        self.messages.append((check, message))
+
+    def flag(self, check, description, mask, column=None):
+        """Flag rows; `column` adds examples of their values to the message"""
+        if mask.any():
+            key = (check, description, column)
+            self.masks[key] = self.masks.get(key, np.zeros(self.rows, dtype=bool)) | mask
+
+    def report(self, columns):
+        violations = list(self.messages)
+        for (check, description, column), mask in self.masks.items():
+            examples = f": {_examples(columns[column].values(), mask)}" if column else ""
+            violations.append((check, f"{_rows(mask)} {description}{examples}"))
+        return(violations)
+
+
+def check_file(path, table, config):
+    """Every violation in a submission file read as text, as a list of (check, message)"""
+    task_ids = config.task_id_names
+
+    missing = [col for col in task_ids + OUTPUT_COLUMNS if col not in table.columns]
+    extra = [col for col in table.columns if col not in task_ids + OUTPUT_COLUMNS]
+    if missing:
+        return([("columns", f"missing columns {missing}")])
+    if table.empty:
+        return([("columns", "no rows")])
+
+    violations = _Violations(len(table))
+    if extra:
+        violations.add("columns", f"unexpected columns {extra}")
+    columns = {name: Column(table[name]) for name in task_ids + ['output_type', 'output_type_id']}
+    value = pd.to_numeric(table['value'], errors='coerce').to_numpy(dtype=float)
+    columns['value'] = Column(table['value'])
+
+    # The file name gives the model and the round
+    match = _FILE_NAME.match(os.path.basename(path))
+    model = os.path.basename(os.path.dirname(path))
+    if match is None or match.group(2) != model:
+        violations.add("round", f"file name isn't <{config.round_id}>-{model}.csv")
+    elif config.round_id:
+        other_round = columns[config.round_id].values() != match.group(1)
+        violations.flag("round", f"not of the file's {config.round_id} {match.group(1)}", other_round, config.round_id)
+
+    # Model task of each row: the first one allowing all its task ids
+    matches = np.column_stack([task.matches(columns) for task in config.model_tasks])
+    assigned = np.where(matches.any(axis=1), matches.argmax(axis=1), -1)
+    if (assigned < 0).any():
+        for name in task_ids:
+            allowed = np.zeros(len(table), dtype=bool)
+            for task in config.model_tasks:
+                if name in task.task_ids:
+                    allowed |= task.task_ids[name].contains(columns[name])
+            violations.flag("task ids", f"with {name} not allowed", ~allowed, name)
+        violations.flag("task ids", "not a task of any model task", assigned < 0)
+
+    not_number = np.isnan(value)
+    violations.flag("values", "with a missing or non-numeric value", not_number, 'value')
+
+    # Each forecast (combination of task ids) numbered
+    forecast = np.zeros(len(table), dtype=np.int64)
+    for name in task_ids:
+        forecast = forecast * len(columns[name].uniques) + columns[name].codes
+    forecast = pd.factorize(forecast)[0]
+
+    output_type = columns['output_type'].values()
+    level = np.full(len(table), np.nan)
+    for index, task in enumerate(config.model_tasks):
+        in_task = assigned == index
+        if not in_task.any():
+            continue
+        violations.flag("output types", "with output_type not allowed",
+                        in_task & ~np.isin(output_type, list(task.output_types)), 'output_type')
+
+        for name, output in task.output_types.items():
+            rows = in_task & (output_type == name)
+            if not rows.any():
+                continue
+            violations.flag("output types", f"with {name} output_type_id not allowed",
+                            rows & ~output['ids'].contains(columns['output_type_id']), 'output_type_id')
+            if output['minimum'] is not None:
+                violations.flag("values", f"with {name} value below {output['minimum']}", rows & (value < output['minimum']))
+            if output['maximum'] is not None:
+                violations.flag("values", f"with {name} value above {output['maximum']}", rows & (value > output['maximum']))
+            if output['type'] == 'integer':
+                violations.flag("values", f"with {name} value not an integer", rows & ~not_number & (value != np.round(value)))
+            if name == 'quantile':
+                level[rows] = columns['output_type_id'].map(lambda value: float(value) if _number_key(value) is not None
+                                                            else np.nan)[rows]
+
+            # Every forecast has each required output_type_id
+            required = output['required_ids']
+            if required.values:
+                positions = {key: position for position, key in enumerate(required.keys)}
+                position = columns['output_type_id'].map(lambda value: positions.get(required.key(value), -1))
+                has = np.zeros((forecast.max() + 1, len(positions)), dtype=bool)
+                has[forecast[rows & (position >= 0)], position[rows & (position >= 0)]] = True
+                submitted = np.zeros(len(has), dtype=bool)
+                submitted[forecast[rows]] = True
+                incomplete = submitted & ~has.all(axis=1)
+                violations.flag("required", f"of {name} forecasts missing some of output_type_id {required.values}",
+                                rows & incomplete[forecast])
+
+    key = (forecast * len(columns['output_type'].uniques) + columns['output_type'].codes) * \
+        len(columns['output_type_id'].uniques) + columns['output_type_id'].codes
+    duplicated = pd.Series(key).duplicated(keep=False).to_numpy()
+    violations.flag("duplicates", "for the same task and output_type_id", duplicated)
+
+    # Quantiles in level order within each forecast; a decrease between consecutive levels is a crossing
+    quantiles = np.flatnonzero(~np.isnan(level) & ~not_number & ~duplicated)
+    rows = quantiles[np.lexsort((level[quantiles], forecast[quantiles]))]
+    decreasing = (forecast[rows][1:] == forecast[rows][:-1]) & (np.diff(value[rows]) < 0)
+    crossing = np.zeros(len(table), dtype=bool)
+    crossing[rows[1:][decreasing]] = True
+    violations.flag("monotone", "with a quantile below the one of the level before", crossing)
+
+    # target_end_date = reference_date + horizon steps
+    if {'reference_date', 'target_end_date', 'horizon', 'target'} <= set(columns):
+        dates = {}
+        for name in ['reference_date', 'target_end_date']:
+            dates[name] = pd.DatetimeIndex(columns[name].map(_date))
+            violations.flag("dates", f"with {name} not a yyyy-mm-dd date", dates[name].isna(), name)
+        steps = {}
+        for task in config.model_tasks:
+            steps.update(task.steps)
+        days = columns['target'].map(lambda target: steps.get(target, np.nan)).astype(float)
+        horizon = columns['horizon'].map(lambda value: float(value) if _number_key(value) is not None else np.nan)
+        expected = dates['reference_date'] + pd.to_timedelta(horizon * days, unit="D")
+        violations.flag("dates", "with target_end_date not reference_date + horizon steps",
+                        ~np.isnan(horizon * days) & dates['target_end_date'].notna() & (expected != dates['target_end_date']))
+
+    return(violations.report(columns))
+
+
+def validate_file(path, config):
+    """Read a submission file as text and check it, returning (path, violations)"""
+    try:
+        table = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+    except (OSError, ValueError) as e:
+        return((path, [("read", str(e))]))
+    table.columns = [col.strip() for col in table.columns]
+    return((path, check_file(path, table, config)))
+
+
+def validate_files(paths, config=None, workers=VALIDATE_WORKERS):
+    """Validate files in a process pool, returning {path: violations} in the order of `paths`"""
+    config = config or TaskConfig.load()
+    if workers <= 1 or len(paths) <= 1:
+        results = [validate_file(path, config) for path in paths]
+    else:
+        workers = min(workers, len(paths))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_file, paths, [config] * len(paths),
+                                    chunksize=max(1, len(paths) // (workers * 4))))
+    return(dict(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate submission files against hub-config/tasks.json")
+    parser.add_argument("paths", nargs="*", help="submission files (default: every file in model-output/)")
+    parser.add_argument("--config", default=TASKS_CONFIG_FILE)
+    parser.add_argument("--workers", type=int, default=VALIDATE_WORKERS, help="number of processes validating files")
+    args = parser.parse_args()
+
+    paths = [path for path in args.paths if path.endswith(".csv")] if args.paths else \
+        [path for _, path in scan(MODEL_OUTPUT_DIR)]
+    results = validate_files(paths, TaskConfig.load(args.config), args.workers)
+
+    failed = 0
+    for path, violations in results.items():
+        if violations:
+            failed += 1
+            print(f"{path}:")
+            for check, message in violations:
+                print(f"  [{check}] {message}")
+    print(f"{failed} of {len(results)} files have violations")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+The scripts are run as `python scripts/<name>.py` and import each other as
+top-level modules, so the tests put scripts/ on the path the same way.
+"""
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+@pytest.fixture
+def corpus_server(tmp_path):
+    """The synthetic corpus (rvdss_corpus) served by a FixtureServer, with the HTTP cache off"""
+    from rvdss_bench import FixtureServer
+    from rvdss_corpus import generate
+    from rvdss_fetch import ResponseCache, set_cache, set_session
+
+    corpus = str(tmp_path / "corpus")
+    generate(corpus)
+    set_cache(ResponseCache(str(tmp_path / "http"), "off"))
+    with FixtureServer(corpus) as server:
+        set_session(server.session())
+        try:
+            yield server
+        finally:
+            set_session(None)
+            set_cache(None)
@@ -0,0 +1,55 @@
+import json
+
+import pandas as pd
+import pytest
+
+from rvdss_archive import MANIFEST_FILE, backfill_archive
+from rvdss_columnar import available
+from rvdss_corpus import ARCHIVE_DATES
+from rvdss_fetch import fetch_text
+from rvdss_revisions import RevisionStore
+from rvdss_update import (DASHBOARD_DATA_FILE, DASHBOARD_UPDATE_DATE_FILE, DASHBOARD_W_DATE_URL, parse_revised_data,
+                          prepare_target_rows, process_positive_table)
+
+pytestmark = pytest.mark.skipif(not available(), reason="the revision store needs pyarrow")
+
+SERIES = ['time_value', 'geo_value', 'signal']
+
+
+def snapshot(archive_date):
+    """The long rows of one archived snapshot, parsed as the backfill does"""
+    base_url = DASHBOARD_W_DATE_URL.format(date=archive_date)
+    table = parse_revised_data(fetch_text(base_url + DASHBOARD_DATA_FILE),
+                               fetch_text(base_url + DASHBOARD_UPDATE_DATE_FILE).strip())
+    rows = RevisionStore.from_table(prepare_target_rows(process_positive_table(table))).data
+    return(rows.assign(geo_value=rows['geo_value'].astype(str), signal=rows['signal'].astype(str)))
+
+
+def test_backfill_skips_identical_snapshots(corpus_server, tmp_path):
+    # The corpus archives the same data on the first two dates and revised data on the third
+    path = str(tmp_path / "season" / "revisions.parquet")
+    dates = ARCHIVE_DATES + ["2025-10-10"]
+    counts = backfill_archive(dates, path, max_workers=2)
+    assert counts == {"dates": 4, "archives": 3, "unchanged": 1, "loaded": 2}
+
+    with open(tmp_path / "season" / MANIFEST_FILE, encoding="utf-8") as f:
+        assert sorted(entry["date"] for entry in json.load(f).values()) == [ARCHIVE_DATES[0], ARCHIVE_DATES[2]]
+
+    # The first snapshot is stored whole, the revision only where its values changed
+    first, revised = snapshot(ARCHIVE_DATES[0]), snapshot(ARCHIVE_DATES[2])
+    both = first.merge(revised, on=SERIES, suffixes=("_first", "_revised"))
+    changed = both[both['value_first'] != both['value_revised']]
+    assert 0 < len(changed) < len(both)
+
+    stored = RevisionStore.load(path).data
+    stored = stored.assign(geo_value=stored['geo_value'].astype(str), signal=stored['signal'].astype(str))
+    assert stored['issue'].value_counts().to_dict() == {pd.Timestamp(ARCHIVE_DATES[0]): len(first),
+                                                        pd.Timestamp(ARCHIVE_DATES[2]): len(changed)}
+    stored_revisions = stored[stored['issue'] == pd.Timestamp(ARCHIVE_DATES[2])].merge(changed, on=SERIES)
+    assert len(stored_revisions) == len(changed)
+    assert (stored_revisions['value'] == stored_revisions['value_revised']).all()
+
+    # A second run finds every snapshot in the manifest and leaves the store alone
+    assert backfill_archive(ARCHIVE_DATES, path, max_workers=2) == \
+        {"dates": 3, "archives": 3, "unchanged": 3, "loaded": 0}
+    assert len(RevisionStore.load(path).data) == len(stored)
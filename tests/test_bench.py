@@ -0,0 +1,45 @@
+import pytest
+
+from rvdss_bench import compare, ensure_corpus, load_corpus
+from rvdss_corpus import generate
+from rvdss_fetch import fetch_text
+from rvdss_update import DASHBOARD_BASE_URL, DASHBOARD_UPDATE_DATE_FILE, fetch_season_pages
+
+
+def test_synthetic_corpus_is_written_once_and_stable(tmp_path):
+    manifest = ensure_corpus(str(tmp_path / "corpus"))
+    assert manifest['recorded'] == "synthetic (seed 0)"
+    assert ensure_corpus(str(tmp_path / "corpus")) == manifest
+    # The same seed gives the same corpus, so results of two runs name the same digest
+    generate(str(tmp_path / "again"))
+    assert load_corpus(str(tmp_path / "again"))['digest'] == manifest['digest']
+
+
+def test_synthetic_corpus_is_served(corpus_server, tmp_path):
+    manifest = load_corpus(str(tmp_path / "corpus"))
+    pages = fetch_season_pages(manifest['season_urls'])
+    assert len(pages[0]['week_pages']) == 52
+    assert fetch_text(DASHBOARD_BASE_URL + DASHBOARD_UPDATE_DATE_FILE) == "2025-10-17 10:00:00"
+
+
+def results(wall=1.0, cpu=1.0, memory=50.0, peak=200.0, rows=100):
+    return({'scale': 1, 'corpus': None, 'peak_memory_mb': peak,
+            'stages': {'parse': {'wall': wall, 'cpu': cpu, 'memory_mb': memory, 'items': {'rows': rows}}}})
+
+
+@pytest.mark.parametrize("changes, regressions", [
+    ({}, []),
+    ({'wall': 2.0}, ["parse wall"]),
+    ({'cpu': 2.0}, ["parse cpu"]),
+    ({'memory': 80.0}, ["parse memory_mb"]),
+    ({'peak': 300.0}, ["run peak_memory_mb"]),
+    # Above the threshold, but not by the minimum
+    ({'wall': 1.04, 'memory': 58.0}, []),
+])
+def test_compare_flags_time_and_memory(changes, regressions):
+    assert compare(results(**changes), results()) == regressions
+
+
+def test_compare_warns_about_different_items(capsys):
+    compare(results(rows=200), results())
+    assert "Warning: parse handled" in capsys.readouterr().out
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from epiweeks import Week, Year
+
+from rvdss_calendar import epiweeks, epiweeks_from_dates, iso_dates, week_end_dates
+from rvdss_update import check_date_format, get_report_date, get_report_dates
+
+# Inside the precomputed table and outside it on both sides, with the 53-week years 2014 and 2020
+YEARS = [2011, 2013, 2014, 2020, 2024, 2030, 2031]
+
+
+def all_weeks():
+    pairs = [(year, week) for year in YEARS for week in range(1, Year(year).totalweeks() + 1)]
+    return(np.array([year for year, _ in pairs]), np.array([week for _, week in pairs]))
+
+
+def test_epiweeks_and_end_dates_match_week_by_week():
+    years, weeks = all_weeks()
+    expected = [Week(int(year), int(week)) for year, week in zip(years, weeks)]
+    assert list(epiweeks(years, weeks)) == [int(str(week)) for week in expected]
+    assert list(week_end_dates(years, weeks)) == [str(week.enddate()) for week in expected]
+
+
+def test_week_that_does_not_exist_raises():
+    with pytest.raises(ValueError):
+        epiweeks([2024, 2024], [52, 53])
+
+
+def test_epiweeks_from_dates_match_week_fromdate():
+    days = [date(2012, 12, 20) + timedelta(days=i) for i in range(0, 365 * 19, 3)]
+    days = [day.strftime("%Y-%m-%d") for day in days]
+    expected = [int(str(Week.fromdate(date.fromisoformat(day)))) for day in days]
+    assert list(epiweeks_from_dates(days)) == expected
+
+
+@pytest.mark.parametrize("start_year", [2013, 2019, 2024])
+@pytest.mark.parametrize("epi", [False, True])
+def test_report_dates_match_get_report_date(start_year, epi):
+    weeks = list(range(35, Year(start_year).totalweeks() + 1)) + list(range(1, 35))
+    assert list(get_report_dates(weeks, start_year, epi=epi)) == \
+        [get_report_date(week, start_year, epi=epi) for week in weeks]
+
+
+def test_iso_dates_match_check_date_format():
+    values = ["2024-10-05", "05/10/2024", "12-10-2024", "2024-10-05", "31/12/2023", "01-01-2024",
+              "2024-10-05 15:00:00", "19/10/2024"]
+    assert list(iso_dates(values)) == [check_date_format(value) for value in values]
+
+
+@pytest.mark.parametrize("value, error", [("Oct 5, 2024", AssertionError), ("5-10-2024", AssertionError),
+                                          ("2024/10/05", ValueError)])
+def test_bad_dates_raise_like_check_date_format(value, error):
+    with pytest.raises(error):
+        check_date_format(value)
+    with pytest.raises(error):
+        iso_dates(["2024-10-05", value])
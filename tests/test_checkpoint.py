@@ -0,0 +1,99 @@
+import os
+import shutil
+
+import pandas as pd
+
+import rvdss_update
+from rvdss_bench import load_corpus
+from rvdss_checkpoint import BackfillCheckpoint, source_digest
+
+SEASON = "https://example.org/2019-2020.html"
+WEEK = "https://example.org/2019-2020/week-40.html"
+
+
+def save_week(checkpoint):
+    checkpoint.save_week(SEASON, WEEK, 40, {'positive': pd.DataFrame({'flu_tests': [1.0]}), 'number': None})
+
+
+def test_weeks_of_another_parser_version_are_discarded(tmp_path):
+    save_week(BackfillCheckpoint(str(tmp_path), version="a"))
+    BackfillCheckpoint(str(tmp_path), version="a").mark_season_complete(SEASON)
+    assert BackfillCheckpoint(str(tmp_path), version="a").completed_weeks(SEASON) == {WEEK}
+
+    newer = BackfillCheckpoint(str(tmp_path), version="b")
+    assert newer.completed_weeks(SEASON) == set()
+    assert not newer.season_complete(SEASON)
+
+    # Saving a week under the new version starts a new manifest
+    save_week(newer)
+    assert newer.manifest(SEASON)["version"] == "b"
+    assert BackfillCheckpoint(str(tmp_path), version="a").completed_weeks(SEASON) == set()
+
+
+def test_week_files_are_found_from_any_directory(tmp_path, monkeypatch):
+    save_week(BackfillCheckpoint(str(tmp_path / "checkpoints"), version="a"))
+    shutil.move(str(tmp_path / "checkpoints"), str(tmp_path / "moved"))
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("elsewhere")
+    monkeypatch.chdir("elsewhere")
+
+    moved = BackfillCheckpoint(str(tmp_path / "moved"), version="a")
+    assert moved.completed_weeks(SEASON) == {WEEK}
+    assert moved.load_week(SEASON, WEEK)['positive']['flu_tests'].tolist() == [1.0]
+
+
+def test_source_digest_follows_the_source(tmp_path):
+    source = tmp_path / "parser.py"
+    source.write_text("x = 1\n")
+    before = source_digest([str(source)])
+    assert source_digest([str(source)]) == before
+    source.write_text("x = 2\n")
+    assert source_digest([str(source)]) != before
+
+
+def test_backfill_fetches_and_parses_one_season_at_a_time(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rvdss_update, "fetch_season_pages",
+                        lambda urls, checkpoint=None: calls.append(("fetch", urls)) or [{'url': urls[0]}])
+    monkeypatch.setattr(rvdss_update, "get_season_reports",
+                        lambda url, season_pages=None, checkpoint=None: calls.append(("parse", url)))
+
+    rvdss_update.backfill_seasons(["s1", "s2"], workers=1)
+    assert calls == [("fetch", ["s1"]), ("parse", "s1"), ("fetch", ["s2"]), ("parse", "s2")]
+
+
+def test_season_is_complete_while_its_outputs_exist(tmp_path):
+    output = tmp_path / "target_rvdss_data.csv"
+    output.write_text("time_value\n")
+    checkpoint = BackfillCheckpoint(str(tmp_path / "checkpoints"), version="a")
+    save_week(checkpoint)
+    checkpoint.mark_season_complete(SEASON, [str(output)])
+    assert checkpoint.season_complete(SEASON)
+
+    output.unlink()
+    assert not checkpoint.season_complete(SEASON)
+    assert checkpoint.completed_weeks(SEASON) == {WEEK}
+
+
+def test_deleted_outputs_of_a_completed_season_are_rebuilt(corpus_server, tmp_path, monkeypatch):
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    url = load_corpus(str(tmp_path / "corpus"))['season_urls'][0]
+    checkpoint = BackfillCheckpoint(str(tmp_path / "checkpoints"), version="a")
+
+    rvdss_update.backfill_seasons([url], checkpoint, workers=1)
+    assert checkpoint.season_complete(url)
+    outputs = checkpoint.manifest(url)["outputs"]
+    target = outputs[-1]
+    written = pd.read_csv(target)
+
+    # Deleting the outputs makes the season incomplete again, and it is rebuilt from the checkpointed weeks
+    for path in outputs:
+        os.remove(path)
+    assert not checkpoint.season_complete(url)
+    metrics = rvdss_update.reset_metrics()
+    rvdss_update.backfill_seasons([url], checkpoint, workers=1)
+    assert checkpoint.season_complete(url)
+    assert metrics.report()['counters']['checkpoint_hits'] == 52
+    pd.testing.assert_frame_equal(pd.read_csv(target), written)
@@ -0,0 +1,43 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from rvdss_columnar import columnar_path, read_columnar, write_columnar, write_csv_and_columnar
+
+
+def test_dates_and_issues_round_trip(tmp_path):
+    table = pd.DataFrame({'time_value': ['2024-10-12', '2024-10-05', '2024-10-05'],
+                          'issue': ['2024-10-17', '2024-10-17', '2024-10-10 15:00:00'],
+                          'geo_value': ['on', 'on', 'qc'],
+                          'flu_pct_positive': [1.5, 2.0, None]})
+    path = write_columnar(table, str(tmp_path / "table.parquet"))
+
+    result = read_columnar(path)
+    assert list(result['season']) == ['2024-2025'] * 3
+    # Sorted by season, location and date
+    assert list(result['time_value']) == [date(2024, 10, 5), date(2024, 10, 12), date(2024, 10, 5)]
+    assert list(result['issue']) == [pd.Timestamp('2024-10-17'), pd.Timestamp('2024-10-17'),
+                                     pd.Timestamp('2024-10-10 15:00:00')]
+    assert list(read_columnar(path, columns=['geo_value'], filters=[('geo_value', '=', 'qc')])['geo_value']) == ['qc']
+
+
+def test_unreadable_issue_raises(tmp_path):
+    table = pd.DataFrame({'time_value': ['2024-10-05'], 'issue': ['17/10/2024'], 'geo_value': ['on']})
+    with pytest.raises(ValueError):
+        write_columnar(table, str(tmp_path / "table.parquet"))
+
+
+def test_csv_is_not_written_when_the_table_cant_be_typed(tmp_path):
+    csv_path = tmp_path / "target_rvdss_data.csv"
+    good = pd.DataFrame({'time_value': ['2024-10-05'], 'issue': ['2024-10-10'], 'geo_value': ['on'], 'value': [1.0]})
+    write_csv_and_columnar(good, str(csv_path), index=False)
+
+    bad = good.assign(issue=['17/10/2024'], value=[2.0])
+    with pytest.raises(ValueError):
+        write_csv_and_columnar(bad, str(csv_path), index=False)
+    # Both files still hold the last table that could be written
+    assert pd.read_csv(csv_path)['value'].tolist() == [1.0]
+    assert read_columnar(columnar_path(str(csv_path)))['value'].tolist() == [1.0]
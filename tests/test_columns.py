@@ -0,0 +1,58 @@
+from collections import Counter
+
+import rvdss_update
+from rvdss_bench import FixtureServer
+from rvdss_columns import ColumnRewriter
+from rvdss_corpus import generate
+from rvdss_fetch import ResponseCache, set_cache, set_session
+
+
+def rewriter():
+    return(ColumnRewriter("test", [("lower", r"[A-Z]", lambda match: match.group(0).lower()), ("spaces", r"\s+", "_")],
+                          mapping={'week_end': "time_value"}))
+
+
+def test_rewrites_are_cached_and_reported():
+    columns = rewriter()
+    assert columns(["Week End", "Tests", "Week End"]) == ["time_value", "tests", "time_value"]
+    assert columns.report() == {"Week End": {"result": "time_value", "rules": ["lower", "spaces", "mapping"]},
+                                "Tests": {"result": "tests", "rules": ["lower"]}}
+    assert columns.fired == Counter({"lower": 2, "spaces": 1, "mapping": 1})
+
+
+def test_merge_adds_the_headers_of_another_report():
+    worker, parent = rewriter(), rewriter()
+    worker(["Week End", "Tests"])
+    parent(["Tests"])
+    parent.merge(worker.report())
+    assert parent.report() == worker.report()
+    # A header both had seen is only counted once
+    assert parent.fired == worker.fired
+
+
+def test_pool_backfill_reports_the_workers_headers(tmp_path, monkeypatch):
+    for columns in rvdss_update.COLUMN_REWRITERS:
+        monkeypatch.setattr(columns, "_cache", {})
+        monkeypatch.setattr(columns, "fired", Counter())
+    report_path = tmp_path / "columns.json"
+    monkeypatch.setenv("RVDSS_COLUMN_REPORT", str(report_path))
+
+    manifest = generate(str(tmp_path / "corpus"), start_years=[2018, 2021])
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    set_cache(ResponseCache(str(tmp_path / "http"), "off"))
+    with FixtureServer(str(tmp_path / "corpus")) as server:
+        set_session(server.session())
+        try:
+            rvdss_update.backfill_seasons(manifest['season_urls'], workers=2)
+        finally:
+            set_session(None)
+            set_cache(None)
+
+    # The pages were parsed in the workers, and their headers reach this process
+    report = rvdss_update.column_rewrite_report()
+    assert "reporting laboratory" in report["report"]
+    assert report["detections"] and report["percent_positive"]
+    rvdss_update.write_column_rewrite_report()
+    assert "reporting laboratory" in report_path.read_text(encoding="utf-8")
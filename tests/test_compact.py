@@ -0,0 +1,49 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rvdss_compact import (MISSING_DAY, compact_model_output, dates, day_number, day_numbers, parse_timestamps,
+                           timestamps)
+
+
+def test_parse_timestamps_reads_dates_and_timestamps():
+    parsed = parse_timestamps(pd.Series(['2025-10-17', None, '2025-10-17 15:00:00', np.nan]))
+    assert parsed.tolist()[0] == pd.Timestamp('2025-10-17')
+    assert parsed.tolist()[2] == pd.Timestamp('2025-10-17 15:00:00')
+    assert parsed.isna().tolist() == [False, True, False, True]
+
+
+def test_parse_timestamps_reads_date_objects():
+    parsed = parse_timestamps([date(2025, 1, 4), datetime(2025, 1, 4, 3)])
+    assert parsed.tolist() == [pd.Timestamp('2025-01-04'), pd.Timestamp('2025-01-04 03:00')]
+
+
+def test_parse_timestamps_raises_instead_of_coercing():
+    with pytest.raises(ValueError, match="04/01/2025"):
+        parse_timestamps(['2025-01-04', '04/01/2025'])
+
+
+def test_day_numbers_round_trip():
+    days = day_numbers(['1970-01-02', '2025-01-04', None])
+    assert days.dtype == np.int32
+    assert days.tolist() == [1, 20092, MISSING_DAY]
+    assert day_number(date(2025, 1, 4)) == day_number('2025-01-04') == 20092
+    assert timestamps(days).tolist()[:2] == [pd.Timestamp('1970-01-02'), pd.Timestamp('2025-01-04')]
+    assert pd.isna(timestamps(days).iloc[2])
+    assert dates(days[:2]) == [date(1970, 1, 2), date(2025, 1, 4)]
+
+
+def test_compact_model_output_schema():
+    table = pd.DataFrame({'model': ['a', 'b'], 'location': ['on', 'qc'], 'target': ['t', 't'],
+                          'output_type': ['quantile', 'quantile'], 'horizon': [0, 1],
+                          'reference_date': ['2025-01-04', '2025-01-04'], 'target_end_date': ['2025-01-04', '2025-01-11'],
+                          'output_type_id': [0.025, 0.5], 'value': [1.5, 2.25]})
+    table = compact_model_output(table)
+    assert all(isinstance(table[col].dtype, pd.CategoricalDtype) for col in ['model', 'location', 'target', 'output_type'])
+    assert table['reference_date'].dtype == np.int32
+    assert table['horizon'].dtype == np.int8
+    assert table['value'].dtype == np.float32
+    # The quantile levels stay exact
+    assert list(table['output_type_id'].cat.categories) == [0.025, 0.5]
@@ -0,0 +1,144 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rvdss_compact import day_number, timestamps
+from rvdss_ensemble import AlignedQuantiles, monotone, weighted_by_round
+
+LEVELS = [0.25, 0.5, 0.75]
+MODELS = ['a', 'b', 'c', 'd', 'e']
+NAN = np.nan
+
+# (tasks, models, levels): task 0 has all five models except one gap, task 1 has
+# only two models, and its last level no model at all
+VALUES = np.array([
+    [[1.0, 2.0, 3.0], [2.0, 3.0, 4.0], [9.0, 10.0, 11.0], [0.0, NAN, 2.0], [3.0, 4.0, 5.0]],
+    [[1.0, 5.0, NAN], [NAN, NAN, NAN], [3.0, 4.0, NAN], [NAN, NAN, NAN], [NAN, NAN, NAN]],
+])
+
+
+@pytest.fixture
+def aligned():
+    tasks = pd.DataFrame({'reference_date': ['2025-01-04', '2025-01-04'], 'location': ['on', 'qc'],
+                          'target': ['pct wk flu lab det'] * 2, 'horizon': [0, 0],
+                          'target_end_date': ['2025-01-04', '2025-01-04']})
+    return(AlignedQuantiles(tasks, MODELS, LEVELS, VALUES.copy()))
+
+
+def reference(reduce):
+    """Apply reduce to the present values of every (task, level) cell, one cell at a time"""
+    combined = np.full(VALUES.shape[::2], np.nan)
+    for task in range(VALUES.shape[0]):
+        for level in range(VALUES.shape[2]):
+            present = [value for value in VALUES[task, :, level] if not math.isnan(value)]
+            if present:
+                combined[task, level] = reduce(present)
+    return(monotone(combined))
+
+
+def trimmed_mean(values, trim):
+    k = int(math.floor(len(values) * trim))
+    kept = sorted(values)[k:len(values) - k]
+    return(sum(kept) / len(kept) if kept else np.nan)
+
+
+def test_mean_and_median(aligned):
+    np.testing.assert_allclose(aligned.ensemble('mean'), reference(lambda v: sum(v) / len(v)))
+    np.testing.assert_allclose(aligned.ensemble('median'), reference(np.median))
+
+
+@pytest.mark.parametrize("trim", [0.2, 0.25, 0.4, 0.5])
+def test_trimmed_keeps_ranks_k_to_count_minus_k(aligned, trim):
+    # With five models and trim 0.2 one is dropped at each end, with four none
+    np.testing.assert_allclose(aligned.ensemble('trimmed', trim=trim), reference(lambda v: trimmed_mean(v, trim)))
+
+
+def test_trimmed_drops_the_outlier(aligned):
+    # Task 0: five models at the lowest level, so 0 and 9 are dropped; four at the median, so none are
+    combined = aligned.ensemble('trimmed', trim=0.2)
+    assert combined[0, 0] == pytest.approx((1 + 2 + 3) / 3)
+    assert combined[0, 1] == pytest.approx((2 + 3 + 4 + 10) / 4)
+
+
+def test_weighted_with_missing_weights(aligned):
+    weights = {'a': 0.5, 'b': 0.25, 'c': 0.25}
+    combined = aligned.ensemble('weighted', weights=weights)
+
+    def weighted(task, level):
+        pairs = [(weights.get(model, 0.0), VALUES[task, i, level]) for i, model in enumerate(MODELS)
+                 if not math.isnan(VALUES[task, i, level]) and weights.get(model, 0.0) > 0]
+        return(sum(w * v for w, v in pairs) / sum(w for w, _ in pairs) if pairs else np.nan)
+
+    expected = monotone(np.array([[weighted(task, level) for level in range(3)] for task in range(2)]))
+    np.testing.assert_allclose(combined, expected)
+    # Weights are renormalised over the models present: task 1 has a and c only
+    assert combined[1, 0] == pytest.approx((0.5 * 1 + 0.25 * 3) / 0.75)
+
+
+def test_weighted_without_weights_is_missing(aligned):
+    assert np.isnan(aligned.ensemble('weighted', weights={'d': 1.0})[1]).all()
+
+
+def test_monotone_fixes_crossings_and_keeps_gaps(aligned):
+    np.testing.assert_array_equal(monotone(np.array([[1.0, 0.5, 2.0], [3.0, NAN, 1.0]])),
+                                  np.array([[1.0, 1.0, 2.0], [3.0, NAN, 3.0]]))
+    # Task 1: model a's median 5 is above model c's 4, but its upper quantile is missing
+    combined = aligned.ensemble('mean')
+    assert combined[1].tolist()[:2] == [2.0, 4.5]
+    assert np.isnan(combined[1, 2])
+    assert (np.diff(combined[0]) >= 0).all()
+
+
+def test_from_model_output_aligns_gaps():
+    rows = []
+    for model, task, level, value in [('a', 'on', 0.5, 1.0), ('b', 'on', 0.5, 3.0), ('b', 'qc', 0.25, 2.0),
+                                      ('Hub', 'on', 0.5, 100.0)]:
+        rows.append({'model': model, 'reference_date': 20000, 'location': task, 'target': 'pct wk flu lab det',
+                     'horizon': 0, 'target_end_date': 20000, 'output_type': 'quantile',
+                     'output_type_id': level, 'value': value})
+    aligned = AlignedQuantiles.from_model_output(pd.DataFrame(rows), excluded=['Hub'])
+    assert aligned.models == ['a', 'b']
+    assert aligned.tasks['location'].tolist() == ['on', 'qc']
+    combined = aligned.ensemble('mean')
+    assert combined[0].tolist()[1] == 2.0
+    assert np.isnan(combined[0, 0]) and combined[1, 0] == 2.0 and np.isnan(combined[1, 1])
+
+
+def test_unknown_method(aligned):
+    with pytest.raises(ValueError):
+        aligned.ensemble('mode')
+
+
+
+def test_mean_can_keep_crossing_quantiles(aligned):
+    crossing = AlignedQuantiles(aligned.tasks.iloc[:1], ['a', 'b'], LEVELS,
+                                np.array([[[1.0, 4.0, 2.0], [1.0, 2.0, 3.0]]]))
+    np.testing.assert_allclose(crossing.ensemble('mean', monotonic=False), [[1.0, 3.0, 2.5]])
+    np.testing.assert_allclose(crossing.ensemble('mean'), [[1.0, 3.0, 3.0]])
+
+
+def test_weighted_needs_a_weight(aligned):
+    with pytest.raises(ValueError):
+        aligned.ensemble('weighted', weights={'z': 1.0})
+    with pytest.raises(ValueError):
+        aligned.ensemble('weighted', weights={'a': 0.0})
+
+
+def test_weighted_by_round_uses_the_rounds_before_each(aligned):
+    tasks = pd.concat([aligned.tasks.iloc[:1].assign(reference_date=day_number('2025-01-04')),
+                       aligned.tasks.iloc[:1].assign(reference_date=day_number('2025-01-11'))], ignore_index=True)
+    rounds = AlignedQuantiles(tasks, ['a', 'b'], LEVELS, np.array([[[1.0, 2.0, 3.0], [3.0, 4.0, 5.0]]] * 2))
+    # Before 2025-01-11 only the first round is scored, a with a third of b's WIS
+    scores = pd.DataFrame({'model': ['a', 'b', 'a', 'b'],
+                           'reference_date': pd.to_datetime(['2025-01-04', '2025-01-04', '2025-01-11', '2025-01-11']),
+                           'wis': [1.0, 3.0, 3.0, 1.0]})
+
+    table, skipped = weighted_by_round(rounds, scores)
+    assert skipped == [pd.Timestamp('2025-01-04')]
+    assert timestamps(table['reference_date']).dt.strftime('%Y-%m-%d').unique().tolist() == ['2025-01-11']
+    assert table['value'].tolist() == pytest.approx([0.75 * 1 + 0.25 * 3, 0.75 * 2 + 0.25 * 4, 0.75 * 3 + 0.25 * 5])
+
+    table, skipped = weighted_by_round(rounds, scores[scores['reference_date'] > pd.Timestamp('2025-01-11')])
+    assert table.empty and len(skipped) == 2
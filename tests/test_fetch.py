@@ -0,0 +1,34 @@
+import pytest
+import requests
+
+from rvdss_fetch import ResponseCache, fetch_text
+from rvdss_metrics import reset_metrics
+from rvdss_update import DASHBOARD_BASE_URL, DASHBOARD_UPDATE_DATE_FILE
+
+URL = DASHBOARD_BASE_URL + DASHBOARD_UPDATE_DATE_FILE
+
+
+def test_second_fetch_revalidates_and_reuses_the_cached_body(corpus_server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), "revalidate")
+    metrics = reset_metrics()
+    assert fetch_text(URL, cache=cache) == "2025-10-17 10:00:00"
+    assert fetch_text(URL, cache=cache) == "2025-10-17 10:00:00"
+
+    # The first request has nothing to revalidate, the second sends the ETag it was given
+    (_, first), (_, second) = corpus_server.requests
+    assert first is None
+    assert second == cache.lookup(URL)['etag']
+    assert metrics.counters['requests'] == 2
+    assert metrics.counters['cache_hits'] == 1
+    assert metrics.counters['bytes_downloaded'] == len("2025-10-17 10:00:00")
+
+
+def test_offline_mode_replays_the_cache_without_requests(corpus_server, tmp_path):
+    fetch_text(URL, cache=ResponseCache(str(tmp_path / "cache"), "revalidate"))
+    served = len(corpus_server.requests)
+
+    offline = ResponseCache(str(tmp_path / "cache"), "offline")
+    assert fetch_text(URL, cache=offline) == "2025-10-17 10:00:00"
+    with pytest.raises(requests.exceptions.ConnectionError):
+        fetch_text(DASHBOARD_BASE_URL + "not-cached.csv", cache=offline)
+    assert len(corpus_server.requests) == served
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rvdss_merge import KEY_COLUMNS, coalesce_latest_issue
+
+
+def old_coalesce(df):
+    """The groupby-apply it replaced; group_keys=False keeps the index as pandas 1.2 did"""
+    table = df.groupby(KEY_COLUMNS, group_keys=False).apply(lambda x: x.bfill()).sort_values(by='issue',
+                                                                                              ascending=False)
+    return(table.drop_duplicates(subset=KEY_COLUMNS, keep='first'))
+
+
+def issues(seed, rows=400):
+    """Rows of several issues per week and location, in no particular order, with missing values"""
+    rng = np.random.default_rng(seed)
+    issue_dates = pd.DatetimeIndex([pd.Timestamp(day) for day in ["2024-10-10", "2024-10-17", "2024-10-24",
+                                                                  "2024-10-31 15:00:00"]])
+    table = pd.DataFrame({
+        'time_value': rng.choice(["2024-09-28", "2024-10-05", "2024-10-12"], rows),
+        'geo_type': rng.choice(["province", "region", None], rows, p=[0.6, 0.38, 0.02]),
+        'geo_value': rng.choice(["on", "qc", "bc"], rows),
+        'issue': rng.choice(issue_dates, rows),
+        'flu_pct_positive': rng.uniform(0, 30, rows),
+        'rsv_pct_positive': rng.uniform(0, 10, rows),
+        'flu_tests': rng.integers(0, 500, rows).astype(float),
+    }, index=rng.permutation(rows))
+    for col in ['flu_pct_positive', 'rsv_pct_positive', 'flu_tests']:
+        table.loc[rng.random(rows) < 0.4, col] = np.nan
+    return(table)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning", "ignore::DeprecationWarning")
+@pytest.mark.parametrize("seed", range(5))
+def test_coalesce_latest_issue_matches_groupby_apply_bfill(seed):
+    table = issues(seed)
+    expected = old_coalesce(table)
+    result = coalesce_latest_issue(table)
+    # Same rows, values and order, index included
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(result) < len(table)
+
+
+def test_later_issue_is_filled_from_earlier_ones():
+    table = pd.DataFrame({'time_value': ["2024-10-05"] * 3, 'geo_type': ["province"] * 3, 'geo_value': ["on"] * 3,
+                          'issue': pd.to_datetime(["2024-10-24", "2024-10-10", "2024-10-17"]),
+                          'flu_pct_positive': [np.nan, 1.0, 2.0], 'rsv_pct_positive': [3.0, np.nan, np.nan]})
+    result = coalesce_latest_issue(table)
+    assert result[['issue', 'flu_pct_positive', 'rsv_pct_positive']].values.tolist() == \
+        [[pd.Timestamp("2024-10-24"), 1.0, 3.0]]
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from rvdss_metrics import RUN_REPORT_FILE, RunMetrics, count, run_report, stage, timed
+
+
+def test_nested_stages_and_counters_add_up():
+    metrics = RunMetrics()
+    with metrics.stage("season"):
+        metrics.count("pages", 2)
+        for _ in range(3):
+            with metrics.stage("parse"):
+                metrics.count("tables")
+                metrics.count("rows_in", 10)
+    metrics.count("pages")
+
+    report = metrics.report()
+    assert list(report['stages']) == ["season", "season/parse"]
+    assert report['stages']['season/parse']['calls'] == 3
+    assert report['stages']['season/parse']['counters'] == {'tables': 3, 'rows_in': 30}
+    # An outer stage counts everything counted while it ran, its inner stages included
+    assert report['stages']['season']['counters'] == {'pages': 2, 'tables': 3, 'rows_in': 30}
+    assert report['counters'] == {'pages': 3, 'tables': 3, 'rows_in': 30}
+    assert report['stages']['season']['wall'] >= report['stages']['season/parse']['wall']
+
+
+def test_merge_adds_a_worker_report_under_the_current_stage():
+    worker = RunMetrics()
+    with worker.stage("parse"):
+        worker.count("rows_in", 5)
+
+    metrics = RunMetrics()
+    with metrics.stage("backfill"):
+        with metrics.stage("parse"):
+            metrics.count("rows_in", 1)
+        metrics.merge(worker.report())
+        metrics.merge(worker.report())
+    metrics.merge(worker.report())
+
+    report = metrics.report()
+    assert report['stages']['backfill/parse']['calls'] == 3
+    assert report['stages']['backfill/parse']['counters'] == {'rows_in': 11}
+    # Outside any stage the worker's stages are added at the top
+    assert report['stages']['parse']['calls'] == 1
+    assert report['counters'] == {'rows_in': 16}
+
+
+def test_run_report_is_written_when_the_run_fails(tmp_path):
+    @timed("update")
+    def update():
+        count("requests", 4)
+        with stage("parse"):
+            raise ValueError("bad table")
+
+    with pytest.raises(ValueError):
+        with run_report("rvdss_update", directory=str(tmp_path), profile=""):
+            update()
+
+    with open(tmp_path / RUN_REPORT_FILE, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report['run'] == "rvdss_update"
+    assert report['status'] == "failed"
+    assert report['error'] == "ValueError: bad table"
+    assert list(report['stages']) == ["update", "update/parse"]
+    assert report['stages']['update']['counters'] == {'requests': 4}
+
+
+def test_run_report_of_a_run_that_ends(tmp_path):
+    with run_report("rvdss_update", directory=str(tmp_path), profile="") as metrics:
+        count("requests")
+    assert metrics.counters['requests'] == 1
+
+    with open(tmp_path / RUN_REPORT_FILE, encoding="utf-8") as f:
+        report = json.load(f)
+    assert (report['status'], report['error'], report['counters']) == ("ok", None, {'requests': 1})
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import rvdss_model_output
+from rvdss_compact import day_number
+from rvdss_model_output import ModelOutputCache, load_model_output, normalise_dates
+
+
+def submission(reference_date, values, dates=None):
+    """A submission of median forecasts of flu in Ontario at horizons 0, 1, ..."""
+    end_dates = dates or [str((pd.Timestamp(reference_date) + pd.Timedelta(weeks=h)).date()) for h in range(len(values))]
+    return(pd.DataFrame({'location': "on", 'horizon': range(len(values)), 'reference_date': reference_date,
+                         'target_end_date': end_dates, 'target': "pct wk flu lab det", 'output_type': "quantile",
+                         'output_type_id': 0.5, 'value': values}))
+
+
+@pytest.fixture
+def model_output(tmp_path):
+    root = tmp_path / "model-output"
+    for model, value in [("A-one", 1.0), ("B-two", 2.0)]:
+        (root / model).mkdir(parents=True)
+        submission("2025-01-04", [value, value + 1]).to_csv(root / model / f"2025-01-04-{model}.csv", index=False)
+    return(root)
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """The files parsed by load_model_output"""
+    paths = []
+    parse_file = rvdss_model_output.parse_file
+    monkeypatch.setattr(rvdss_model_output, "parse_file", lambda path: paths.append(path) or parse_file(path))
+    return(paths)
+
+
+def load(root, tmp_path):
+    return(load_model_output(str(root), ModelOutputCache(str(tmp_path / "cache")), workers=1))
+
+
+def test_changed_file_is_parsed_again(model_output, tmp_path, parsed):
+    first = load(model_output, tmp_path)
+    assert len(parsed) == 2
+    assert first.groupby('model', observed=True)['value'].sum().to_dict() == {'A-one': 3.0, 'B-two': 5.0}
+
+    # Touched but unchanged: hashed again, not parsed
+    path = model_output / "B-two" / "2025-01-04-B-two.csv"
+    os.utime(path, (1, 1))
+    pd.testing.assert_frame_equal(load(model_output, tmp_path), first)
+    assert len(parsed) == 2
+
+    # A resubmission with other values: only that file is parsed again
+    submission("2025-01-04", [2.5, 3.5]).to_csv(path, index=False)
+    result = load(model_output, tmp_path)
+    assert parsed[2:] == [str(path)]
+    assert result.groupby('model', observed=True)['value'].sum().to_dict() == {'A-one': 3.0, 'B-two': 6.0}
+
+
+def test_new_and_removed_files(model_output, tmp_path, parsed):
+    load(model_output, tmp_path)
+    submission("2025-01-11", [4.0]).to_csv(model_output / "A-one" / "2025-01-11-A-one.csv", index=False)
+    result = load(model_output, tmp_path)
+    assert parsed[2:] == [str(model_output / "A-one" / "2025-01-11-A-one.csv")]
+    assert sorted(result['reference_date'].unique()) == [day_number("2025-01-04"), day_number("2025-01-11")]
+
+    os.remove(model_output / "B-two" / "2025-01-04-B-two.csv")
+    result = load(model_output, tmp_path)
+    assert list(result['model'].unique()) == ["A-one"]
+    assert len(parsed) == 3
+
+
+def test_normalise_dates():
+    values = ["2025-01-04", " 2025-01-04 ", "04/01/2025", "04-01-2025", "20092", 20092, 20092.4,
+              "20250104", "2025/01/04", "", None, np.nan, "31/02/2025"]
+    expected = [pd.Timestamp("2025-01-04")] * 7 + [pd.NaT] * 6
+    assert normalise_dates(values).tolist() == expected
+
+
+def test_unreadable_dates_are_dropped(model_output, tmp_path):
+    submission("04/01/2025", [1.0, 2.0, 3.0], dates=["11/01/2025", "not a date", "20105"]).to_csv(
+        model_output / "A-one" / "2025-01-04-A-one.csv", index=False)
+    result = load(model_output, tmp_path)
+    a = result[result['model'] == "A-one"]
+    assert a['target_end_date'].tolist() == [day_number("2025-01-11"), day_number("2025-01-17")]
+    assert a['reference_date'].unique().tolist() == [day_number("2025-01-04")]
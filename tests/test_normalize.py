@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+import regex as re
+
+from rvdss_normalize import (GEOS, NATION, REGIONS, VIRUSES, abbreviate_geo, abbreviate_geo_series,
+                             abbreviate_virus, abbreviate_virus_series, create_geo_types,
+                             create_geo_types_series)
+
+
+# The functions as they were before the patterns were compiled once, one call per row
+
+def old_abbreviate_virus(full_name):
+    lowercase=full_name.lower()
+    keys = (re.escape(k) for k in VIRUSES.keys())
+    pattern = re.compile(r'\b(' + '|'.join(keys) + r')\b')
+    result = pattern.sub(lambda x: VIRUSES[x.group()], lowercase)
+    return(result)
+
+
+def old_abbreviate_geo(full_name):
+    lowercase=full_name.lower()
+    lowercase = re.sub("province of ","",lowercase)
+    lowercase=re.sub(r"\.|\*","",lowercase)
+    lowercase=re.sub("/territoires","",lowercase)
+    lowercase=re.sub("^cana$","can",lowercase)
+
+    keys = (re.escape(k) for k in GEOS.keys())
+    pattern = re.compile(r'^\b(' + '|'.join(keys) + r')\b$')
+
+    result = pattern.sub(lambda x: GEOS[x.group()], lowercase)
+    return(result)
+
+
+def old_create_geo_types(geo,default_geo):
+    if geo in NATION:
+        geo_type="nation"
+    elif geo in REGIONS:
+        geo_type="region"
+    else:
+        geo_type = default_geo
+    return(geo_type)
+
+
+VIRUS_NAMES = list(VIRUSES) + [name.upper() for name in VIRUSES] + [
+    "Influenza A", "Influenza B", "FLU A(H3N2)", "SARS-CoV-2 tests", "Human Metapneumovirus", "hMPV tests",
+    "Parainfluenza virus", "Entero/Rhino%", "EV/RV", "Coronavirus (seasonal)", "rsv", "RSV%", "para-influenza",
+    "adeno tests", "total", "",
+]
+GEO_NAMES = list(GEOS) + [name.title() for name in GEOS] + REGIONS + NATION + [
+    "Province of Québec", "Province of Ontario", "CANA", "Cana", "N.W.T.", "Territories/Territoires",
+    "Yukon*", "Nunavut.", "St. John's", "Ontario - Toronto", "Canada total", "B.C.", "",
+]
+
+
+@pytest.mark.parametrize("name", VIRUS_NAMES)
+def test_abbreviate_virus_matches_old(name):
+    assert abbreviate_virus(name) == old_abbreviate_virus(name)
+
+
+@pytest.mark.parametrize("name", GEO_NAMES)
+def test_abbreviate_geo_matches_old(name):
+    assert abbreviate_geo(name) == old_abbreviate_geo(name)
+
+
+def test_series_match_old_per_row():
+    viruses = pd.Series(VIRUS_NAMES * 3, index=range(100, 100 + 3 * len(VIRUS_NAMES)))
+    assert abbreviate_virus_series(viruses).tolist() == [old_abbreviate_virus(v) for v in viruses]
+    assert (abbreviate_virus_series(viruses).index == viruses.index).all()
+
+    geos = pd.Series(GEO_NAMES * 3)
+    abbreviated = abbreviate_geo_series(geos)
+    assert abbreviated.tolist() == [old_abbreviate_geo(g) for g in geos]
+    for default in ["province", "lab"]:
+        assert create_geo_types_series(abbreviated, default).tolist() == \
+            [old_create_geo_types(g, default) for g in abbreviated]
+        assert [create_geo_types(g, default) for g in geos] == [old_create_geo_types(g, default) for g in geos]
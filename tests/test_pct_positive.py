@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from rvdss_update import DERIVED_SIGNALS, create_pct_positive_col, derive_pct_positive, pct_positive_signals
+
+VIRUSES = ['flu', 'rsv', 'sarscov2', 'hmpv']
+
+
+def old_create_pct_positive_col(df, viruses):
+    """create_pct_positive_col as it was, one row at a time"""
+    for virus in viruses:
+        positive_column = f"{virus}_positive_tests"
+        tests_column = f"{virus}_tests"
+        pct_column = f"{virus}_pct_positive"
+
+        if positive_column in df.columns and tests_column in df.columns:
+            df[positive_column] = pd.to_numeric(df[positive_column], errors='coerce')
+            df[tests_column] = pd.to_numeric(df[tests_column], errors='coerce')
+            df[pct_column] = df.apply(
+                lambda row: (row[positive_column] / row[tests_column] * 100) if row[tests_column] != 0 else 0,
+                axis=1
+            )
+    return df
+
+
+def old_flu_pct_positive(df):
+    """Steps 8 to 10 of process_tables as they were"""
+    df['flua_positive_tests'] = pd.to_numeric(df['flua_positive_tests'], errors='coerce')
+    df['flub_positive_tests'] = pd.to_numeric(df['flub_positive_tests'], errors='coerce')
+    df['flua_pct_positive'] = df.apply(
+        lambda row: (row['flua_positive_tests'] / row['flu_tests'] * 100) if row['flu_tests'] != 0 else 0, axis=1
+    )
+    df['flub_pct_positive'] = df.apply(
+        lambda row: (row['flub_positive_tests'] / row['flu_tests'] * 100) if row['flu_tests'] != 0 else 0, axis=1
+    )
+    return df
+
+
+def counts():
+    """Counts with zero and missing tests, missing positives and text the reports use for missing data"""
+    return(pd.DataFrame({
+        'geo_value': ['ca', 'on', 'qc', 'bc', 'ab', 'sk'],
+        'flu_positive_tests': [10, 0, np.nan, 3, 5, 7],
+        'flu_tests': [100, 0, 50, 0, np.nan, 70],
+        'flua_positive_tests': ['6', '0', 'N.A.', '2', '4', '5'],
+        'flub_positive_tests': [4, 0, 1, 1, np.nan, 2],
+        'rsv_positive_tests': ['1', '2', '', '3', '4', '5'],
+        'rsv_tests': ['10', '20', '30', '0', '40', 'N.D.'],
+        'sarscov2_positive_tests': [1.5, 2.0, 3.0, 0.0, 1.0, 2.0],
+        'sarscov2_tests': [3.0, 4.0, 0.0, 0.0, 2.0, 8.0],
+        # No hmpv_tests column: the hmpv signal is skipped
+        'hmpv_positive_tests': [1, 2, 3, 4, 5, 6],
+    }))
+
+
+def test_pct_positive_matches_row_wise_apply():
+    expected = old_flu_pct_positive(old_create_pct_positive_col(counts(), VIRUSES))
+    result = derive_pct_positive(counts(), {**pct_positive_signals(VIRUSES), **DERIVED_SIGNALS})
+    pd.testing.assert_frame_equal(result[expected.columns], expected)
+    assert 'hmpv_pct_positive' not in result.columns
+
+    pd.testing.assert_frame_equal(create_pct_positive_col(counts(), VIRUSES),
+                                  old_create_pct_positive_col(counts(), VIRUSES))
+
+
+def test_all_zero_tests_give_float_zeros():
+    # The one difference: apply gave an int column when every row had 0 tests
+    table = pd.DataFrame({'rsv_positive_tests': [0, 1], 'rsv_tests': [0, 0]})
+    expected = old_create_pct_positive_col(table.copy(), ['rsv'])
+    result = create_pct_positive_col(table.copy(), ['rsv'])
+    assert result['rsv_pct_positive'].dtype == np.float64
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rvdss_compact import day_numbers
+from rvdss_quantiles import QuantileCube
+
+LEVELS = [0.025, 0.1, 0.25, 0.5, 0.75, 0.9, 0.975]
+
+
+def calculate_intervals(data):
+    """The report's groupby before the forecasts were pivoted into a cube"""
+    return data.groupby('target_end_date').apply(
+        lambda x: pd.Series({
+            'median': x.loc[x['output_type_id'] == 0.5, 'value'].mean(),
+            'lower_95': x.loc[x['output_type_id'] == 0.025, 'value'].mean(),
+            'upper_95': x.loc[x['output_type_id'] == 0.975, 'value'].mean(),
+            'lower_50': x.loc[x['output_type_id'] == 0.25, 'value'].mean(),
+            'upper_50': x.loc[x['output_type_id'] == 0.75, 'value'].mean(),
+        })
+    ).reset_index()
+
+
+def forecasts(seed):
+    """Quantile forecasts of one round, shuffled, with quantiles missing, repeated and not quantiles at all"""
+    rng = np.random.default_rng(seed)
+    rows = pd.DataFrame([
+        {'target': target, 'location': location, 'model': model, 'target_end_date': end_date,
+         'output_type_id': level}
+        for target in ["pct wk flu lab det", "pct wk rsv lab det"]
+        for location in ["ca", "on", "qc"]
+        for model in ["A", "B", "C"]
+        for end_date in ["2025-01-04", "2025-01-11", "2025-01-18", "2025-01-25"]
+        for level in LEVELS
+    ])
+    rows = rows.sample(frac=0.8, random_state=seed)
+    rows = pd.concat([rows, rows.sample(frac=0.1, random_state=seed + 1)])
+    rows.loc[rows.sample(frac=0.05, random_state=seed + 2).index, 'output_type_id'] = np.nan
+    rows['value'] = rng.uniform(0, 20, len(rows))
+    return(rows.sample(frac=1, random_state=seed + 3).reset_index(drop=True))
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning", "ignore::FutureWarning")
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("compact", [False, True])
+def test_intervals_match_groupby(seed, compact):
+    data = forecasts(seed)
+    cube_data = data.assign(target_end_date=day_numbers(data['target_end_date'])) if compact else data
+    cube = QuantileCube(cube_data)
+
+    for target in data['target'].unique():
+        for location in data.loc[data['target'] == target, 'location'].unique():
+            panel = data[(data['target'] == target) & (data['location'] == location)]
+            assert cube.models(target, location) == list(panel['model'].unique())
+            for model in panel['model'].unique():
+                expected = calculate_intervals(panel[panel['model'] == model])
+                result = cube.intervals(target, location, model)
+                if compact:
+                    expected['target_end_date'] = [day.date() for day in pd.to_datetime(expected['target_end_date'])]
+                pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,74 @@
+import os
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+from rvdss_render import PageCache, render_pdfs
+
+
+def draw_page(page):
+    """A page showing its label, so the order of the pages can be read back"""
+    fig = plt.figure(figsize=(4, 3))
+    fig.text(0.5, 0.5, page['label'])
+    return(fig)
+
+
+def page_labels(path):
+    return([page.extract_text().strip() for page in pypdf.PdfReader(str(path)).pages])
+
+
+PAGES = [{'label': f"page {i}"} for i in range(7)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pages_are_written_in_order(tmp_path, workers):
+    first, second = tmp_path / "first.pdf", tmp_path / "second.pdf"
+    drawn = render_pdfs(draw_page, [(PAGES[:4], str(first)), (PAGES[4:], str(second))], workers=workers, cache=False)
+    assert drawn == 7
+    assert page_labels(first) == ["page 0", "page 1", "page 2", "page 3"]
+    assert page_labels(second) == ["page 4", "page 5", "page 6"]
+
+
+def test_workers_give_the_same_pages(tmp_path):
+    # One worker draws into PdfPages, several into single-page PDFs copied together
+    serial, parallel = tmp_path / "serial.pdf", tmp_path / "parallel.pdf"
+    render_pdfs(draw_page, [(PAGES, str(serial))], workers=1, cache=False)
+    render_pdfs(draw_page, [(PAGES, str(parallel))], workers=2, cache=False)
+    assert page_labels(serial) == page_labels(parallel)
+    assert [page.mediabox for page in pypdf.PdfReader(str(serial)).pages] == \
+        [page.mediabox for page in pypdf.PdfReader(str(parallel)).pages]
+
+
+def model_pages(values):
+    """One page per model and region, labelled with the model and drawn from its forecasts"""
+    return([{'label': f"{model} {region}", 'forecast': pd.DataFrame({'median': values[model]})}
+            for region in ["ca", "on", "qc"] for model in sorted(values)])
+
+
+def test_unchanged_pages_are_not_drawn_or_written_again(tmp_path):
+    cache = PageCache(str(tmp_path / "cache"))
+    report = tmp_path / "report.pdf"
+    pages = model_pages({'A': [1.0, 2.0], 'B': [3.0, 4.0]})
+    assert render_pdfs(draw_page, [(pages, str(report))], workers=1, cache=cache) == 6
+
+    written = report.read_bytes()
+    os.utime(report, (0, 0))
+    assert render_pdfs(draw_page, [(model_pages({'A': [1.0, 2.0], 'B': [3.0, 4.0]}), str(report))],
+                       workers=1, cache=cache) == 0
+    assert os.path.getmtime(report) == 0
+    assert report.read_bytes() == written
+
+
+def test_changed_model_redraws_only_its_pages(tmp_path):
+    cache = PageCache(str(tmp_path / "cache"))
+    report = tmp_path / "report.pdf"
+    render_pdfs(draw_page, [(model_pages({'A': [1.0, 2.0], 'B': [3.0, 4.0]}), str(report))], workers=1, cache=cache)
+
+    # A late submission of model B: its three pages are drawn again, A's come from the cache
+    drawn = render_pdfs(draw_page, [(model_pages({'A': [1.0, 2.0], 'B': [3.0, 4.5]}), str(report))],
+                        workers=1, cache=cache)
+    assert drawn == 3
+    assert page_labels(report) == ["A ca", "B ca", "A on", "B on", "A qc", "B qc"]
@@ -0,0 +1,56 @@
+import importlib.util
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from rvdss_compact import day_numbers
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "rvdss-report.py")
+REFERENCE_DATES = ["2025-01-11", "2025-01-18", "2025-01-25", "2025-02-01", "2025-02-08"]
+
+
+@pytest.fixture
+def report(tmp_path, monkeypatch):
+    """rvdss-report.py with the data loading and drawing replaced, returning the reports it would write"""
+    spec = importlib.util.spec_from_file_location("rvdss_report", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    model_data = pd.DataFrame({'reference_date': day_numbers(REFERENCE_DATES[::-1]), 'value': range(5)})
+    truth_data = pd.DataFrame({'time_value': day_numbers(["2025-01-04"]), 'geo_value': ["ca"]})
+    monkeypatch.setattr(module, "load_model_output", lambda: model_data)
+    monkeypatch.setattr(module, "load_target_data", lambda path: truth_data)
+    monkeypatch.setattr(module, "QuantileCube", lambda rows: rows)
+    monkeypatch.setattr(module, "forecast_pages", lambda rows, truth, locations: [{'value': rows['value'].tolist()}])
+    written = []
+    monkeypatch.setattr(module, "render_pdfs", lambda draw, reports, workers: written.extend(reports) or 0)
+
+    (tmp_path / "auxiliary-data").mkdir()
+    pd.DataFrame({'geo_abbr': ["ca"], 'geo_name': ["Canada"]}).to_csv(tmp_path / "auxiliary-data" / "locations.csv")
+    monkeypatch.chdir(tmp_path)
+
+    def run(*args):
+        monkeypatch.setattr(sys, "argv", ["rvdss-report.py", *args])
+        module.main()
+        return(written)
+    return(run)
+
+
+def test_start_and_end_choose_the_reference_dates_between_them(report):
+    reports = report("--start", "2025-01-18", "--end", "2025-02-01")
+    assert [path for _, path in reports] == [f"weekly-forecast-reports/{day}-Forecast_Report.pdf"
+                                             for day in ["2025-01-18", "2025-01-25", "2025-02-01"]]
+    # Each report is drawn from the forecasts of its own reference date
+    assert [pages for pages, _ in reports] == [[{'value': [3]}], [{'value': [2]}], [{'value': [1]}]]
+
+
+def test_start_alone_runs_to_the_last_reference_date(report):
+    reports = report("--start", "2025-01-20")
+    assert [path for _, path in reports] == [f"weekly-forecast-reports/{day}-Forecast_Report.pdf"
+                                             for day in ["2025-01-25", "2025-02-01", "2025-02-08"]]
+
+
+def test_all_writes_every_reference_date(report):
+    assert len(report("--all")) == len(REFERENCE_DATES)
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from rvdss_revisions import RevisionStore, wide
+
+
+def issue(issue_date, values):
+    """A wide raw table of one issue with flu tests for Ontario"""
+    return(pd.DataFrame({'time_value': list(values), 'geo_value': 'on', 'issue': issue_date,
+                         'flu_tests': list(values.values())}))
+
+
+@pytest.fixture
+def store():
+    return(RevisionStore()
+           .add(issue('2024-10-10', {'2024-10-05': 10}))
+           .add(issue('2024-10-17', {'2024-10-05': 10, '2024-10-12': 20}))
+           .add(issue('2024-10-24 15:00:00', {'2024-10-05': 12, '2024-10-12': 20, '2024-10-19': 30})))
+
+
+def test_only_changed_values_are_stored(store):
+    rows = list(zip(store.data['time_value'].dt.strftime("%Y-%m-%d"),
+                    store.data['issue'].dt.strftime("%Y-%m-%d %H:%M"), store.data['value']))
+    assert rows == [('2024-10-05', '2024-10-10 00:00', 10), ('2024-10-05', '2024-10-24 15:00', 12),
+                    ('2024-10-12', '2024-10-17 00:00', 20), ('2024-10-19', '2024-10-24 15:00', 30)]
+
+
+def test_snapshots_keep_unchanged_values_current(store):
+    snapshots = wide(store.snapshots(['2024-10-17', '2024-10-20', '2024-10-24']))
+    values = {(str(row.as_of.date()), str(row.time_value.date())): row.flu_tests for row in snapshots.itertuples()}
+    assert values == {('2024-10-17', '2024-10-05'): 10, ('2024-10-17', '2024-10-12'): 20,
+                      ('2024-10-20', '2024-10-05'): 10, ('2024-10-20', '2024-10-12'): 20,
+                      ('2024-10-24', '2024-10-05'): 12, ('2024-10-24', '2024-10-12'): 20,
+                      ('2024-10-24', '2024-10-19'): 30}
+
+
+def test_revision_lags(store):
+    lags = store.revision_lags().set_index(store.revision_lags()['time_value'].astype(str))
+    assert lags.loc['2024-10-05', 'revisions'] == 1
+    assert lags.loc['2024-10-05', 'lag'] == 19
+    assert lags.loc['2024-10-12', 'revisions'] == 0
+
+
+def test_unreadable_dates_raise():
+    with pytest.raises(ValueError):
+        RevisionStore().add(issue('24/10/2024', {'2024-10-05': 10}))
+
+
+def test_save_load_and_append(tmp_path, store):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "revisions.parquet")
+    store.save(path)
+    pd.testing.assert_frame_equal(RevisionStore.load(path).data, store.data)
+
+    RevisionStore.append(path, issue('2024-10-31', {'2024-10-12': 20, '2024-10-19': 31}))
+    loaded = RevisionStore.load(path).data
+    assert len(loaded) == len(store.data) + 1
+    assert loaded['value'].iloc[-1] == 31
@@ -0,0 +1,112 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import rvdss_scoring
+from rvdss_scoring import FORECAST_KEYS, OUTPUT_FILES, QuantileForecasts, leaderboard, load_truth, score
+
+LEVELS = [0.025, 0.1, 0.25, 0.5, 0.75, 0.9, 0.975]
+QUANTILES = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+
+
+def forecasts(rows):
+    """One forecast of flu in Ontario per row of quantile values, by model"""
+    keys = pd.DataFrame([{'model': model, 'reference_date': pd.Timestamp('2024-11-02'), 'target': 'pct wk flu lab det',
+                          'location': 'on', 'horizon': 0, 'target_end_date': pd.Timestamp('2024-11-02')}
+                         for model, _ in rows])[FORECAST_KEYS]
+    return(QuantileForecasts(keys, LEVELS, np.array([values for _, values in rows], dtype=float)))
+
+
+def truth(observed):
+    return(pd.DataFrame({'target_end_date': [pd.Timestamp('2024-11-02')], 'location': ['on'],
+                         'target': ['pct wk flu lab det'], 'observed': [observed]}))
+
+
+def model_eval_wis(quantiles, y):
+    """The WIS function of model-eval.R, line by line"""
+    values = dict(zip(LEVELS, quantiles))
+    wis = abs(y - values[0.5]) / 2
+    for quantile in [0.025, 0.1, 0.25]:
+        lower, upper = values[quantile], values[round(1 - quantile, 3)]
+        wis += quantile * (upper - lower) + (y < lower) * (lower - y) + (y > upper) * (y - upper)
+    return(wis / 3.5)
+
+
+@pytest.mark.parametrize("observed, wis, dispersion, overprediction, underprediction, coverage_50, coverage_95", [
+    # Above every interval: 8/2 / 2 + (0.15 + 1) + (0.4 + 2) + (0.5 + 3), over 3.5 intervals
+    (8.0, 9.05 / 3.5, 1.05 / 3.5, 0.0, 8.0 / 3.5, 0.0, 0.0),
+    # Inside the 50% interval, just below the median
+    (3.5, 1.3 / 3.5, 1.05 / 3.5, 0.25 / 3.5, 0.0, 1.0, 1.0),
+    # Below every interval
+    (0.5, 7.3 / 3.5, 1.05 / 3.5, 6.25 / 3.5, 0.0, 0.0, 0.0),
+])
+def test_hand_computed_scores(observed, wis, dispersion, overprediction, underprediction, coverage_50, coverage_95):
+    scores = score(forecasts([('a', QUANTILES)]), truth(observed)).iloc[0]
+    assert scores['wis'] == pytest.approx(wis)
+    assert scores['dispersion'] == pytest.approx(dispersion)
+    assert scores['overprediction'] == pytest.approx(overprediction)
+    assert scores['underprediction'] == pytest.approx(underprediction)
+    assert scores['dispersion'] + scores['overprediction'] + scores['underprediction'] == pytest.approx(scores['wis'])
+    assert scores['ae'] == pytest.approx(abs(observed - 4.0))
+    assert (scores['coverage_50'], scores['coverage_95']) == (coverage_50, coverage_95)
+
+
+def test_matches_model_eval():
+    rng = np.random.default_rng(3)
+    rows = [(f"m{i}", list(np.sort(rng.gamma(2.0, 3.0, size=len(LEVELS))))) for i in range(20)]
+    y = 5.3
+    scores = score(forecasts(rows), truth(y))
+    expected = [model_eval_wis(values, y) for _, values in rows]
+    np.testing.assert_allclose(scores['wis'].to_numpy(), expected)
+    # model-eval.R writes the WIS rounded to 3 decimals: 2.586 for the first hand-computed case
+    assert round(score(forecasts([('a', QUANTILES)]), truth(8.0))['wis'].iloc[0], 3) == 2.586
+
+
+def test_incomplete_forecasts_and_missing_truth_are_not_scored():
+    missing_quantile = list(QUANTILES)
+    missing_quantile[1] = np.nan
+    scores = score(forecasts([('a', QUANTILES), ('b', missing_quantile)]), truth(8.0))
+    assert scores['wis'].notna().tolist() == [True, False]
+    assert score(forecasts([('a', QUANTILES)]), truth(np.nan))['wis'].isna().all()
+
+    board = leaderboard(scores)
+    assert board['model'].tolist() == ['a']
+    assert board['forecasts'].tolist() == [1]
+
+
+def test_load_truth_later_files_win(tmp_path):
+    archive = tmp_path / "archive.csv"
+    current = tmp_path / "current.csv"
+    pd.DataFrame({'time_value': ['2024-10-26', '2024-11-02'], 'geo_value': ['on', 'on'],
+                  'flu_pct_positive': [1.0, 2.0], 'rsv_pct_positive': [3.0, 4.0]}).to_csv(archive, index=False)
+    pd.DataFrame({'time_value': ['2024-11-02'], 'geo_value': ['on'],
+                  'flu_pct_positive': [2.5], 'rsv_pct_positive': [4.5]}).to_csv(current, index=False)
+
+    loaded = load_truth([str(archive), str(current)]).set_index(['target_end_date', 'target'])['observed']
+    assert loaded[(pd.Timestamp('2024-10-26'), 'pct wk flu lab det')] == 1.0
+    assert loaded[(pd.Timestamp('2024-11-02'), 'pct wk flu lab det')] == 2.5
+    assert loaded[(pd.Timestamp('2024-11-02'), 'pct wk rsv lab det')] == 4.5
+    assert set(loaded.index.get_level_values('target')) == {'pct wk flu lab det', 'pct wk rsv lab det'}
+
+
+def test_main_leaves_the_model_eval_outputs_alone(tmp_path, monkeypatch):
+    output_dir = tmp_path / "rvdss-output"
+    output_dir.mkdir()
+    (output_dir / "WIS_average.csv").write_text("Horizon,Model,Average_WIS\n")
+    (output_dir / "all_rvdss_scores.csv").write_text("Model,WIS\n")
+
+    model_output = pd.DataFrame({'model': 'a', 'reference_date': pd.Timestamp('2024-11-02'),
+                                 'target': 'pct wk flu lab det', 'location': 'on', 'horizon': 0,
+                                 'target_end_date': pd.Timestamp('2024-11-02'), 'output_type': 'quantile',
+                                 'output_type_id': LEVELS, 'value': QUANTILES})
+    monkeypatch.setattr(rvdss_scoring, "load_model_output", lambda value_dtype: model_output)
+    monkeypatch.setattr(rvdss_scoring, "load_truth", lambda paths: truth(8.0))
+    monkeypatch.setattr(sys, "argv", ["rvdss_scoring.py", "--output-dir", str(output_dir)])
+    rvdss_scoring.main()
+
+    assert (output_dir / "WIS_average.csv").read_text() == "Horizon,Model,Average_WIS\n"
+    assert (output_dir / "all_rvdss_scores.csv").read_text() == "Model,WIS\n"
+    for name in OUTPUT_FILES.values():
+        assert len(pd.read_csv(output_dir / name)) == 1
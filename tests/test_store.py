@@ -0,0 +1,123 @@
+import pandas as pd
+import pytest
+
+from rvdss_store import IssueStore
+from rvdss_update import coalesce_stores, update_target_table
+
+KEYS = ['epiweek', 'time_value', 'issue', 'geo_type', 'geo_value']
+
+
+def issue(issue_date, values):
+    """One issue of a raw table: flu percent positive for Ontario and Quebec by week"""
+    rows = [{'epiweek': epiweek, 'time_value': time_value, 'issue': issue_date, 'geo_type': 'province',
+             'geo_value': geo, 'flu_pct_positive': value}
+            for (epiweek, time_value, geo), value in values.items()]
+    return(pd.DataFrame(rows).set_index(KEYS))
+
+
+ISSUES = [
+    issue('2025-09-04 15:00:00', {(202535, '2025-08-30', 'on'): 1.0, (202535, '2025-08-30', 'qc'): None}),
+    issue('2025-09-11 15:00:00', {(202535, '2025-08-30', 'on'): 1.5, (202536, '2025-09-06', 'on'): 2.0,
+                                  (202535, '2025-08-30', 'qc'): 3.0}),
+    issue('2025-09-18 15:00:00', {(202536, '2025-09-06', 'on'): None, (202537, '2025-09-13', 'on'): 4.0}),
+]
+
+
+@pytest.fixture
+def published(tmp_path):
+    """A published CSV holding the first two issues"""
+    path = tmp_path / "positive_tests.csv"
+    pd.concat(ISSUES[:2]).to_csv(path)
+    return(str(path))
+
+
+def test_sync_csv_imports_the_published_csv_once(tmp_path, published):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    assert len(store.partitions()) == 2
+    pd.testing.assert_frame_equal(store.read(), pd.read_csv(published).set_index(KEYS))
+
+    store.sync_csv(published)
+    assert len(store.partitions()) == 2
+
+
+def test_append_csv_appends_new_rows_and_keeps_the_csv(tmp_path, published):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    partition = store.append(ISSUES[2])
+    store.append_csv(published, partition)
+
+    expected = pd.concat(ISSUES).reset_index()
+    pd.testing.assert_frame_equal(pd.read_csv(published), expected)
+
+    # A store out of step with the CSV (e.g. a stale local copy) is rebuilt from it
+    stale = IssueStore(str(tmp_path / "stale"))
+    stale.sync_csv(published)
+    assert stale.append(ISSUES[2]) is None
+
+
+def test_already_stored_issue_is_not_appended(tmp_path, published):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    assert store.append(ISSUES[1]) is None
+
+
+def test_target_update_matches_rebuild(tmp_path, published):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    target_path = str(tmp_path / "target_rvdss_data.csv")
+    update_target_table([store], [None], target_path)
+
+    partition = store.append(ISSUES[2])
+    update_target_table([store], [partition], target_path)
+
+    updated = pd.read_csv(target_path).sort_values(['time_value', 'geo_value']).reset_index(drop=True)
+    rebuilt = coalesce_stores([store]).astype({'time_value': str})
+    rebuilt = rebuilt.sort_values(['time_value', 'geo_value']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(updated[rebuilt.columns], rebuilt, check_dtype=False)
+    assert len(updated) == 4
+    assert updated.loc[updated['time_value'] == '2025-09-13', 'flu_pct_positive'].tolist() == [4.0]
+
+
+def test_partitions_with_only_picks_the_partitions_holding_the_keys(tmp_path, published):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    store.append(ISSUES[2])
+    first, second, third = store.partitions()
+
+    def keys(*pairs):
+        return(pd.MultiIndex.from_tuples(pairs, names=['time_value', 'geo_value']))
+
+    assert store.partitions_with(keys(('2025-08-30', 'qc')), ['time_value', 'geo_value']) == [first, second]
+    assert store.partitions_with(keys(('2025-09-13', 'on')), ['time_value', 'geo_value']) == [third]
+    assert store.partitions_with(keys(('2025-09-20', 'on')), ['time_value', 'geo_value']) == []
+
+
+def test_target_update_reads_only_the_partitions_of_the_new_keys(tmp_path, published, monkeypatch):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    target_path = str(tmp_path / "target_rvdss_data.csv")
+    update_target_table([store], [None], target_path)
+
+    read = []
+    full_read = IssueStore.read
+    monkeypatch.setattr(IssueStore, "read", lambda self, partitions=None: read.append(partitions) or
+                        full_read(self, partitions))
+    partition = store.append(ISSUES[2])
+    update_target_table([store], [partition], target_path)
+
+    # The new issue reports 2025-09-06 and 2025-09-13 in Ontario: the first partition holds neither
+    assert all(partitions is not None for partitions in read)
+    assert sorted({name for partitions in read for name in partitions}) == store.partitions()[1:]
+
+
+def test_store_without_its_csv_starts_again(tmp_path, published):
+    store = IssueStore(str(tmp_path / "store"))
+    store.sync_csv(published)
+    missing = str(tmp_path / "respiratory_detections.csv")
+
+    # A restored store whose CSV is gone doesn't bring its old partitions back into a new CSV
+    store.sync_csv(missing)
+    partition = store.append(ISSUES[2])
+    store.append_csv(missing, partition)
+    pd.testing.assert_frame_equal(pd.read_csv(missing), ISSUES[2].reset_index())
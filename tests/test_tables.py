@@ -0,0 +1,56 @@
+import io
+import re
+
+import pandas as pd
+import pytest
+
+from rvdss_tables import NA_VALUES, parse_page, read_table
+
+TABLES = {
+    'spans': """<table>
+        <thead><tr><th>Week</th><th colspan="2">Flu</th><th>RSV</th></tr></thead>
+        <tbody>
+        <tr><td rowspan="2">35</td><td>1,5</td><td>2</td><td rowspan="3">3,25</td></tr>
+        <tr><td colspan="2">4</td></tr>
+        <tr><td>36</td><td>5</td><td>6</td></tr>
+        </tbody></table>""",
+    'multi-row header': """<table>
+        <thead>
+        <tr><th rowspan="2">Week</th><th colspan="2">Canada</th><th colspan="2">Ontario</th></tr>
+        <tr><th>Tests</th><th>%</th><th>Tests</th><th>%</th></tr>
+        </thead>
+        <tbody><tr><td>35</td><td>100</td><td>1,5</td><td>40</td><td>2,0</td></tr></tbody></table>""",
+    'header rows of th without thead': """<table>
+        <tr><th>Week</th><th>Flu</th></tr>
+        <tr><th></th><th>%</th></tr>
+        <tr><td>35</td><td>1,5</td></tr></table>""",
+    'tfoot': """<table>
+        <thead><tr><th>Week</th><th>Flu</th></tr></thead>
+        <tfoot><tr><td>Total</td><td>9</td></tr></tfoot>
+        <tbody><tr><td>35</td><td>1</td></tr><tr><td>36</td><td>8</td></tr></tbody></table>""",
+    'missing data': """<table>
+        <thead><tr><th>Week</th><th>Flu</th><th>RSV</th><th>HMPV</th></tr></thead>
+        <tbody>
+        <tr><td>35</td><td>N.A.</td><td>-</td><td>Not Tested</td></tr>
+        <tr><td>36</td><td>N.D.</td><td>2</td><td></td></tr>
+        <tr><td>37</td><td>N.R.</td><td>N.C.</td><td>3</td></tr>
+        </tbody></table>""",
+    'nbsp, br and sup': """<table>
+        <thead><tr><th>Reporting<br>laboratory</th><th>Flu&nbsp;A<sup>1</sup></th>
+        <th>Week&nbsp;end</th></tr></thead>
+        <tbody>
+        <tr><td>Province&nbsp;of<br/>Ontario</td><td>12<sup>a</sup></td><td>&nbsp;2024-10-05 </td></tr>
+        <tr><td>Quebec<span style="display: none">hidden</span></td><td>&nbsp;</td><td>2024-10-05</td></tr>
+        </tbody></table>""",
+}
+
+
+@pytest.mark.parametrize("comma_as_decimal", [True, False])
+@pytest.mark.parametrize("name", list(TABLES))
+def test_read_table_matches_read_html(name, comma_as_decimal):
+    page = TABLES[name]
+    # What rvdss_update did before: commas replaced in the html, then pd.read_html
+    expected = pd.read_html(io.StringIO(re.sub(",", "." if comma_as_decimal else "", page)),
+                            na_values=NA_VALUES)[0]
+    table = read_table(parse_page(page).find(".//table"), comma_as_decimal=comma_as_decimal)
+    pd.testing.assert_frame_equal(table, expected)
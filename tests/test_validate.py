@@ -0,0 +1,116 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from rvdss_validate import TASKS_CONFIG_FILE, TaskConfig, check_file, validate_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEVELS = [0.025, 0.25, 0.5, 0.75, 0.975]
+
+CONFIG = {
+    "rounds": [{
+        "round_id_from_variable": True,
+        "round_id": "reference_date",
+        "model_tasks": [{
+            "task_ids": {
+                "reference_date": {"required": None, "optional": ["2025-01-04", "2025-01-11"]},
+                "target": {"required": None, "optional": ["pct wk flu lab det"]},
+                "horizon": {"required": None, "optional": [-1, 0, 1]},
+                "location": {"required": None, "optional": ["on", "qc"]},
+                "target_end_date": {"required": None, "optional": ["2024-12-28", "2025-01-04", "2025-01-11"]},
+            },
+            "output_type": {
+                "quantile": {"output_type_id": {"required": LEVELS},
+                             "value": {"type": "double", "minimum": 0}},
+            },
+            "target_metadata": [{"target_keys": {"target": "pct wk flu lab det"}, "is_step_ahead": True,
+                                 "time_unit": "week"}],
+        }],
+    }],
+}
+PATH = os.path.join("model-output", "Team-Model", "2025-01-04-Team-Model.csv")
+
+
+@pytest.fixture
+def config():
+    return(TaskConfig(CONFIG))
+
+
+def submission(rows=None):
+    """A valid submission for 2025-01-04, as text columns; rows replaces (location, horizon, level) values"""
+    lines = []
+    for location in ["on", "qc"]:
+        for horizon, end_date in [(-1, "2024-12-28"), (0, "2025-01-04"), (1, "2025-01-11")]:
+            for i, level in enumerate(LEVELS):
+                lines.append({'reference_date': "2025-01-04", 'target': "pct wk flu lab det", 'horizon': str(horizon),
+                              'location': location, 'target_end_date': end_date, 'output_type': "quantile",
+                              'output_type_id': str(level), 'value': str(1.0 + i)})
+    table = pd.DataFrame(lines)
+    for (location, horizon, level), changes in (rows or {}).items():
+        match = (table['location'] == location) & (table['horizon'] == str(horizon)) & \
+            (table['output_type_id'] == str(level))
+        for col, value in changes.items():
+            table.loc[match, col] = value
+    return(table)
+
+
+def checks(violations):
+    return(sorted({check for check, _ in violations}))
+
+
+def test_valid_submission(config):
+    assert check_file(PATH, submission(), config) == []
+
+
+def test_missing_required_quantile(config):
+    table = submission()
+    table = table[~((table['location'] == "qc") & (table['horizon'] == "0") & (table['output_type_id'] == "0.75"))]
+    violations = check_file(PATH, table.reset_index(drop=True), config)
+    assert checks(violations) == ["required"]
+    # Only the four other rows of that forecast are flagged
+    assert violations[0][1].startswith("4 rows")
+
+
+def test_crossing_quantiles(config):
+    violations = check_file(PATH, submission({("on", 1, 0.5): {'value': "0.5"}}), config)
+    assert checks(violations) == ["monotone"]
+    assert violations[0][1].startswith("1 rows")
+
+
+def test_target_end_date_arithmetic(config):
+    # Both dates are allowed task ids, but 2025-01-04 + 1 week isn't 2025-01-04
+    table = submission({("on", 1, level): {'target_end_date': "2025-01-04"} for level in LEVELS})
+    violations = check_file(PATH, table, config)
+    assert "dates" in checks(violations)
+    assert any("reference_date + horizon" in message for check, message in violations if check == "dates")
+
+    unreadable = submission({("on", 0, 0.5): {'reference_date': "04/01/2025"}})
+    assert "dates" in checks(check_file(PATH, unreadable, config))
+
+
+def test_disallowed_ids_duplicates_and_values(config):
+    table = submission({("on", 0, 0.5): {'location': "xx"}, ("qc", 0, 0.025): {'value': "-1"}})
+    table = pd.concat([table, table.iloc[[0]]], ignore_index=True)
+    assert checks(check_file(PATH, table, config)) == ["duplicates", "required", "task ids", "values"]
+
+
+def test_round_must_match_file_name(config):
+    table = submission()
+    violations = check_file(os.path.join("model-output", "Team-Model", "2025-01-11-Team-Model.csv"), table, config)
+    assert checks(violations) == ["round"]
+    assert checks(check_file(os.path.join("model-output", "Other", "2025-01-04-Team-Model.csv"), table, config)) \
+        == ["round"]
+
+
+def test_missing_columns(config):
+    assert checks(check_file(PATH, submission().drop(columns=['horizon']), config)) == ["columns"]
+
+
+def test_committed_submission_is_valid():
+    paths = sorted(glob.glob(os.path.join(ROOT, "model-output", "AI4Casting_Hub-Ensemble_v1", "*.csv")))
+    if not paths:
+        pytest.skip("no committed submissions")
+    path, violations = validate_file(paths[-1], TaskConfig.load(os.path.join(ROOT, TASKS_CONFIG_FILE)))
+    assert violations == []